@@ -0,0 +1,290 @@
+# Author: Myles Scholz
+# Created on October 19, 2026
+# Description: Module that encodes data as ECC 200 Data Matrix symbols (rows of dark and light modules)
+import functools
+
+
+# Symbol sizes (rows, columns) with one data region and one error correction block, and
+# their numbers of data and error correction codewords
+SYMBOL_SIZES = {
+    (10, 10): (3, 5),
+    (12, 12): (5, 7),
+    (14, 14): (8, 10),
+    (16, 16): (12, 12),
+    (18, 18): (18, 14),
+    (20, 20): (22, 18),
+    (22, 22): (30, 20),
+    (24, 24): (36, 24),
+    (26, 26): (44, 28),
+    (8, 18): (5, 7),
+    (12, 26): (16, 14),
+}
+
+# ASCII Encodation Constants
+PAD = 129
+DIGIT_PAIR_OFFSET = 130
+UPPER_SHIFT = 235
+
+# Polynomial of the Galois field GF(256) used for error correction
+FIELD_POLYNOMIAL = 0x12D
+
+
+def get_field_tables():
+    # Powers of 2 in the field (repeated so products never wrap) and their logarithms
+    exponents = [0] * 510
+    logarithms = [0] * 256
+
+    value = 1
+    for i in range(255):
+        exponents[i] = exponents[i + 255] = value
+        logarithms[value] = i
+        value <<= 1
+        if value & 0x100:
+            value ^= FIELD_POLYNOMIAL
+
+    return exponents, logarithms
+
+
+EXPONENTS, LOGARITHMS = get_field_tables()
+
+
+def multiply(a: int, b: int):
+    if a == 0 or b == 0:
+        return 0
+    return EXPONENTS[LOGARITHMS[a] + LOGARITHMS[b]]
+
+
+@functools.lru_cache(maxsize=None)
+def get_generator(n_error_codewords: int):
+    # Coefficients (highest power first) of the product of (x - 2^i) for i from 1 to n
+    generator = [1]
+    for i in range(1, n_error_codewords + 1):
+        product = generator + [0]
+        for j, coefficient in enumerate(generator):
+            product[j + 1] ^= multiply(coefficient, EXPONENTS[i])
+        generator = product
+
+    return generator
+
+
+def get_error_codewords(codewords: list, n_error_codewords: int):
+    # Reed-Solomon error correction: the remainder of the data divided by the generator
+    generator = get_generator(n_error_codewords)
+    remainder = list(codewords) + [0] * n_error_codewords
+
+    for i in range(len(codewords)):
+        coefficient = remainder[i]
+        if coefficient:
+            for j in range(1, n_error_codewords + 1):
+                remainder[i + j] ^= multiply(generator[j], coefficient)
+
+    return remainder[len(codewords) :]
+
+
+def encode_ascii(data: str):
+    """
+    Encodes data as codewords with ASCII encodation, which stores pairs of digits in one
+    codeword (Latin-1 characters above 127 take two codewords)
+    """
+
+    data_bytes = data.encode("latin-1")
+
+    codewords = []
+    i = 0
+    while i < len(data_bytes):
+        pair = data_bytes[i : i + 2]
+        if len(pair) == 2 and pair.isdigit():
+            codewords.append(DIGIT_PAIR_OFFSET + int(pair))
+            i += 2
+            continue
+
+        if data_bytes[i] < 128:
+            codewords.append(data_bytes[i] + 1)
+        else:
+            codewords.extend([UPPER_SHIFT, data_bytes[i] - 127])
+        i += 1
+
+    return codewords
+
+
+def add_padding(codewords: list, n_data_codewords: int):
+    # Fill the unused data codewords with a pad codeword and then pseudo-random pad codewords
+    if len(codewords) < n_data_codewords:
+        codewords.append(PAD)
+
+    while len(codewords) < n_data_codewords:
+        value = PAD + (149 * (len(codewords) + 1)) % 253 + 1
+        codewords.append(value - 254 if value > 254 else value)
+
+    return codewords
+
+
+def place_codewords(codewords: list, n_rows: int, n_columns: int):
+    """
+    Places the bits of the codewords in a data region of the given size with the ECC 200
+    placement algorithm, which fills it with diagonal stripes of 8-module "utah" shapes
+    Returns the region as rows of booleans (True for dark modules)
+    """
+
+    region = [[None] * n_columns for _ in range(n_rows)]
+
+    def place_module(row, column, codeword, bit):
+        # Modules that fall outside the region wrap around to the opposite side
+        if row < 0:
+            row += n_rows
+            column += 4 - ((n_rows + 4) % 8)
+        if column < 0:
+            column += n_columns
+            row += 4 - ((n_columns + 4) % 8)
+        value = codewords[codeword] if codeword < len(codewords) else 0
+        region[row][column] = bool(value & (0x80 >> bit))
+
+    def place_utah(row, column, codeword):
+        for i, (dr, dc) in enumerate(
+            [(-2, -2), (-2, -1), (-1, -2), (-1, -1), (-1, 0), (0, -2), (0, -1), (0, 0)]
+        ):
+            place_module(row + dr, column + dc, codeword, i)
+
+    def place_corner(positions, codeword):
+        for i, (row, column) in enumerate(positions):
+            place_module(row, column, codeword, i)
+
+    # The four special corner shapes used by some region sizes
+    corners = [
+        [
+            (n_rows - 1, 0),
+            (n_rows - 1, 1),
+            (n_rows - 1, 2),
+            (0, n_columns - 2),
+            (0, n_columns - 1),
+            (1, n_columns - 1),
+            (2, n_columns - 1),
+            (3, n_columns - 1),
+        ],
+        [
+            (n_rows - 3, 0),
+            (n_rows - 2, 0),
+            (n_rows - 1, 0),
+            (0, n_columns - 4),
+            (0, n_columns - 3),
+            (0, n_columns - 2),
+            (0, n_columns - 1),
+            (1, n_columns - 1),
+        ],
+        [
+            (n_rows - 3, 0),
+            (n_rows - 2, 0),
+            (n_rows - 1, 0),
+            (0, n_columns - 2),
+            (0, n_columns - 1),
+            (1, n_columns - 1),
+            (2, n_columns - 1),
+            (3, n_columns - 1),
+        ],
+        [
+            (n_rows - 1, 0),
+            (n_rows - 1, n_columns - 1),
+            (0, n_columns - 3),
+            (0, n_columns - 2),
+            (0, n_columns - 1),
+            (1, n_columns - 3),
+            (1, n_columns - 2),
+            (1, n_columns - 1),
+        ],
+    ]
+
+    codeword = 0
+    row = 4
+    column = 0
+    while row < n_rows or column < n_columns:
+        # Place a corner shape if the stripe starts at one
+        if row == n_rows and column == 0:
+            place_corner(corners[0], codeword)
+            codeword += 1
+        if row == n_rows - 2 and column == 0 and n_columns % 4:
+            place_corner(corners[1], codeword)
+            codeword += 1
+        if row == n_rows - 2 and column == 0 and n_columns % 8 == 4:
+            place_corner(corners[2], codeword)
+            codeword += 1
+        if row == n_rows + 4 and column == 2 and n_columns % 8 == 0:
+            place_corner(corners[3], codeword)
+            codeword += 1
+
+        # Sweep up and to the right
+        while True:
+            if 0 <= row < n_rows and 0 <= column < n_columns:
+                if region[row][column] is None:
+                    place_utah(row, column, codeword)
+                    codeword += 1
+            row -= 2
+            column += 2
+            if row < 0 or column >= n_columns:
+                break
+        row += 1
+        column += 3
+
+        # Sweep down and to the left
+        while True:
+            if 0 <= row < n_rows and 0 <= column < n_columns:
+                if region[row][column] is None:
+                    place_utah(row, column, codeword)
+                    codeword += 1
+            row += 2
+            column -= 2
+            if row >= n_rows or column < 0:
+                break
+        row += 3
+        column += 1
+
+    # Fill the unused bottom right corner with a fixed pattern
+    if region[n_rows - 1][n_columns - 1] is None:
+        region[n_rows - 1][n_columns - 1] = True
+        region[n_rows - 2][n_columns - 2] = True
+
+    return [[bool(module) for module in modules] for modules in region]
+
+
+def encode(data: str, n_rows: int = 8, n_columns: int = 18):
+    """
+    Encodes data as a Data Matrix symbol of the given size (one of SYMBOL_SIZES)
+    Returns the symbol as rows of booleans (True for dark modules), from the top row down
+    Raises a ValueError if the data does not fit in the symbol
+    """
+
+    if (n_rows, n_columns) not in SYMBOL_SIZES:
+        raise ValueError(
+            "Unsupported Data Matrix size: {}x{}".format(n_rows, n_columns)
+        )
+    n_data_codewords, n_error_codewords = SYMBOL_SIZES[(n_rows, n_columns)]
+
+    codewords = encode_ascii(data)
+    if len(codewords) > n_data_codewords:
+        raise ValueError(
+            "'{}' does not fit in a {}x{} Data Matrix".format(data, n_rows, n_columns)
+        )
+
+    codewords = add_padding(codewords, n_data_codewords)
+    codewords += get_error_codewords(codewords, n_error_codewords)
+
+    # The data region is surrounded by the finder pattern
+    region = place_codewords(codewords, n_rows - 2, n_columns - 2)
+
+    symbol = []
+    for row in range(n_rows):
+        modules = []
+        for column in range(n_columns):
+            if column == 0 or row == n_rows - 1:
+                # Solid left and bottom edges
+                modules.append(True)
+            elif row == 0:
+                # Alternating top edge, starting dark on the left
+                modules.append(column % 2 == 0)
+            elif column == n_columns - 1:
+                # Alternating right edge, starting light at the top
+                modules.append(row % 2 == 1)
+            else:
+                modules.append(region[row - 1][column - 1])
+        symbol.append(modules)
+
+    return symbol
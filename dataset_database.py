@@ -0,0 +1,335 @@
+# Author: Myles Scholz
+# Created on October 18, 2026
+# Description: Module that stores merged datasets in an SQLite database keyed by observation number
+import os
+import sqlite3
+
+import dataset_record as dsr
+
+
+# File Name Constants
+DATABASE_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+
+# Table Name Constants
+ROWS_TABLE = "observations"
+COLUMNS_TABLE = "columns"
+
+# Column Name Constants
+OBSERVATION_NUMBER = "Observation No."
+ALIAS = "iNaturalist Alias"
+SAMPLE_ID = "Sample ID"
+SPECIMEN_ID = "Specimen ID"
+DAY = "Collection Day 1"
+MONTH = "Month 1"
+YEAR = "Year 1"
+URL = "Associated plant - Inaturalist URL"
+
+# Columns compared by the duplicate rules (see full_merge_data.get_rule_keys)
+URL_KEY_FIELDS = [URL, SAMPLE_ID, SPECIMEN_ID]
+ALIAS_DATE_KEY_FIELDS = [ALIAS, DAY, MONTH, YEAR, SAMPLE_ID, SPECIMEN_ID]
+
+
+def is_database(dataset_path: str):
+    return dataset_path.lower().endswith(DATABASE_SUFFIXES)
+
+
+def quote(name: str):
+    # Quote a column name for use in SQL
+    return '"' + name.replace('"', '""') + '"'
+
+
+def connect(database_path: str):
+    # Open the database (changes are only committed at the end of each transaction)
+    connection = sqlite3.connect(database_path)
+    connection.execute("PRAGMA synchronous = NORMAL")
+    return connection
+
+
+def get_observation_number(observation_no: str):
+    # The numeric observation number of a row, or None if it is blank or not a number
+    try:
+        return int(observation_no)
+    except (TypeError, ValueError):
+        return None
+
+
+def read_fieldnames(connection: sqlite3.Connection):
+    """
+    Reads the dataset's column names (in the order of the CSV layout) from the database
+    Returns None if the database has no dataset yet
+    """
+
+    try:
+        cursor = connection.execute(
+            "SELECT name FROM {} ORDER BY position".format(COLUMNS_TABLE)
+        )
+    except sqlite3.OperationalError:
+        return None
+
+    fieldnames = [name for (name,) in cursor]
+    return fieldnames or None
+
+
+def create_dataset(connection: sqlite3.Connection, fieldnames: list):
+    """
+    Creates the tables and indexes for a dataset with the given columns if they do not exist
+    Returns the column names of the dataset in the database
+    """
+
+    existing_fieldnames = read_fieldnames(connection)
+    if existing_fieldnames is not None:
+        return existing_fieldnames
+
+    # One text column per CSV column, plus the numeric observation number that keys the rows
+    column_definitions = ", ".join(
+        "{} TEXT NOT NULL DEFAULT ''".format(quote(field)) for field in fieldnames
+    )
+    connection.execute(
+        "CREATE TABLE {} (observation_number INTEGER, {})".format(
+            ROWS_TABLE, column_definitions
+        )
+    )
+    connection.execute(
+        "CREATE TABLE {} (position INTEGER PRIMARY KEY, name TEXT)".format(
+            COLUMNS_TABLE
+        )
+    )
+    connection.executemany(
+        "INSERT INTO {} VALUES (?, ?)".format(COLUMNS_TABLE), enumerate(fieldnames)
+    )
+
+    # Rows are keyed (and sorted) by observation number, and looked up by the duplicate
+    # rules' columns
+    connection.execute(
+        "CREATE UNIQUE INDEX observation_number_index ON {} (observation_number)".format(
+            ROWS_TABLE
+        )
+    )
+    connection.execute(
+        "CREATE INDEX url_index ON {} ({})".format(
+            ROWS_TABLE, ", ".join(quote(field) for field in URL_KEY_FIELDS)
+        )
+    )
+    connection.execute(
+        "CREATE INDEX alias_date_index ON {} ({})".format(
+            ROWS_TABLE,
+            ", ".join(quote(field) for field in ALIAS_DATE_KEY_FIELDS + [URL]),
+        )
+    )
+
+    return fieldnames
+
+
+def insert_rows(connection: sqlite3.Connection, rows, fieldnames: list):
+    """
+    Inserts rows (dicts) into the dataset, skipping rows with an observation number that is
+    already in the dataset (duplicate rule 1)
+    """
+
+    statement = (
+        "INSERT INTO {} (observation_number, {}) VALUES (?, {}) "
+        "ON CONFLICT (observation_number) DO NOTHING".format(
+            ROWS_TABLE,
+            ", ".join(quote(field) for field in fieldnames),
+            ", ".join("?" for _ in fieldnames),
+        )
+    )
+
+    connection.executemany(
+        statement,
+        (
+            [get_observation_number(row.get(OBSERVATION_NUMBER))]
+            + [row.get(field) or "" for field in fieldnames]
+            for row in rows
+        ),
+    )
+
+
+def insert_row(connection: sqlite3.Connection, row: dict, fieldnames: list):
+    # Insert a single row and return its row ID
+    cursor = connection.execute(
+        "INSERT INTO {} (observation_number, {}) VALUES (?, {})".format(
+            ROWS_TABLE,
+            ", ".join(quote(field) for field in fieldnames),
+            ", ".join("?" for _ in fieldnames),
+        ),
+        [get_observation_number(row.get(OBSERVATION_NUMBER))]
+        + [row.get(field) or "" for field in fieldnames],
+    )
+    return cursor.lastrowid
+
+
+def row_exists(connection: sqlite3.Connection, conditions: dict):
+    # Check whether any row has all of the given column values (using the indexes)
+    where_clause = " AND ".join("{} = ?".format(quote(field)) for field in conditions)
+    cursor = connection.execute(
+        "SELECT 1 FROM {} WHERE {} LIMIT 1".format(ROWS_TABLE, where_clause),
+        list(conditions.values()),
+    )
+    return cursor.fetchone() is not None
+
+
+def is_duplicate(connection: sqlite3.Connection, row: dict):
+    """
+    Checks whether a row without an observation number matches a row in the dataset by
+    duplicate rule 2 (URL) or rule 3 (alias and date), with one indexed query per rule
+    """
+
+    alias_date_values = {field: row.get(field) or "" for field in ALIAS_DATE_KEY_FIELDS}
+
+    if row.get(URL):
+        # Rule 2: match rows that also have URLs on URL, Sample ID, and Specimen ID
+        if row_exists(
+            connection, {field: row.get(field) or "" for field in URL_KEY_FIELDS}
+        ):
+            return True
+
+        # Rule 3: match rows without URLs on alias, date, Sample ID, and Specimen ID
+        alias_date_values[URL] = ""
+
+    # Rule 3: match on alias, date, Sample ID, and Specimen ID
+    return row_exists(connection, alias_date_values)
+
+
+def get_max_observation_number(connection: sqlite3.Connection):
+    cursor = connection.execute(
+        "SELECT MAX(observation_number) FROM {}".format(ROWS_TABLE)
+    )
+    return cursor.fetchone()[0]
+
+
+def set_observation_numbers(connection: sqlite3.Connection, numbered_row_ids):
+    # Set the observation numbers of rows given as (observation number, row ID) pairs
+    connection.executemany(
+        "UPDATE {} SET observation_number = ?1, {} = CAST(?1 AS TEXT) "
+        "WHERE rowid = ?2".format(ROWS_TABLE, quote(OBSERVATION_NUMBER)),
+        numbered_row_ids,
+    )
+
+
+def count_rows_before(connection: sqlite3.Connection, observation_no: int):
+    # Count the rows that come before the given observation number in the dataset's order
+    cursor = connection.execute(
+        "SELECT COUNT(*) FROM {} WHERE observation_number < ?".format(ROWS_TABLE),
+        [observation_no],
+    )
+    return cursor.fetchone()[0]
+
+
+def iterate_values(
+    connection: sqlite3.Connection, fieldnames: list, starting_row=0, ending_row=None
+):
+    """
+    Yields the rows from starting_row (inclusive) to ending_row (exclusive, or the end if None)
+    as tuples of values in the order of fieldnames
+    Rows are ordered by observation number, followed by rows whose "Observation No." is not
+    a number (ordered by their "Observation No.")
+    """
+
+    columns = ", ".join(quote(field) for field in fieldnames)
+    limit = -1 if ending_row is None else max(ending_row - starting_row, 0)
+
+    # Rows with numeric observation numbers, in the order of their unique index
+    cursor = connection.execute(
+        "SELECT {} FROM {} WHERE observation_number IS NOT NULL "
+        "ORDER BY observation_number LIMIT ? OFFSET ?".format(columns, ROWS_TABLE),
+        [limit, starting_row],
+    )
+    n_rows = 0
+    for values in cursor:
+        yield values
+        n_rows += 1
+
+    if limit != -1 and n_rows >= limit:
+        return
+
+    # Rows with other observation numbers come last
+    n_numbered_rows = connection.execute(
+        "SELECT COUNT(*) FROM {} WHERE observation_number IS NOT NULL".format(
+            ROWS_TABLE
+        )
+    ).fetchone()[0]
+    cursor = connection.execute(
+        "SELECT {} FROM {} WHERE observation_number IS NULL "
+        "ORDER BY {}, rowid LIMIT ? OFFSET ?".format(
+            columns, ROWS_TABLE, quote(OBSERVATION_NUMBER)
+        ),
+        [
+            -1 if limit == -1 else limit - n_rows,
+            max(starting_row - n_numbered_rows, 0),
+        ],
+    )
+    yield from cursor
+
+
+def read_new_rows(
+    connection: sqlite3.Connection, fieldnames: list, first_observation_no: int
+):
+    # Read the rows numbered from first_observation_no on (the rows added by a merge) as records
+    cursor = connection.execute(
+        "SELECT {} FROM {} WHERE observation_number >= ? "
+        "ORDER BY observation_number".format(
+            ", ".join(quote(field) for field in fieldnames), ROWS_TABLE
+        ),
+        [first_observation_no],
+    )
+    return list(dsr.to_records(cursor, fieldnames))
+
+
+def get_row_count(database_path: str):
+    connection = connect(database_path)
+    try:
+        return connection.execute(
+            "SELECT COUNT(*) FROM {}".format(ROWS_TABLE)
+        ).fetchone()[0]
+    finally:
+        connection.close()
+
+
+def read_rows(database_path: str, starting_row: int, ending_row: int):
+    """
+    Reads the rows from starting_row (inclusive) to ending_row (exclusive) of a dataset
+    database as records
+    """
+
+    connection = connect(database_path)
+    try:
+        fieldnames = read_fieldnames(connection)
+        return list(
+            dsr.to_records(
+                iterate_values(connection, fieldnames, starting_row, ending_row),
+                fieldnames,
+            )
+        )
+    finally:
+        connection.close()
+
+
+def read_observations(database_path: str, observation_numbers):
+    """
+    Reads the rows of a dataset database with the given observation numbers as records, in
+    dataset order, looking up each one through the observation number index
+    """
+
+    numbers = sorted(set(map(get_observation_number, observation_numbers)) - {None})
+
+    connection = connect(database_path)
+    try:
+        fieldnames = read_fieldnames(connection)
+        query = "SELECT {} FROM {} WHERE observation_number = ?".format(
+            ", ".join(quote(field) for field in fieldnames), ROWS_TABLE
+        )
+
+        rows = []
+        for observation_no in numbers:
+            rows.extend(connection.execute(query, [observation_no]))
+        return list(dsr.to_records(rows, fieldnames))
+    finally:
+        connection.close()
+
+
+def remove_database(database_path: str):
+    # Remove a database file along with any journal SQLite left next to it
+    for suffix in ["", "-journal", "-wal", "-shm"]:
+        if os.path.isfile(database_path + suffix):
+            os.remove(database_path + suffix)
@@ -0,0 +1,186 @@
+# Author: Myles Scholz
+# Created on October 18, 2026
+# Description: Module that reads and writes index files for random access into merged datasets
+import array
+import csv
+import io
+import itertools
+import os
+import struct
+
+import numpy as np
+
+import row_io as rio
+
+
+# File Name Constant
+INDEX_SUFFIX = ".index"
+
+# Index file header: magic string, dataset file size, dataset modification time, and row count
+INDEX_HEADER_FORMAT = struct.Struct("<8sQqQ")
+INDEX_MAGIC = b"OBPIDX01"
+
+# Observation number stored for rows whose "Observation No." is blank or not a number
+NO_OBSERVATION_NUMBER = -1
+
+
+def get_index_path(dataset_file_path: str):
+    # The index is stored next to its dataset
+    return dataset_file_path + INDEX_SUFFIX
+
+
+def write_index(dataset_file_path: str, row_offsets, observation_numbers):
+    """
+    Writes an index file for a dataset with the byte offset and observation number of each row
+    row_offsets has one more entry than there are rows: the offset of the end of the file
+    """
+
+    dataset_stat = os.stat(dataset_file_path)
+    header = INDEX_HEADER_FORMAT.pack(
+        INDEX_MAGIC,
+        dataset_stat.st_size,
+        dataset_stat.st_mtime_ns,
+        len(observation_numbers),
+    )
+
+    with rio.open_replacing(get_index_path(dataset_file_path), "wb") as index_file:
+        index_file.write(header)
+        array.array("Q", row_offsets).tofile(index_file)
+        array.array("q", observation_numbers).tofile(index_file)
+
+
+def read_index(dataset_file_path: str):
+    """
+    Reads the index file of a dataset, returning the row offsets and observation numbers
+    Returns None if there is no index, it is corrupt, or the dataset has changed since it was written
+    """
+
+    index_path = get_index_path(dataset_file_path)
+    if not os.path.isfile(index_path) or not os.path.isfile(dataset_file_path):
+        return None
+
+    try:
+        with open(index_path, "rb") as index_file:
+            header = index_file.read(INDEX_HEADER_FORMAT.size)
+            if len(header) != INDEX_HEADER_FORMAT.size:
+                return None
+            magic, file_size, file_mtime_ns, n_rows = INDEX_HEADER_FORMAT.unpack(header)
+
+            # Check that the index describes the current version of the dataset
+            dataset_stat = os.stat(dataset_file_path)
+            if (
+                magic != INDEX_MAGIC
+                or file_size != dataset_stat.st_size
+                or file_mtime_ns != dataset_stat.st_mtime_ns
+            ):
+                return None
+
+            row_offsets = array.array("Q")
+            row_offsets.fromfile(index_file, n_rows + 1)
+            observation_numbers = array.array("q")
+            observation_numbers.fromfile(index_file, n_rows)
+    except (OSError, EOFError):
+        return None
+
+    return row_offsets, observation_numbers
+
+
+def read_header(dataset_file: io.BufferedReader):
+    # Read the column names from the first line of a dataset opened in binary mode
+    dataset_file.seek(0)
+    header_line = dataset_file.readline().decode(rio.ENCODING, errors=rio.ERRORS)
+    return next(csv.reader([header_line]))
+
+
+def read_rows(dataset_file_path: str, starting_row: int, ending_row: int):
+    """
+    Reads the rows from starting_row (inclusive) to ending_row (exclusive) of a dataset as records
+    Seeks directly to the rows if the dataset has a valid index; otherwise reads up to them
+    """
+
+    index = read_index(dataset_file_path)
+
+    if index is None:
+        # Without an index, parse the dataset from the start
+        rows = rio.iterate_records(dataset_file_path)
+        return list(itertools.islice(rows, starting_row, ending_row))
+
+    row_offsets, _ = index
+    ending_row = min(ending_row, len(row_offsets) - 1)
+    if starting_row >= ending_row:
+        return []
+
+    # Read only the bytes of the requested rows and parse them
+    with open(dataset_file_path, "rb") as dataset_file:
+        fieldnames = read_header(dataset_file)
+        dataset_file.seek(row_offsets[starting_row])
+        data = dataset_file.read(row_offsets[ending_row] - row_offsets[starting_row])
+
+    return rio.parse_records(data.decode(rio.ENCODING, errors=rio.ERRORS), fieldnames)
+
+
+def find_observation_rows(observation_numbers, requested_numbers):
+    """
+    Finds the row numbers (in dataset order) of the rows with any of the requested
+    observation numbers, given the observation number of each row from an index
+    Uses binary search, sorting the observation numbers first if they are not in order
+    """
+
+    numbers = np.frombuffer(observation_numbers, dtype=np.int64)
+    requested_numbers = np.array(sorted(requested_numbers), dtype=np.int64)
+
+    # Merges number rows in sort order, which keeps observation numbers in order unless new
+    # rows were sorted in among older ones
+    order = None
+    if np.any(numbers[1:] < numbers[:-1]):
+        order = np.argsort(numbers, kind="stable")
+        numbers = numbers[order]
+
+    # Find the range of rows with each requested number (observation numbers may repeat)
+    starts = np.searchsorted(numbers, requested_numbers, side="left")
+    ends = np.searchsorted(numbers, requested_numbers, side="right")
+    row_numbers = np.concatenate(
+        [np.arange(start, end) for start, end in zip(starts, ends)] + [[]]
+    ).astype(np.int64)
+
+    if order is not None:
+        row_numbers = order[row_numbers]
+    return np.sort(row_numbers).tolist()
+
+
+def read_observations(dataset_file_path: str, observation_numbers):
+    """
+    Reads the rows of a dataset with the given observation numbers as records, in dataset order
+    Seeks directly to the rows if the dataset has a valid index; otherwise reads every row
+    """
+
+    requested_numbers = set(
+        int(observation_no) for observation_no in observation_numbers
+    )
+    index = read_index(dataset_file_path)
+
+    if index is None:
+        # Without an index (e.g. after the dataset was edited), parse the dataset from the start
+        rows = []
+        for row in rio.iterate_records(dataset_file_path):
+            try:
+                if int(row.get("Observation No.")) in requested_numbers:
+                    rows.append(row)
+            except (TypeError, ValueError):
+                pass
+        return rows
+
+    row_offsets, row_observation_numbers = index
+    row_numbers = find_observation_rows(row_observation_numbers, requested_numbers)
+
+    # Seek to and parse each row
+    rows = []
+    with open(dataset_file_path, "rb") as dataset_file:
+        fieldnames = read_header(dataset_file)
+        for i in row_numbers:
+            dataset_file.seek(row_offsets[i])
+            data = dataset_file.read(row_offsets[i + 1] - row_offsets[i])
+            text = data.decode(rio.ENCODING, errors=rio.ERRORS)
+            rows.extend(rio.parse_records(text, fieldnames))
+
+    return rows
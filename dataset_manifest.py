@@ -0,0 +1,97 @@
+# Author: Myles Scholz
+# Created on October 18, 2026
+# Description: Module that reads and writes manifest files with precomputed statistics of merged datasets
+import hashlib
+import json
+import os
+
+import row_io as rio
+
+
+# File Name Constant
+MANIFEST_SUFFIX = ".manifest.json"
+
+# Manifest format version (increment when the statistics change)
+MANIFEST_VERSION = 1
+
+
+def get_manifest_path(dataset_file_path: str):
+    # The manifest is stored next to its dataset
+    return dataset_file_path + MANIFEST_SUFFIX
+
+
+def get_header_hash(fieldnames: list):
+    # Hash the dataset's column names so a manifest can be checked against its header
+    return hashlib.sha256("\n".join(fieldnames).encode("utf-8")).hexdigest()
+
+
+def get_checksum(manifest: dict):
+    # Hash the manifest's contents (excluding the checksum itself) in a canonical form
+    contents = {key: value for key, value in manifest.items() if key != "checksum"}
+    serialized = json.dumps(contents, sort_keys=True)
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+
+def write_manifest(dataset_file_path: str, statistics: dict):
+    """
+    Writes a manifest of the given dataset statistics next to the dataset
+    The manifest records the dataset's size and modification time so that it is ignored
+    once the dataset changes
+    """
+
+    dataset_stat = os.stat(dataset_file_path)
+
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "file_size": dataset_stat.st_size,
+        "file_mtime_ns": dataset_stat.st_mtime_ns,
+    }
+    manifest.update(statistics)
+    manifest["checksum"] = get_checksum(manifest)
+
+    with rio.open_replacing(
+        get_manifest_path(dataset_file_path), "w", encoding="utf-8"
+    ) as manifest_file:
+        json.dump(manifest, manifest_file, indent=4)
+
+
+def read_manifest(dataset_file_path: str):
+    """
+    Reads the manifest of the given dataset
+    Returns None if there is no manifest, it is corrupt, or the dataset has changed since it was written
+    """
+
+    manifest_path = get_manifest_path(dataset_file_path)
+    if not os.path.isfile(manifest_path) or not os.path.isfile(dataset_file_path):
+        return None
+
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as manifest_file:
+            manifest = json.load(manifest_file)
+    except (OSError, ValueError):
+        return None
+
+    # Check that the manifest is intact and describes the current version of the dataset
+    dataset_stat = os.stat(dataset_file_path)
+    if (
+        not isinstance(manifest, dict)
+        or manifest.get("version") != MANIFEST_VERSION
+        or manifest.get("checksum") != get_checksum(manifest)
+        or manifest.get("file_size") != dataset_stat.st_size
+        or manifest.get("file_mtime_ns") != dataset_stat.st_mtime_ns
+    ):
+        return None
+
+    return manifest
+
+
+def get_row_count(dataset_file_path: str):
+    """
+    Gets the number of rows in a dataset from its manifest, counting them if there is no valid manifest
+    """
+
+    manifest = read_manifest(dataset_file_path)
+    if manifest is not None:
+        return manifest["row_count"]
+
+    return sum(1 for _ in rio.iterate_rows(dataset_file_path))
@@ -0,0 +1,249 @@
+# Author: Myles Scholz
+# Created on October 18, 2026
+# Description: Module that reads and writes datasets as typed, columnar Parquet files (requires pyarrow)
+import itertools
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+import dataset_record as dsr
+import row_io as rio
+
+
+# File Name Constants
+PARQUET_SUFFIX = ".parquet"
+
+# Number of rows in each row group (the unit read when seeking to a range of rows)
+ROW_GROUP_SIZE = 64 * 1024
+
+# Column types, from most to least specific
+INT_TYPE = "int"
+FLOAT_TYPE = "float"
+STRING_TYPE = "string"
+
+
+def is_parquet(dataset_path: str):
+    return dataset_path.lower().endswith(PARQUET_SUFFIX)
+
+
+def check_pyarrow():
+    if pa is None:
+        raise ImportError("pyarrow must be installed to read or write Parquet files")
+
+
+def get_value_type(value: str, column_type: str):
+    """
+    Narrows a column's type (None if it has no values yet) to one that can store the given
+    value and turn it back into exactly the same string, so that every value in the column
+    round-trips (blank values are stored as nulls in any type)
+    """
+
+    if value == "" or column_type == STRING_TYPE:
+        return column_type
+
+    if column_type in (None, INT_TYPE):
+        try:
+            # Only canonical integers that fit in 64 bits (e.g. not "007" or "+5")
+            if str(int(value)) == value and -(2**63) <= int(value) < 2**63:
+                return INT_TYPE
+        except ValueError:
+            pass
+
+    if column_type in (None, FLOAT_TYPE):
+        try:
+            # Only floats that print back the same way (e.g. not "44.10" or "1e5")
+            if repr(float(value)) == value:
+                return FLOAT_TYPE
+        except ValueError:
+            pass
+
+    # Integers and floats are not mixed, since the integers would not print back the same way
+    return STRING_TYPE
+
+
+def infer_column_types(rows, n_columns: int):
+    # Find the most specific type of each column that stores all of its values losslessly
+    column_types = [None] * n_columns
+    for values in rows:
+        for i, value in enumerate(values):
+            column_types[i] = get_value_type(value, column_types[i])
+
+    # Columns with only blank values are stored as strings
+    return [column_type or STRING_TYPE for column_type in column_types]
+
+
+def get_schema(fieldnames: list, column_types: list):
+    # Integers and floats are stored as 64-bit numbers, and strings are dictionary-encoded
+    arrow_types = {
+        INT_TYPE: pa.int64(),
+        FLOAT_TYPE: pa.float64(),
+        STRING_TYPE: pa.dictionary(pa.int32(), pa.string()),
+    }
+    return pa.schema(
+        [
+            pa.field(field, arrow_types[column_type])
+            for field, column_type in zip(fieldnames, column_types)
+        ]
+    )
+
+
+def get_column_array(values: list, column_type: str):
+    # Convert a column of strings to an Arrow array of its type
+    if column_type == INT_TYPE:
+        return pa.array([int(v) if v else None for v in values], pa.int64())
+    if column_type == FLOAT_TYPE:
+        return pa.array([float(v) if v else None for v in values], pa.float64())
+    return pa.array(values, pa.string()).dictionary_encode()
+
+
+def write_rows(parquet_file_path: str, fieldnames: list, rows):
+    """
+    Writes rows (sequences of string values in the order of fieldnames) to a Parquet file
+    with typed columns; rows is read twice (once to find the column types), so it must be
+    a list or another iterable that can be iterated more than once
+    """
+
+    check_pyarrow()
+
+    column_types = infer_column_types(rows, len(fieldnames))
+    schema = get_schema(fieldnames, column_types)
+
+    with rio.replace_when_done(parquet_file_path) as temp_path, pq.ParquetWriter(
+        temp_path, schema
+    ) as writer:
+        iterator = iter(rows)
+        while True:
+            # Write the rows in row groups of ROW_GROUP_SIZE
+            batch = list(itertools.islice(iterator, ROW_GROUP_SIZE))
+            if not batch:
+                break
+
+            columns = [
+                get_column_array([values[i] for values in batch], column_type)
+                for i, column_type in enumerate(column_types)
+            ]
+            writer.write_table(pa.Table.from_arrays(columns, schema=schema))
+
+
+class CsvRows:
+    # The rows of a CSV file (as lists of values) that can be iterated more than once
+    def __init__(self, csv_file_path: str):
+        self.csv_file_path = csv_file_path
+
+    def __iter__(self):
+        return rio.iterate_rows(self.csv_file_path)
+
+
+def convert_csv(csv_file_path: str, parquet_file_path: str):
+    # Convert a CSV dataset to a Parquet file, reading the CSV file in two passes
+    write_rows(
+        parquet_file_path,
+        rio.read_fieldnames(csv_file_path),
+        CsvRows(csv_file_path),
+    )
+
+
+def get_column_strings(column):
+    # Convert an Arrow column back to the strings it was written from
+    if pa.types.is_floating(column.type):
+        return ["" if v is None else repr(v) for v in column.to_pylist()]
+    return ["" if v is None else str(v) for v in column.to_pylist()]
+
+
+def read_observations(
+    parquet_file_path: str, observation_numbers, columns: list = None
+):
+    """
+    Reads the rows of a Parquet file with the given observation numbers as records, in file
+    order (of only the given columns, if given, which must include "Observation No.")
+    """
+
+    check_pyarrow()
+
+    fieldnames = columns or pq.ParquetFile(parquet_file_path).schema_arrow.names
+    observation_no_column = fieldnames.index("Observation No.")
+    requested_numbers = set(
+        int(observation_no) for observation_no in observation_numbers
+    )
+
+    # Keep the rows whose observation numbers were requested
+    rows = []
+    for values in iterate_values(parquet_file_path, fieldnames):
+        try:
+            if int(values[observation_no_column]) in requested_numbers:
+                rows.append(values)
+        except (TypeError, ValueError):
+            pass
+
+    return list(dsr.to_records(rows, fieldnames))
+
+
+def iterate_values(parquet_file_path: str, columns: list = None):
+    # Yield the rows of a Parquet file as tuples of strings (of only the given columns, if given)
+    check_pyarrow()
+
+    parquet_file = pq.ParquetFile(parquet_file_path)
+    for batch in parquet_file.iter_batches(columns=columns):
+        yield from zip(*(get_column_strings(column) for column in batch.columns))
+
+
+def export_csv(parquet_file_path: str, csv_file_path: str):
+    # Convert a Parquet dataset back to a CSV file with the same columns and values
+    rio.write_rows(
+        csv_file_path,
+        read_fieldnames(parquet_file_path),
+        iterate_values(parquet_file_path),
+    )
+
+
+def read_fieldnames(parquet_file_path: str):
+    check_pyarrow()
+    return pq.ParquetFile(parquet_file_path).schema_arrow.names
+
+
+def get_row_count(parquet_file_path: str):
+    # The number of rows is stored in the file's metadata
+    check_pyarrow()
+    return pq.ParquetFile(parquet_file_path).metadata.num_rows
+
+
+def read_rows(
+    parquet_file_path: str, starting_row: int, ending_row: int, columns: list = None
+):
+    """
+    Reads the rows from starting_row (inclusive) to ending_row (exclusive) of a Parquet
+    file as records, reading only the row groups in the range and the given columns (if given)
+    """
+
+    check_pyarrow()
+
+    parquet_file = pq.ParquetFile(parquet_file_path)
+    fieldnames = columns or parquet_file.schema_arrow.names
+
+    rows = []
+    group_start = 0
+    for i in range(parquet_file.metadata.num_row_groups):
+        if group_start >= ending_row:
+            break
+
+        group_end = group_start + parquet_file.metadata.row_group(i).num_rows
+        if starting_row < group_end:
+            # Read the row group and keep only the rows in the range
+            table = parquet_file.read_row_group(i, columns=fieldnames)
+            table = table.slice(
+                max(starting_row - group_start, 0),
+                min(ending_row, group_end) - max(starting_row, group_start),
+            )
+            rows.extend(
+                dsr.to_records(
+                    zip(*(get_column_strings(column) for column in table.columns)),
+                    fieldnames,
+                )
+            )
+        group_start = group_end
+
+    return rows
@@ -0,0 +1,264 @@
+# Author: Myles Scholz
+# Created on October 18, 2026
+# Description: Module that reads, lists, and exports year-partitioned datasets (a directory with one sorted, indexed CSV file per "Year 1")
+import csv
+import glob
+import os
+import shutil
+
+import dataset_index as dsi
+import dataset_manifest as dsm
+import row_io as rio
+
+
+# File Name Constants
+PARTITION_PREFIX = "year_"
+PARTITION_SUFFIX = ".csv"
+
+# Partition name for rows whose "Year 1" is blank or not a number
+UNKNOWN_YEAR = "unknown"
+
+
+def is_partitioned(dataset_path: str):
+    # A partitioned dataset is a directory (a path ending with a separator names a new one)
+    return os.path.isdir(dataset_path) or dataset_path.endswith(("/", "\\"))
+
+
+def get_relative_path(dataset_path: str):
+    # Make a dataset path relative, keeping a trailing separator that marks a partitioned dataset
+    relative_path = os.path.relpath(dataset_path)
+    if dataset_path.endswith(("/", "\\")):
+        relative_path += os.sep
+    return relative_path
+
+
+def get_partition_name(year: str):
+    # Partitions are named by year; rows with unusable years share one partition
+    year = (year or "").strip()
+    return year if year.isdigit() else UNKNOWN_YEAR
+
+
+def get_partition_path(dataset_dir: str, partition_name: str):
+    return os.path.join(
+        dataset_dir, PARTITION_PREFIX + partition_name + PARTITION_SUFFIX
+    )
+
+
+def partition_order(partition_name: str):
+    # Sort partitions by year, with the unknown year last
+    if partition_name.isdigit():
+        return (0, int(partition_name))
+    return (1, partition_name)
+
+
+def list_partitions(dataset_dir: str):
+    """
+    Lists the partitions of a partitioned dataset as (name, file path) pairs in year order
+    """
+
+    partitions = []
+    pattern = os.path.join(dataset_dir, PARTITION_PREFIX + "*" + PARTITION_SUFFIX)
+    for path in glob.glob(pattern):
+        file_name = os.path.basename(path)
+        name = file_name[len(PARTITION_PREFIX) : -len(PARTITION_SUFFIX)]
+        partitions.append((name, path))
+
+    partitions.sort(key=lambda partition: partition_order(partition[0]))
+    return partitions
+
+
+def copy_partition(source_path: str, destination_path: str):
+    # Copy a partition with its index and manifest (copy2 keeps the modification time they check)
+    shutil.copy2(source_path, destination_path)
+    for suffix in [dsi.INDEX_SUFFIX, dsm.MANIFEST_SUFFIX]:
+        if os.path.isfile(source_path + suffix):
+            shutil.copy2(source_path + suffix, destination_path + suffix)
+
+
+def remove_partition(path: str):
+    # Remove a partition with its index and manifest
+    for file_path in [path, path + dsi.INDEX_SUFFIX, path + dsm.MANIFEST_SUFFIX]:
+        if os.path.isfile(file_path):
+            os.remove(file_path)
+
+
+def read_fieldnames(dataset_path: str):
+    """
+    Reads the column names of a dataset (a CSV file or a partitioned dataset)
+    Returns None for a partitioned dataset with no partitions
+    """
+
+    if is_partitioned(dataset_path):
+        partitions = (
+            list_partitions(dataset_path) if os.path.isdir(dataset_path) else []
+        )
+        if not partitions:
+            return None
+        dataset_path = partitions[0][1]
+
+    return rio.read_fieldnames(dataset_path)
+
+
+def get_row_count(dataset_path: str):
+    # Count the rows of a dataset (a CSV file or a partitioned dataset) from manifests if possible
+    if not is_partitioned(dataset_path):
+        return dsm.get_row_count(dataset_path)
+
+    return sum(dsm.get_row_count(path) for _, path in list_partitions(dataset_path))
+
+
+def get_max_observation_number(dataset_file_path: str):
+    """
+    Gets the largest numeric "Observation No." in a dataset file from its manifest or index,
+    reading the file if it has neither; returns None if the file has no observation numbers
+    """
+
+    manifest = dsm.read_manifest(dataset_file_path)
+    if manifest is not None:
+        return manifest["max_observation_number"]
+
+    index = dsi.read_index(dataset_file_path)
+    if index is not None:
+        _, observation_numbers = index
+        numbers = [n for n in observation_numbers if n != dsi.NO_OBSERVATION_NUMBER]
+    else:
+        numbers = []
+        for row in rio.iterate_records(dataset_file_path):
+            try:
+                numbers.append(int(row["Observation No."]))
+            except (ValueError, KeyError):
+                pass
+
+    return max(numbers) if numbers else None
+
+
+def read_rows(dataset_path: str, starting_row: int, ending_row: int):
+    """
+    Reads the rows from starting_row (inclusive) to ending_row (exclusive) of a dataset as records
+    Rows of a partitioned dataset are numbered through its partitions in year order
+    """
+
+    if not is_partitioned(dataset_path):
+        return dsi.read_rows(dataset_path, starting_row, ending_row)
+
+    # Read the part of the range that falls in each partition
+    rows = []
+    partition_start = 0
+    for _, path in list_partitions(dataset_path):
+        if partition_start >= ending_row:
+            break
+
+        partition_end = partition_start + dsm.get_row_count(path)
+        if starting_row < partition_end:
+            rows.extend(
+                dsi.read_rows(
+                    path,
+                    max(starting_row - partition_start, 0),
+                    min(ending_row, partition_end) - partition_start,
+                )
+            )
+        partition_start = partition_end
+
+    return rows
+
+
+def read_observations(dataset_path: str, observation_numbers):
+    """
+    Reads the rows of a dataset (a CSV file or a partitioned dataset) with the given
+    observation numbers as records, in dataset order
+    """
+
+    if not is_partitioned(dataset_path):
+        return dsi.read_observations(dataset_path, observation_numbers)
+
+    rows = []
+    for _, path in list_partitions(dataset_path):
+        rows.extend(dsi.read_observations(path, observation_numbers))
+    return rows
+
+
+def iterate_rows(dataset_dir: str):
+    # Yield every row of a partitioned dataset as a record, partition by partition in year order
+    for _, path in list_partitions(dataset_dir):
+        yield from rio.iterate_records(path)
+
+
+def export_dataset(dataset_dir: str, output_file_path: str):
+    """
+    Exports a partitioned dataset to a single CSV file with its partitions in year order,
+    copying their bytes directly and combining their indexes and manifests
+    """
+
+    partitions = list_partitions(dataset_dir)
+    header_line = None
+    offset = 0
+    row_offsets = []
+    observation_numbers = []
+    indexed = True
+    row_count = 0
+    max_observation_no = None
+    year_ranges = {}
+
+    with rio.open_replacing(output_file_path, "wb") as output_file:
+        for _, path in partitions:
+            index = dsi.read_index(path)
+            manifest = dsm.read_manifest(path)
+
+            with open(path, "rb") as partition_file:
+                # Every partition must have the same header, which is written once
+                partition_header = partition_file.readline()
+                if header_line is None:
+                    header_line = partition_header
+                    offset += output_file.write(header_line)
+                elif partition_header != header_line:
+                    raise ValueError("'{}' has a different header".format(path))
+
+                # Shift the partition's row offsets to where its rows start in the export
+                if index is not None:
+                    partition_offsets, partition_numbers = index
+                    shift = offset - len(partition_header)
+                    row_offsets.extend(o + shift for o in partition_offsets[:-1])
+                    observation_numbers.extend(partition_numbers)
+                else:
+                    indexed = False
+
+                # Shift the partition's year ranges by the number of rows before it
+                if manifest is not None:
+                    if manifest["max_observation_number"] is not None and (
+                        max_observation_no is None
+                        or manifest["max_observation_number"] > max_observation_no
+                    ):
+                        max_observation_no = manifest["max_observation_number"]
+                    for year, year_range in manifest["year_ranges"].items():
+                        year_ranges[year] = {
+                            "first_row": year_range["first_row"] + row_count,
+                            "last_row": year_range["last_row"] + row_count,
+                            "row_count": year_range["row_count"],
+                        }
+                    row_count += manifest["row_count"]
+                else:
+                    indexed = False
+
+                # Copy the partition's rows
+                shutil.copyfileobj(partition_file, output_file)
+                offset = output_file.tell()
+
+    # Combine the indexes and manifests if every partition had them
+    if indexed and header_line is not None:
+        row_offsets.append(offset)
+        dsi.write_index(output_file_path, row_offsets, observation_numbers)
+
+        fieldnames = next(
+            csv.reader([header_line.decode(rio.ENCODING, errors=rio.ERRORS)])
+        )
+        dsm.write_manifest(
+            output_file_path,
+            {
+                "row_count": row_count,
+                "max_observation_number": max_observation_no,
+                # Partitions are in year order, which is not the merge's sort order
+                "sorted": False,
+                "header_hash": dsm.get_header_hash(fieldnames),
+                "year_ranges": year_ranges,
+            },
+        )
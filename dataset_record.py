@@ -0,0 +1,154 @@
+# Author: Myles Scholz
+# Created on October 18, 2026
+# Description: Module that stores dataset rows as compact records with a class generated from the dataset's columns
+import functools
+import keyword
+import re
+
+
+class Record:
+    """
+    Base class of dataset rows, which store their values in a single list in the order of
+    the dataset's columns (the CSV row layout) instead of a dict per row
+    Values can be read and set by column name ("Dec. Lat."), attribute name (dec_lat), or
+    column index, and the dict methods used on rows (get, keys, values, items) are supported
+    """
+
+    __slots__ = ("_values",)
+
+    # Set by get_record_class for each dataset layout
+    fieldnames = ()
+    indexes = {}
+
+    def __init__(self, values: list):
+        self._values = values
+
+    def __getitem__(self, key):
+        return self._values[self.indexes[key]]
+
+    def __setitem__(self, key, value):
+        self._values[self.indexes[key]] = value
+
+    def __contains__(self, key):
+        return key in self.indexes
+
+    def __iter__(self):
+        return iter(self.fieldnames)
+
+    def __len__(self):
+        return len(self.fieldnames)
+
+    def __eq__(self, other):
+        # Records are equal to records or dicts with the same columns and values
+        if isinstance(other, Record):
+            return self.fieldnames == other.fieldnames and self._values == list(
+                other._values
+            )
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "{}({!r})".format(type(self).__name__, self.to_dict())
+
+    def __reduce__(self):
+        # Records are pickled by their columns and values, since their classes are generated
+        return make_record, (self.fieldnames, self._values)
+
+    def get(self, key, default=None):
+        index = self.indexes.get(key)
+        if index is None:
+            return default
+        return self._values[index]
+
+    def keys(self):
+        return self.fieldnames
+
+    def values(self):
+        # The values in the order of the columns (not a copy)
+        return self._values
+
+    def items(self):
+        return zip(self.fieldnames, self._values)
+
+    def to_dict(self):
+        return dict(zip(self.fieldnames, self._values))
+
+
+def get_attribute_name(field: str):
+    # Convert a column name to an attribute name (e.g. "Collector - First Name" -> "collector_first_name")
+    name = re.sub(r"\W+", "_", field.lower()).strip("_")
+    if not name or name[0].isdigit() or keyword.iskeyword(name):
+        name = "column_" + name
+    return name
+
+
+def make_property(index: int):
+    # Create an attribute that reads and sets the value at the given column index
+    def get_value(record):
+        return record._values[index]
+
+    def set_value(record, value):
+        record._values[index] = value
+
+    return property(get_value, set_value)
+
+
+@functools.lru_cache(maxsize=None)
+def get_record_class(fieldnames: tuple):
+    """
+    Generates (once per dataset layout, usually the header_format.txt layout) a record class
+    for rows with the given columns, with an attribute for each column and a lookup table
+    from column names, attribute names, and column indexes to positions in the row
+    """
+
+    indexes = {}
+    namespace = {"__slots__": (), "fieldnames": fieldnames, "indexes": indexes}
+
+    for i, field in enumerate(fieldnames):
+        indexes[i] = i
+        indexes.setdefault(field, i)
+
+        # Skip attribute names that are taken (by Record's methods or an earlier column)
+        attribute = get_attribute_name(field)
+        if attribute not in namespace and not hasattr(Record, attribute):
+            namespace[attribute] = make_property(i)
+            indexes.setdefault(attribute, i)
+
+    return type("Record", (Record,), namespace)
+
+
+def fit_values(values, n_fields: int):
+    # Convert values to a list of exactly n_fields values, padding short rows with empty
+    # strings and dropping values past the last column
+    if values.__class__ is not list:
+        values = list(values)
+    if len(values) < n_fields:
+        values += [""] * (n_fields - len(values))
+    elif len(values) > n_fields:
+        del values[n_fields:]
+    return values
+
+
+def make_record(fieldnames, values):
+    # Create a record from a sequence of values in the order of fieldnames
+    return get_record_class(tuple(fieldnames))(fit_values(values, len(fieldnames)))
+
+
+def to_records(rows, fieldnames):
+    # Convert rows of values in the order of fieldnames to records, skipping blank lines
+    record_class = get_record_class(tuple(fieldnames))
+    n_fields = len(fieldnames)
+
+    for values in rows:
+        if values:
+            yield record_class(fit_values(values, n_fields))
+
+
+def from_dicts(rows, fieldnames):
+    # Convert row dicts to records with the given columns (missing values become empty strings)
+    record_class = get_record_class(tuple(fieldnames))
+    for row in rows:
+        yield record_class([row.get(field, "") for field in fieldnames])
@@ -0,0 +1,83 @@
+# Author: Myles Scholz
+# Created on October 18, 2026
+# Description: Module that hashes row keys into 64-bit digests and creates the sets used to detect duplicate rows
+import hashlib
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+
+# Number of bit positions set in the Bloom filter for each digest
+BLOOM_HASHES = 4
+
+
+def get_digest(text: str):
+    """
+    Hashes a string into a non-zero 64-bit integer digest
+    Uses xxHash if it is installed, otherwise BLAKE2b truncated to 64 bits
+    """
+
+    data = text.encode("utf-8")
+
+    if xxhash is not None:
+        digest = xxhash.xxh3_64_intdigest(data)
+    else:
+        digest = int.from_bytes(
+            hashlib.blake2b(data, digest_size=8).digest(), byteorder="little"
+        )
+
+    # Zero marks a missing key in arrays of digests, so never return it
+    return digest or 1
+
+
+def create_digest_set(bloom_bits: int = 0):
+    """
+    Creates a set for 64-bit digests (from get_digest): a built-in set of ints, which takes
+    about half the memory of one of hex strings, or a BloomDigestSet if bloom_bits is positive
+    """
+
+    if bloom_bits > 0:
+        return BloomDigestSet(bloom_bits)
+    return set()
+
+
+class BloomDigestSet(set):
+    """
+    A set of 64-bit digests that checks a Bloom filter before searching the set
+    """
+
+    def __init__(self, bloom_bits: int):
+        super().__init__()
+
+        # The Bloom filter, which can rule out most digests not in the set
+        self.bloom_bits = bloom_bits
+        self.bloom = bytearray((bloom_bits + 7) // 8)
+
+    def __contains__(self, digest: int):
+        # Rule out the digest with the Bloom filter if possible
+        if not self.bloom_contains(digest):
+            return False
+        return super().__contains__(digest)
+
+    def add(self, digest: int):
+        super().add(digest)
+        self.bloom_add(digest)
+
+    def bloom_positions(self, digest: int):
+        # Derive BLOOM_HASHES bit positions from the two halves of the digest (double hashing)
+        low = digest & 0xFFFFFFFF
+        high = (digest >> 32) | 1
+        return [(low + i * high) % self.bloom_bits for i in range(BLOOM_HASHES)]
+
+    def bloom_add(self, digest: int):
+        for position in self.bloom_positions(digest):
+            self.bloom[position >> 3] |= 1 << (position & 7)
+
+    def bloom_contains(self, digest: int):
+        for position in self.bloom_positions(digest):
+            if not self.bloom[position >> 3] & (1 << (position & 7)):
+                return False
+
+        return True
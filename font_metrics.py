@@ -0,0 +1,284 @@
+# Author: Myles Scholz
+# Created on October 19, 2026
+# Description: Module that parses TrueType fonts once and measures and lays out text with their metrics in pure Python
+import functools
+import math
+import struct
+
+
+class TrueTypeFont:
+    """
+    A TrueType font file parsed for embedding in a PDF and measuring text: its PostScript
+    name, metrics, character map, and the advance width and bounding box of each glyph
+    (in font units), along with the metrics of each character in points per point of font
+    size so that text can be measured without looking up glyphs
+    """
+
+    def __init__(self, font_file_path: str):
+        with open(font_file_path, "rb") as font_file:
+            self.data = font_file.read()
+
+        tables = read_table_directory(self.data)
+
+        # Global metrics
+        head = tables["head"]
+        self.units_per_em = struct.unpack_from(">H", self.data, head + 18)[0]
+        self.bbox = struct.unpack_from(">4h", self.data, head + 36)
+        loca_format = struct.unpack_from(">h", self.data, head + 50)[0]
+
+        hhea = tables["hhea"]
+        self.ascent, self.descent = struct.unpack_from(">2h", self.data, hhea + 4)
+        n_h_metrics = struct.unpack_from(">H", self.data, hhea + 34)[0]
+        n_glyphs = struct.unpack_from(">H", self.data, tables["maxp"] + 4)[0]
+
+        post = tables["post"]
+        angle, fraction = struct.unpack_from(">hH", self.data, post + 4)
+        self.italic_angle = angle + fraction / 65536
+
+        os2 = tables["OS/2"]
+        self.cap_height = self.ascent
+        if struct.unpack_from(">H", self.data, os2)[0] >= 2:
+            self.cap_height = struct.unpack_from(">h", self.data, os2 + 88)[0]
+
+        self.name = read_postscript_name(self.data, tables["name"])
+
+        # Advance width of each glyph (glyphs past the last metric use its width)
+        advances = struct.unpack_from(
+            ">{}H".format(2 * n_h_metrics), self.data, tables["hmtx"]
+        )[::2]
+        self.advances = list(advances) + [advances[-1]] * (n_glyphs - n_h_metrics)
+
+        # Bounding box of each glyph's outline (None for glyphs without one, like spaces)
+        if loca_format == 0:
+            offsets = [
+                2 * offset
+                for offset in struct.unpack_from(
+                    ">{}H".format(n_glyphs + 1), self.data, tables["loca"]
+                )
+            ]
+        else:
+            offsets = struct.unpack_from(
+                ">{}I".format(n_glyphs + 1), self.data, tables["loca"]
+            )
+        self.boxes = [
+            (
+                struct.unpack_from(">4h", self.data, tables["glyf"] + offsets[i] + 2)
+                if offsets[i + 1] > offsets[i]
+                else None
+            )
+            for i in range(n_glyphs)
+        ]
+
+        self.glyph_ids = read_character_map(self.data, tables["cmap"])
+
+        # Advance width, bottom, and top of each character in the character map, in points
+        # per point of font size
+        self.advance_widths = {}
+        self.bottoms = {}
+        self.tops = {}
+        for code in self.glyph_ids:
+            self.add_character(chr(code))
+
+        # Lines are at least as tall as "lp" (as in matplotlib), in points per point
+        _, self.line_height, self.line_descent = measure_line(self, "lp", 1)
+
+    def get_glyph_id(self, character: str):
+        # Glyph 0 is the font's "missing character" glyph
+        return self.glyph_ids.get(ord(character), 0)
+
+    def add_character(self, character: str):
+        # Store the metrics of a character's glyph (with the origin as the bottom and top of
+        # glyphs without outlines), so characters missing from the font measure as glyph 0
+        glyph_id = self.get_glyph_id(character)
+        box = self.boxes[glyph_id] or (0, 0, 0, 0)
+        self.advance_widths[character] = self.advances[glyph_id] / self.units_per_em
+        self.bottoms[character] = box[1] / self.units_per_em
+        self.tops[character] = box[3] / self.units_per_em
+
+
+def read_table_directory(data: bytes):
+    # Find the offset of each table in a TrueType font file
+    n_tables = struct.unpack_from(">H", data, 4)[0]
+    tables = {}
+    for i in range(n_tables):
+        tag, _, offset, _ = struct.unpack_from(">4sIII", data, 12 + 16 * i)
+        tables[tag.decode("latin-1")] = offset
+
+    return tables
+
+
+def read_postscript_name(data: bytes, name_offset: int):
+    # Read the PostScript name (name ID 6) from the name table
+    _, count, string_offset = struct.unpack_from(">3H", data, name_offset)
+    for i in range(count):
+        platform, _, _, name_id, length, offset = struct.unpack_from(
+            ">6H", data, name_offset + 6 + 12 * i
+        )
+        if name_id != 6:
+            continue
+
+        start = name_offset + string_offset + offset
+        encoding = "utf-16-be" if platform in (0, 3) else "latin-1"
+        return data[start : start + length].decode(encoding)
+
+    return "Font"
+
+
+def read_character_map(data: bytes, cmap_offset: int):
+    """
+    Reads the Windows Unicode (format 4) character map of the cmap table
+    Returns a dict from each character code to its glyph ID
+    """
+
+    _, n_subtables = struct.unpack_from(">2H", data, cmap_offset)
+    for i in range(n_subtables):
+        platform, encoding, offset = struct.unpack_from(
+            ">2HI", data, cmap_offset + 4 + 8 * i
+        )
+        subtable = cmap_offset + offset
+        if (platform, encoding) == (3, 1) and struct.unpack_from(">H", data, subtable)[
+            0
+        ] == 4:
+            break
+    else:
+        raise ValueError("The font does not have a Unicode character map")
+
+    n_segments = struct.unpack_from(">H", data, subtable + 6)[0] // 2
+    end_codes_offset = subtable + 14
+    start_codes_offset = end_codes_offset + 2 * n_segments + 2
+    deltas_offset = start_codes_offset + 2 * n_segments
+    range_offsets_offset = deltas_offset + 2 * n_segments
+
+    end_codes = struct.unpack_from(">{}H".format(n_segments), data, end_codes_offset)
+    start_codes = struct.unpack_from(
+        ">{}H".format(n_segments), data, start_codes_offset
+    )
+    deltas = struct.unpack_from(">{}h".format(n_segments), data, deltas_offset)
+    range_offsets = struct.unpack_from(
+        ">{}H".format(n_segments), data, range_offsets_offset
+    )
+
+    glyph_ids = {}
+    for i in range(n_segments):
+        for code in range(start_codes[i], min(end_codes[i], 0xFFFE) + 1):
+            if range_offsets[i] == 0:
+                glyph_id = (code + deltas[i]) % 65536
+            else:
+                # The glyph ID is read from the glyph array that follows the range offsets
+                address = (
+                    range_offsets_offset
+                    + 2 * i
+                    + range_offsets[i]
+                    + 2 * (code - start_codes[i])
+                )
+                glyph_id = struct.unpack_from(">H", data, address)[0]
+                if glyph_id:
+                    glyph_id = (glyph_id + deltas[i]) % 65536
+            if glyph_id:
+                glyph_ids[code] = glyph_id
+
+    return glyph_ids
+
+
+@functools.lru_cache(maxsize=None)
+def get_font(font_file_path: str):
+    # Parse each font file once
+    return TrueTypeFont(font_file_path)
+
+
+def measure_line(font: TrueTypeFont, line: str, size: float):
+    """
+    Measures a line of text like matplotlib: its width (the advance widths of its characters),
+    the height of the box around its glyphs' outlines, and its descent below the baseline,
+    in points
+    """
+
+    if not line:
+        return 0, 0, 0
+
+    try:
+        width = sum(map(font.advance_widths.__getitem__, line))
+    except KeyError:
+        # Add the characters that are not in the font's character map
+        for character in set(line) - font.advance_widths.keys():
+            font.add_character(character)
+        width = sum(map(font.advance_widths.__getitem__, line))
+
+    bottom = min(map(font.bottoms.__getitem__, line))
+    top = max(map(font.tops.__getitem__, line))
+
+    return width * size, (top - bottom) * size, -bottom * size
+
+
+def measure_text(font: TrueTypeFont, text: str, size: float, line_height: float = 1.0):
+    """
+    Measures lines of text like matplotlib (with lines at least as tall as "lp" and spaced
+    by line_height)
+    Returns the width and height of the text and the baseline of each line below its top,
+    in points
+    """
+
+    min_height = font.line_height * size
+    min_descent = font.line_descent * size
+    min_spacing = (min_height - min_descent) * line_height
+
+    width = 0
+    baselines = []
+    y = 0
+    for i, line in enumerate(text.split("\n")):
+        line_width, height, descent = measure_line(font, line, size)
+        height = max(height, min_height)
+        descent = max(descent, min_descent)
+        width = max(width, line_width)
+
+        if i == 0:
+            y = -(height - descent)
+        else:
+            y -= max(min_spacing, (height - descent) * line_height)
+        baselines.append(y)
+        y -= descent
+
+    return width, -y, baselines
+
+
+def layout_text(
+    font: TrueTypeFont,
+    text: str,
+    size: float,
+    line_height: float = 1.0,
+    alignment: str = "bottom",
+    rotation: float = 0,
+):
+    """
+    Lays out lines of text the way matplotlib does for wrapped figure text (which is aligned
+    before it is rotated about the anchor point) with left alignment, the given vertical
+    alignment (top or bottom), and rotation (in degrees)
+    Returns the position of each line's baseline origin and the text's bounding box
+    (x0, y0, x1, y1), both relative to the anchor point, in points
+    """
+
+    lines = text.split("\n")
+    width, height, baselines = measure_text(font, text, size, line_height)
+    y = -height
+
+    # Align the box (with its top left corner at the origin) to the anchor point, then
+    # rotate it about the anchor point
+    offset_y = 0 if alignment == "top" else y
+    angle = math.radians(rotation)
+    cos, sin = math.cos(angle), math.sin(angle)
+
+    def rotate(x, y):
+        return x * cos - y * sin, x * sin + y * cos
+
+    corners = [
+        rotate(x, y - offset_y) for x, y in [(0, 0), (width, 0), (width, y), (0, y)]
+    ]
+    bbox = (
+        min(x for x, _ in corners),
+        min(y for _, y in corners),
+        max(x for x, _ in corners),
+        max(y for _, y in corners),
+    )
+    positions = [rotate(0, baseline - offset_y) for baseline in baselines]
+
+    return list(zip(lines, positions)), bbox
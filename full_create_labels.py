@@ -3,26 +3,50 @@
 # Description: Module that creates bee specimen labels for new entries in the Oregon Bee Atlas database
 import csv
 import datetime
+import functools
+import math
 import os
 import traceback
 import tkinter as tk
 from tkinter import filedialog
 
 import textwrap as tw
-import matplotlib as mpl
-import matplotlib.pyplot as plt
-from matplotlib.image import BboxImage
-from matplotlib.transforms import Bbox, TransformedBbox
-from matplotlib.backends.backend_pdf import PdfPages
-import treepoem as tp
 import numpy as np
 from tqdm import tqdm
 
+try:
+    import matplotlib as mpl
+    import matplotlib.pyplot as plt
+    from matplotlib.image import BboxImage
+    from matplotlib.transforms import Bbox, TransformedBbox
+    from matplotlib.backends.backend_pdf import PdfPages
+except ImportError:
+    mpl = None
+    plt = None
+    BboxImage = Bbox = TransformedBbox = PdfPages = None
+
+try:
+    import treepoem as tp
+except ImportError:
+    tp = None
+
+import data_matrix as dmx
+import dataset_database as ddb
+import dataset_parquet as dpq
+import dataset_partitions as dsp
+import font_metrics as fm
+import full_validate_data as fvd
+import label_pdf as lpdf
+
 
 # File Name Constants
 LABELS_CONFIG_FILE = "config/labels_config.csv"
 LOG_FILE = "log_file.txt"
 
+# Label renderer: "pdf" writes the PDF's content directly, and "matplotlib" draws each
+# page as a matplotlib figure (much slower; requires matplotlib, treepoem, and Ghostscript)
+LABEL_RENDERER = "pdf"
+
 # PDF Layout Constants
 LETTER_WIDTH = 8.5
 LETTER_HEIGHT = 11
@@ -49,6 +73,11 @@ VERTICAL_SPACING = (LETTER_HEIGHT - (2 * VERTICAL_MARGIN) - (N_ROWS * LABEL_HEIG
 # Theshold that text should not cross to avoid overlapping with data matrix
 TEXT_CUTOFF = 0.466
 
+# Text is shrunk to fit left of the cutoff in steps of FONT_SIZE_STEP points, down to at
+# most MIN_FONT_SIZE points
+FONT_SIZE_STEP = 0.1
+MIN_FONT_SIZE = 1
+
 # Object containing text box formatting and layout presets
 TEXT_BOXES = {
     "location": {  # Collection Location
@@ -108,6 +137,7 @@ DATA_MATRIX = {
     "x_position": LABEL_WIDTH - 0.185,
     "y_position": 0.005,
     "width": 0.10,
+    "size": (8, 18),  # Rows and columns of modules (before rotating)
 }
 
 
@@ -139,6 +169,26 @@ ELEVATION = "Elevation"
 # Collection Method
 METHOD = "Collection method"
 
+# Columns printed on labels (the only columns read from columnar datasets)
+LABEL_FIELDS = [
+    OBSERVATION_NUMBER,
+    FIRST_INITIAL,
+    LAST_NAME,
+    SAMPLE_ID,
+    SPECIMEN_ID,
+    DAY,
+    MONTH,
+    YEAR,
+    COUNTRY,
+    STATE,
+    COUNTY,
+    PLACE,
+    LATITUDE,
+    LONGITUDE,
+    ELEVATION,
+    METHOD,
+]
+
 
 def get_labels_config():
     # Read LABELS_CONFIG_FILE to get the output file path and starting and ending rows
@@ -148,6 +198,35 @@ def get_labels_config():
     return labels_config
 
 
+def get_dataset_length(dataset_file_path: str):
+    # Get the number of rows in the dataset (from its metadata or manifests if possible)
+    if ddb.is_database(dataset_file_path):
+        return ddb.get_row_count(dataset_file_path)
+    if dpq.is_parquet(dataset_file_path):
+        return dpq.get_row_count(dataset_file_path)
+    return dsp.get_row_count(dataset_file_path)
+
+
+def read_dataset_rows(dataset_file_path: str, starting_row: int, ending_row: int):
+    # Read only the rows from the starting row to the ending row of the dataset
+    if ddb.is_database(dataset_file_path):
+        return ddb.read_rows(dataset_file_path, starting_row, ending_row)
+    if dpq.is_parquet(dataset_file_path):
+        return dpq.read_rows(dataset_file_path, starting_row, ending_row, LABEL_FIELDS)
+    return dsp.read_rows(dataset_file_path, starting_row, ending_row)
+
+
+def read_dataset_observations(dataset_file_path: str, observation_numbers: list):
+    # Read only the rows of the dataset with the given observation numbers
+    if ddb.is_database(dataset_file_path):
+        return ddb.read_observations(dataset_file_path, observation_numbers)
+    if dpq.is_parquet(dataset_file_path):
+        return dpq.read_observations(
+            dataset_file_path, observation_numbers, LABEL_FIELDS
+        )
+    return dsp.read_observations(dataset_file_path, observation_numbers)
+
+
 def write_labels_config(labels_config):
     # Open LABELS_CONFIG_FILE to write updated output file path
     labels_config_header = ["Output File Path", "Starting Row"]
@@ -278,6 +357,12 @@ def confirm_row_range(init_starting_row: int, data_length: int):
     return starting_row, ending_row
 
 
+@functools.lru_cache(maxsize=None)
+def get_font_properties(font_file: str):
+    # Create the matplotlib font properties of each font file once
+    return mpl.font_manager.FontProperties(fname=font_file)
+
+
 def add_text_box(figure, basis_x, basis_y, text, box_type):
     """
     Adds a text box directly to the given figure (no plots used)
@@ -285,15 +370,17 @@ def add_text_box(figure, basis_x, basis_y, text, box_type):
     # Fetch the specified text box layout and formatting preset
     box_obj = TEXT_BOXES[box_type]
 
-    font_properties = mpl.font_manager.FontProperties(fname=box_obj["font_file"])
+    # Resize text to fit left of the cutoff, measuring it with the cached font metrics
+    # instead of the figure's renderer
+    font_size, _ = fit_text(fm.get_font(box_obj["font_file"]), text, box_obj)
 
     # Add the text box
-    text = figure.text(
+    figure.text(
         basis_x + box_obj["x_position"],
         basis_y + box_obj["y_position"],
         text,
-        size=box_obj["font_size"],
-        font_properties=font_properties,
+        size=font_size,
+        font_properties=get_font_properties(box_obj["font_file"]),
         linespacing=box_obj["line_height"],
         ha="left",
         va=box_obj["alignment"],
@@ -302,33 +389,6 @@ def add_text_box(figure, basis_x, basis_y, text, box_type):
         wrap=True,
     )
 
-    # Resize text to fit left of the cutoff
-    r = figure.canvas.get_renderer()
-    text_bbox = text.get_window_extent(renderer=r)
-    # Decrement font size until the cutoff no longer overlaps with the text box
-    cutoff_point = (
-        (box_obj["cutoff_point"][0] + basis_x) * figure.dpi,
-        (box_obj["cutoff_point"][1] + basis_y) * figure.dpi,
-    )
-
-    # Debug print out for layout editing
-    # print(
-    #     box_type,
-    #     "extents:",
-    #     (
-    #         (text_bbox.extents[0] / figure.dpi) - basis_x,
-    #         (text_bbox.extents[1] / figure.dpi) - basis_y,
-    #         (text_bbox.extents[2] / figure.dpi) - basis_x,
-    #         (text_bbox.extents[3] / figure.dpi) - basis_y,
-    #     ),
-    # )
-
-    while text.get_fontsize() > 1 and (
-        text_bbox.containsx(cutoff_point[0]) or text_bbox.containsy(cutoff_point[1])
-    ):
-        text.set_fontsize(text.get_fontsize() - 0.1)
-        text_bbox = text.get_window_extent(renderer=r)
-
 
 def add_data_matrix(figure, basis_x, basis_y, data):
     """
@@ -342,7 +402,7 @@ def add_data_matrix(figure, basis_x, basis_y, data):
     image = tp.generate_barcode(
         barcode_type="datamatrixrectangular",
         data=data,
-        options={"version": "8x18"},
+        options={"version": "{}x{}".format(*DATA_MATRIX["size"])},
     )
     # Convert the PIL Image object returned above into a Numpy array
     data_matrix = np.asarray(image)
@@ -375,9 +435,70 @@ def add_data_matrix(figure, basis_x, basis_y, data):
     )
 
 
+def get_label_position(i: int):
+    # Calculate the row and column of the i-th label on a page
+    row = N_ROWS - (i // N_COLUMNS) - 1
+    column = i % N_COLUMNS
+
+    # Calculate basis coordinates for the label
+    # Label text will be positioned relative to these coordinates
+    basis_x = HORIZONTAL_MARGIN + (column * (LABEL_WIDTH + HORIZONTAL_SPACING))
+    basis_y = VERTICAL_MARGIN + (row * (LABEL_HEIGHT + VERTICAL_SPACING))
+
+    return basis_x, basis_y
+
+
+def get_label_texts(entry):
+    """
+    Formats the text of each text box of a label from a data entry
+    """
+
+    # Text Box 1 (Location)
+    # Different formats for the US and Canada
+    if entry[COUNTRY] == "USA":
+        text_1 = "USA:{}:{}Co {} {:.3f} {:.3f} {}m".format(
+            entry[STATE],
+            entry[COUNTY],
+            entry[PLACE],
+            round(float(entry[LATITUDE]), 3),
+            round(float(entry[LONGITUDE]), 3),
+            entry[ELEVATION],
+        )
+    elif entry[COUNTRY] == "CAN":
+        text_1 = "CANADA:{} {} {:.3f} {:.3f} {}m".format(
+            entry[STATE],
+            entry[PLACE],
+            round(float(entry[LATITUDE]), 3),
+            round(float(entry[LONGITUDE]), 3),
+            entry[ELEVATION],
+        )
+    text_1 = tw.fill(text_1, 22)
+
+    # Text Box 2 (Date)
+    text_2 = "{}.{}{}-{}.{}".format(
+        entry[DAY],
+        entry[MONTH],
+        entry[YEAR],
+        entry[SAMPLE_ID],
+        entry[SPECIMEN_ID],
+    )
+
+    # Text Box 3 (Collector and Method)
+    text_3 = "{}{} {}".format(
+        entry[FIRST_INITIAL],
+        entry[LAST_NAME],
+        entry[METHOD],
+    )
+
+    # Text Box 4 (Observation No.)
+    text_4 = entry[OBSERVATION_NUMBER]
+
+    return {"location": text_1, "date": text_2, "name": text_3, "number": text_4}
+
+
 def write_pdf_page(pdf: PdfPages, data):
     """
-    Creates a PDF page of labels from a given list of data entries
+    Creates a PDF page of labels from a given list of data entries with matplotlib
     """
 
     # Create a matplotlib Figure
@@ -387,14 +508,7 @@ def write_pdf_page(pdf: PdfPages, data):
 
     # Loop through the data entries
     for i, entry in tqdm(enumerate(data), desc="        Labels", total=len(data)):
-        # Calculate the row and column of the current label
-        row = N_ROWS - (i // N_COLUMNS) - 1
-        column = i % N_COLUMNS
-
-        # Calculate basis coordinates for the current label
-        # Label text will be positioned relative to these coordinates
-        basis_x = HORIZONTAL_MARGIN + (column * (LABEL_WIDTH + HORIZONTAL_SPACING))
-        basis_y = VERTICAL_MARGIN + (row * (LABEL_HEIGHT + VERTICAL_SPACING))
+        basis_x, basis_y = get_label_position(i)
 
         # Bounding rectangle to aid layout editing
         # rectangle = plt.Rectangle(
@@ -407,74 +521,278 @@ def write_pdf_page(pdf: PdfPages, data):
         # )
         # figure.add_artist(rectangle)
 
-        # Text Box 1 (Location)
-        # Different formats for the US and Canada
-        if entry[COUNTRY] == "USA":
-            text_1 = "USA:{}:{}Co {} {:.3f} {:.3f} {}m".format(
-                entry[STATE],
-                entry[COUNTY],
-                entry[PLACE],
-                round(float(entry[LATITUDE]), 3),
-                round(float(entry[LONGITUDE]), 3),
-                entry[ELEVATION],
-            )
-        elif entry[COUNTRY] == "CAN":
-            text_1 = "CANADA:{} {} {:.3f} {:.3f} {}m".format(
-                entry[STATE],
-                entry[PLACE],
-                round(float(entry[LATITUDE]), 3),
-                round(float(entry[LONGITUDE]), 3),
-                entry[ELEVATION],
-            )
-        text_1 = tw.fill(text_1, 22)
-
-        add_text_box(
-            figure,
-            basis_x,
-            basis_y,
-            text_1,
-            "location",
-        )
+        # Text Boxes (Location, Date, Collector and Method, Observation No.)
+        label_texts = get_label_texts(entry)
+        for box_type, text in label_texts.items():
+            add_text_box(figure, basis_x, basis_y, text, box_type)
 
-        # Text Box 2 (Date)
-        text_2 = "{}.{}{}-{}.{}".format(
-            entry[DAY],
-            entry[MONTH],
-            entry[YEAR],
-            entry[SAMPLE_ID],
-            entry[SPECIMEN_ID],
+        # Barcode (Data Matrix of Observation No.)
+        add_data_matrix(figure, basis_x, basis_y, label_texts["number"])
+
+    # Save the figure to a new page of the PDF
+    pdf.savefig(figure)
+
+
+def get_overlapping_sizes(low: float, high: float, cutoff: float):
+    """
+    Finds the font sizes at which the range from low * size to high * size (one side of a
+    text box measured per point of font size) contains the cutoff
+    Returns the smallest and largest of these sizes, or None if there are none
+    """
+
+    smallest = 0
+    largest = math.inf
+
+    # The range starts at or before the cutoff (low * size <= cutoff)
+    if low > 0:
+        largest = cutoff / low
+    elif low < 0:
+        smallest = max(smallest, cutoff / low)
+    elif cutoff < 0:
+        return None
+
+    # The range ends at or after the cutoff (high * size >= cutoff)
+    if high > 0:
+        smallest = max(smallest, cutoff / high)
+    elif high < 0:
+        largest = min(largest, cutoff / high)
+    elif cutoff > 0:
+        return None
+
+    if smallest > largest:
+        return None
+    return smallest, largest
+
+
+def fit_text(font, text, box_obj):
+    """
+    Lays out a text box's text relative to its position (in points) at the largest font size
+    (in steps of FONT_SIZE_STEP below the preset size) at which the cutoff does not overlap
+    with the text box
+    The text is measured once, since its box scales with the font size, and the sizes at
+    which it overlaps with the cutoff are stepped over at once
+    Returns the font size and the lines of text with their positions
+    """
+
+    # Position of the cutoff relative to the text box's position
+    cutoff_x = (
+        box_obj["cutoff_point"][0] - box_obj["x_position"]
+    ) * lpdf.POINTS_PER_INCH
+    cutoff_y = (
+        box_obj["cutoff_point"][1] - box_obj["y_position"]
+    ) * lpdf.POINTS_PER_INCH
+
+    # Lay out the text at its preset size
+    preset_size = box_obj["font_size"]
+    lines, (x0, y0, x1, y1) = fm.layout_text(
+        font,
+        text,
+        preset_size,
+        box_obj["line_height"],
+        box_obj["alignment"],
+        box_obj["rotation"],
+    )
+
+    # Find the sizes at which the text box overlaps with the cutoff horizontally or vertically
+    overlapping_sizes = [
+        sizes
+        for sizes in [
+            get_overlapping_sizes(x0 / preset_size, x1 / preset_size, cutoff_x),
+            get_overlapping_sizes(y0 / preset_size, y1 / preset_size, cutoff_y),
+        ]
+        if sizes is not None
+    ]
+
+    # The number of steps to MIN_FONT_SIZE or below, where the text stops shrinking
+    max_steps = math.ceil(round((preset_size - MIN_FONT_SIZE) / FONT_SIZE_STEP, 9))
+
+    # Step below each range of overlapping sizes the font size is in (which can only
+    # move it into the other range)
+    steps = 0
+    font_size = preset_size
+    while steps < max_steps:
+        smallest = min(
+            (low for low, high in overlapping_sizes if low <= font_size <= high),
+            default=None,
         )
-        add_text_box(figure, basis_x, basis_y, text_2, "date")
+        if smallest is None:
+            break
 
-        # Text Box 3 (Collector and Method)
-        text_3 = "{}{} {}".format(
-            entry[FIRST_INITIAL],
-            entry[LAST_NAME],
-            entry[METHOD],
+        # Take at least one step, so rounding errors cannot leave the size in place
+        steps = max(
+            math.floor((preset_size - smallest) / FONT_SIZE_STEP) + 1, steps + 1
         )
-        add_text_box(figure, basis_x, basis_y, text_3, "name")
+        steps = min(steps, max_steps)
+        font_size = preset_size - steps * FONT_SIZE_STEP
+
+    # Scale the lines' positions to the fitted size
+    scale = font_size / preset_size
+    lines = [(line, (x * scale, y * scale)) for line, (x, y) in lines]
+
+    return font_size, lines
 
-        # Text Box 4 (Observation No.)
-        text_4 = entry[OBSERVATION_NUMBER]
-        add_text_box(figure, basis_x, basis_y, text_4, "number")
+
+def add_label_text(document, page, basis_x, basis_y, text, box_type):
+    """
+    Adds a text box to the given page, in the font embedded in the document
+    """
+    # Fetch the specified text box layout and formatting preset
+    box_obj = TEXT_BOXES[box_type]
+
+    font, font_name = document.add_font(box_obj["font_file"])
+    font_size, lines = fit_text(font, text, box_obj)
+
+    page.add_text(
+        font,
+        font_name,
+        font_size,
+        (basis_x + box_obj["x_position"]) * lpdf.POINTS_PER_INCH,
+        (basis_y + box_obj["y_position"]) * lpdf.POINTS_PER_INCH,
+        lines,
+        box_obj["rotation"],
+    )
+
+
+def add_label_data_matrix(page, basis_x, basis_y, data):
+    """
+    Adds a rectangular (8 x 18) data matrix to the given page as filled squares, rotated 90
+    degrees anticlockwise like add_data_matrix
+    """
+
+    if data is None or data == "":
+        return
+
+    # Encode the data matrix as rows of dark and light modules
+    symbol = dmx.encode(data, *DATA_MATRIX["size"])
+
+    # After rotating, the symbol's rows are columns from left to right, and each row's
+    # modules go from the bottom up
+    abs_x = basis_x + DATA_MATRIX["x_position"]
+    abs_y = basis_y + DATA_MATRIX["y_position"]
+    module_size = DATA_MATRIX["width"] / len(symbol)
+
+    # Fill each run of dark modules as one rectangle (in points)
+    rectangles = []
+    for i, modules in enumerate(symbol):
+        run_start = None
+        for j, dark in enumerate(modules + [False]):
+            if dark and run_start is None:
+                run_start = j
+            elif not dark and run_start is not None:
+                rectangles.append(
+                    (
+                        (abs_x + i * module_size) * lpdf.POINTS_PER_INCH,
+                        (abs_y + run_start * module_size) * lpdf.POINTS_PER_INCH,
+                        module_size * lpdf.POINTS_PER_INCH,
+                        (j - run_start) * module_size * lpdf.POINTS_PER_INCH,
+                    )
+                )
+                run_start = None
+
+    page.fill_rectangles(rectangles)
+
+
+def write_label_page(document, data):
+    """
+    Writes a PDF page of labels from a given list of data entries directly as a content
+    stream, with the same layout as write_pdf_page
+    """
+
+    page = lpdf.PdfPage()
+
+    # Loop through the data entries
+    for i, entry in tqdm(enumerate(data), desc="        Labels", total=len(data)):
+        basis_x, basis_y = get_label_position(i)
+
+        # Text Boxes (Location, Date, Collector and Method, Observation No.)
+        label_texts = get_label_texts(entry)
+        for box_type, text in label_texts.items():
+            add_label_text(document, page, basis_x, basis_y, text, box_type)
 
         # Barcode (Data Matrix of Observation No.)
-        add_data_matrix(figure, basis_x, basis_y, text_4)
+        add_label_data_matrix(page, basis_x, basis_y, label_texts["number"])
+
+    document.add_page(page)
+
+
+def iterate_pages(dataset: list):
+    # Calculate partition values
+    part_size = N_ROWS * N_COLUMNS
+    n_parts = (len(dataset) // part_size) + 1
+    part_start = 0
+    part_end = part_size
+    page_i = 1
+
+    # Check that the partition end doesn't exceed the total length of the data
+    if part_end > len(dataset):
+        part_end = len(dataset)
+
+    # Loop through the data, yielding one page per partition
+    while part_start < len(dataset):
+        print("    Page {}/{}".format(page_i, n_parts))
+        yield dataset[part_start:part_end]
+
+        # Increment the partition values
+        part_start = part_end
+        part_end += part_size
+        if part_end > len(dataset):
+            part_end = len(dataset)
+        page_i += 1
 
-    # Save the figure to a new page of the PDF
-    pdf.savefig(figure)
 
+def check_matplotlib():
+    if mpl is None or tp is None:
+        raise ImportError(
+            "matplotlib and treepoem must be installed to create labels with matplotlib"
+        )
+
+
+def write_labels(output_file_path: str, dataset: list):
+    # Write a PDF file of labels, one page per N_ROWS * N_COLUMNS entries
+    if LABEL_RENDERER == "matplotlib":
+        check_matplotlib()
+        with PdfPages(output_file_path) as pdf:
+            for page_data in iterate_pages(dataset):
+                write_pdf_page(pdf, page_data)
+        return
+
+    document = lpdf.PdfDocument(
+        LETTER_WIDTH * lpdf.POINTS_PER_INCH, LETTER_HEIGHT * lpdf.POINTS_PER_INCH
+    )
+    for page_data in iterate_pages(dataset):
+        write_label_page(document, page_data)
+    document.save(output_file_path)
+
+
+def run(dataset_file_path: str, new_rows: list = None):
+    """
+    Creates labels from a range of rows of the dataset, or of the new rows added by the merge
+    (in pipeline mode), which are read from the dataset by their observation numbers
+    """
 
-def run(dataset: list):
     try:
         print("Creating Labels...")
 
         # Read configuration file
         labels_config = get_labels_config()
         output_file_path = os.path.relpath(labels_config["Output File Path"])
-        starting_row = validate_starting_row(
-            labels_config["Starting Row"], len(dataset)
-        )
+
+        if new_rows is not None:
+            # Start at the first new row
+            print("    Creating labels from the {} new rows".format(len(new_rows)))
+            data_length = len(new_rows)
+            starting_row = 0
+        else:
+            # Get the number of rows in the dataset and start at the configured row
+            data_length = get_dataset_length(dataset_file_path)
+            starting_row = validate_starting_row(
+                labels_config["Starting Row"], data_length
+            )
+
+        if data_length == 0:
+            print("    There are no rows to create labels from")
+            print("Creating Labels => Done")
+            return
 
         root = tk.Tk()
         root.attributes("-alpha", 0.0)
@@ -488,35 +806,37 @@ def run(dataset: list):
             write_labels_config(labels_config)
 
         # Confirm the range of rows to create labels from
-        starting_row, ending_row = confirm_row_range(starting_row, len(dataset))
-
-        # Truncate dataset to create labels only from the given starting row to the ending row
-        dataset = dataset[starting_row:ending_row]
+        starting_row, ending_row = confirm_row_range(starting_row, data_length)
+
+        # Read only the rows from the given starting row to the ending row (seeking to them
+        # with the dataset's index if it has one); new rows are read again from the dataset
+        # by their observation numbers, so changes saved to them after the merge are used
+        if new_rows is not None:
+            observation_numbers = [
+                row[OBSERVATION_NUMBER] for row in new_rows[starting_row:ending_row]
+            ]
+            dataset = read_dataset_observations(dataset_file_path, observation_numbers)
+            if len(dataset) < len(observation_numbers):
+                print(
+                    "    {} of the new rows are no longer in '{}' (their Observation No. "
+                    "was changed or they were removed)".format(
+                        len(observation_numbers) - len(dataset), dataset_file_path
+                    )
+                )
+        else:
+            dataset = read_dataset_rows(dataset_file_path, starting_row, ending_row)
+
+        # Skip rows without valid coordinates, which cannot be printed on labels
+        dataset, invalid_rows = fvd.validate_rows(dataset, [fvd.check_coordinates])
+        for row, reasons in invalid_rows:
+            print(
+                "    Skipping Observation No. '{}': {}".format(
+                    row.get(OBSERVATION_NUMBER), "; ".join(reasons)
+                )
+            )
 
-        # Open a PDF file
-        with PdfPages(output_file_path) as pdf:
-            # Calculate partition values
-            part_size = N_ROWS * N_COLUMNS
-            n_parts = (len(dataset) // part_size) + 1
-            part_start = 0
-            part_end = part_size
-            page_i = 1
-
-            # Check that the partition end doesn't exceed the total length of the data
-            if part_end > len(dataset):
-                part_end = len(dataset)
-
-            # Loop through the data, writing one page per partition
-            while part_start < len(dataset):
-                print("    Page {}/{}".format(page_i, n_parts))
-                write_pdf_page(pdf, dataset[part_start:part_end])
-
-                # Increment the partition values
-                part_start = part_end
-                part_end += part_size
-                if part_end > len(dataset):
-                    part_end = len(dataset)
-                page_i += 1
+        # Write the labels to a PDF file
+        write_labels(output_file_path, dataset)
 
         print("Creating Labels => Done")
 
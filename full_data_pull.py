@@ -10,6 +10,8 @@ import traceback
 import pyinaturalist
 from tqdm import tqdm
 
+import row_io as rio
+
 # File Name Constants
 SOURCES_FILE = "config/sources.csv"
 PLACES_FILE = "data/places.json"
@@ -282,10 +284,7 @@ def write_observations(observations_dict: dict, sources: list):
             "field_sample_id",
             "field_bees_collected",
         ]
-        with open(file_path, "w", newline="") as output_file:
-            csv_writer = csv.DictWriter(output_file, fieldnames=source_header)
-            csv_writer.writeheader()
-            csv_writer.writerows(formatted_observations)
+        rio.write_dicts(file_path, source_header, formatted_observations)
 
 
 def read_places_file():
@@ -3,23 +3,31 @@
 # Description: Module that formats data pulled from iNaturalist.org
 import csv
 import datetime
+import hashlib
 import json
 import os
 import traceback
 
 from tqdm import tqdm
 
+import dataset_parquet as dpq
+import row_io as rio
+
 
 # File Name Constants
 SOURCES_FILE = "config/sources.csv"
 HEADER_FORMAT_FILE = "config/header_format.txt"
 USER_NAMES_FILE = "data/usernames.csv"
 PLACES_FILE = "data/places.json"
+FORMAT_CACHE_FILE = "data/format_cache.json"
 LOG_FILE = "log_file.txt"
 
 # Folder Name Constant
 ELEVATION_DATA_FOLDER = "data/elevation_data/"
 
+# Output Format Constant: "csv" or "parquet" (typed columns, requires pyarrow)
+FORMATTED_DATA_FORMAT = "csv"
+
 # Column Name Constants
 YEAR = "Year 1"
 SAMPLE_ID_FIELD_NAME = "Sample ID."
@@ -318,13 +326,10 @@ def read_hgt(file_path: str, latitude: str, longitude: str):
         return str(data_int)
 
 
-def format_elevation(latitude: str, longitude: str):
+def get_elevation_file_path(latitude: str, longitude: str):
     """
-    Looks up elevation for a given longitude and latitude using data from
-    the Shuttle Radar Topography Mission (SRTMGL1), which is stored in
-    /data/elevation_data/
-
-    The data has 1 arcsecond (~30m) resolution
+    Finds the path of the elevation data file that covers a given longitude and latitude
+    Returns an empty str if latitude or longitude is not provided
     """
 
     # Check that latitude and longitude are provided
@@ -354,9 +359,19 @@ def format_elevation(latitude: str, longitude: str):
 
     # Construct the relevant data file path
     # .hgt is a binary data file format used by SRTM
-    elevation_data_file_path = (
-        ELEVATION_DATA_FOLDER + cardinal_latitude + cardinal_longitude + ".hgt"
-    )
+    return ELEVATION_DATA_FOLDER + cardinal_latitude + cardinal_longitude + ".hgt"
+
+
+def format_elevation(latitude: str, longitude: str):
+    """
+    Looks up elevation for a given longitude and latitude using data from
+    the Shuttle Radar Topography Mission (SRTMGL1), which is stored in
+    /data/elevation_data/
+
+    The data has 1 arcsecond (~30m) resolution
+    """
+
+    elevation_data_file_path = get_elevation_file_path(latitude, longitude)
 
     if not os.path.isfile(elevation_data_file_path):
         return ""
@@ -404,163 +419,298 @@ def format_scientific_name(taxon):
     return taxon["name"]
 
 
-def format_data(sources: list, observations_dict: dict, output_header: list):
-    # Initialize formatted output dictionary
-    formatted_dict = {"year": observations_dict["year"]}
+def format_observation(observation: dict, output_header: list):
+    """
+    Formats a single iNaturalist observation into rows with the given header
+    Returns one row per bee collected (or the single formatted row if the count is not a number)
+    """
+    formatted_rows = []
+    formatted_observation = {}
 
-    for source in sources:
-        print("    Formatting '{}' data...".format(source["Name"]))
+    # Add the six blank fields at the start of the formatted output
+    # (Verified, Date Added, Date Label Print, Date Label Sent, Observation No., and Voucher No.)
+    for i in range(6):
+        formatted_observation[output_header[i]] = ""
 
-        # Divide the formatted output dictionary by source
-        formatted_dict[source["Abbreviation"]] = []
+    # iNaturalist ID
+    formatted_observation[output_header[6]] = format_str(observation["user"]["id"])
 
-        for observation in tqdm(
-            observations_dict[source["Abbreviation"]], desc="        Observations"
-        ):
-            formatted_observation = {}
+    # iNaturalist Alias
+    formatted_observation[output_header[7]] = format_str(observation["user"]["login"])
 
-            # Add the six blank fields at the start of the formatted output
-            # (Verified, Date Added, Date Label Print, Date Label Sent, Observation No., and Voucher No.)
-            for i in range(6):
-                formatted_observation[output_header[i]] = ""
+    # Collector - First Name
+    # Collector - First Initial
+    # Collector - Last Name
+    user_first_name, user_first_initial, user_last_name = format_name(
+        observation["user"]["login"], observation["user"]["name"]
+    )
 
-            # iNaturalist ID
-            formatted_observation[output_header[6]] = format_str(
-                observation["user"]["id"]
-            )
+    formatted_observation[output_header[8]] = user_first_name
+    formatted_observation[output_header[9]] = user_first_initial
+    formatted_observation[output_header[10]] = user_last_name
 
-            # iNaturalist Alias
-            formatted_observation[output_header[7]] = format_str(
-                observation["user"]["login"]
-            )
+    # Sample ID
+    formatted_observation[output_header[11]] = get_ofvs_value(
+        SAMPLE_ID_FIELD_NAME, observation["ofvs"]
+    )
 
-            # Collector - First Name
-            # Collector - First Initial
-            # Collector - Last Name
-            user_first_name, user_first_initial, user_last_name = format_name(
-                observation["user"]["login"], observation["user"]["name"]
-            )
+    # Specimen ID
+    formatted_observation[output_header[12]] = get_ofvs_value(
+        BEES_COLLECTED_FIELD_NAME, observation["ofvs"]
+    )
 
-            formatted_observation[output_header[8]] = user_first_name
-            formatted_observation[output_header[9]] = user_first_initial
-            formatted_observation[output_header[10]] = user_last_name
+    # Collection Day 1
+    # Month 1
+    # Year 1
+    # Time 1
+    observed_on_details = observation["observed_on_details"]
 
-            # Sample ID
-            formatted_observation[output_header[11]] = get_ofvs_value(
-                SAMPLE_ID_FIELD_NAME, observation["ofvs"]
-            )
+    formatted_observation[output_header[13]] = format_str(observed_on_details["day"])
+    formatted_observation[output_header[14]] = format_month(
+        observed_on_details["month"]
+    )
+    formatted_observation[output_header[15]] = format_str(observed_on_details["year"])
+    formatted_observation[output_header[16]] = format_time(observation["observed_on"])
+
+    # Collection Day 2 (blank)
+    # Month 2 (blank)
+    # Year 2 (blank)
+    # Time 2 (blank)
+    # Collect Date 2 Merge (blank)
+    formatted_observation[output_header[17]] = ""
+    formatted_observation[output_header[18]] = ""
+    formatted_observation[output_header[19]] = ""
+    formatted_observation[output_header[20]] = ""
+    formatted_observation[output_header[21]] = ""
+
+    # Country
+    # State
+    # County
+    country, state, county = look_up_place(observation["place_ids"])
+
+    formatted_observation[output_header[22]] = format_country(country)
+    formatted_observation[output_header[23]] = format_state(state)
+    formatted_observation[output_header[24]] = county
+
+    # Location
+    location = format_location(observation["place_guess"])
+    formatted_observation[output_header[25]] = location
+
+    # Collection Site Description (blank)
+    formatted_observation[output_header[26]] = ""
+
+    # Abbreviated Location
+    formatted_observation[output_header[27]] = location
+
+    # Dec. Lat.
+    # Dec. Long.
+    latitude, longitude = format_coordinates(observation["location"])
+
+    formatted_observation[output_header[28]] = latitude
+    formatted_observation[output_header[29]] = longitude
+
+    # Lat/Long Accuracy
+    formatted_observation[output_header[30]] = format_str(
+        observation["positional_accuracy"]
+    )
 
-            # Specimen ID
-            formatted_observation[output_header[12]] = get_ofvs_value(
-                BEES_COLLECTED_FIELD_NAME, observation["ofvs"]
-            )
+    # Elevation
+    formatted_observation[output_header[31]] = format_elevation(latitude, longitude)
 
-            # Collection Day 1
-            # Month 1
-            # Year 1
-            # Time 1
-            observed_on_details = observation["observed_on_details"]
+    # Collection method (blank)
+    formatted_observation[output_header[32]] = ""
 
-            formatted_observation[output_header[13]] = format_str(
-                observed_on_details["day"]
-            )
-            formatted_observation[output_header[14]] = format_month(
-                observed_on_details["month"]
-            )
-            formatted_observation[output_header[15]] = format_str(
-                observed_on_details["year"]
-            )
-            formatted_observation[output_header[16]] = format_time(
-                observation["observed_on"]
-            )
+    # Associated plant - family
+    # Associated plant - genus, species
+    # Associated plant - Inaturalist URL
+    formatted_observation[output_header[33]] = format_family(
+        observation["identifications"]
+    )
+    formatted_observation[output_header[34]] = format_scientific_name(
+        observation["taxon"]
+    )
+    formatted_observation[output_header[35]] = format_str(observation["uri"])
+
+    # Add the eight blank fields at the end of the formatted output
+    # (Det. Volunteer - Family, Det. Volunteer - Genus, Det. Volunteer - Species,
+    #  Det. Volunteer - Sex/Caste, Det LR Best - Genus, Det. LR Best - Species,
+    #  Det LR Best - Sex/Caste)
+    for i in range(7):
+        formatted_observation[output_header[36 + i]] = ""
+
+    # Create entries for each bee collected (specimen IDs 1-# of bees)
+    specimen_id = formatted_observation[output_header[12]]
+    if specimen_id != "":
+        # Try to convert the specimen ID to an integer, simply append the formatted entry if this fails
+        try:
+            specimen_id = int(specimen_id)
+        except ValueError:
+            formatted_rows.append(formatted_observation)
+        else:
+            # If there were any bees collected (specimen ID >= 1), create entries for each bee
+            if specimen_id >= 1:
+                # Duplicate the entry, except for the specimen ID, which will index the duplicates
+                for i in range(1, specimen_id + 1):
+                    dup_observation = formatted_observation.copy()
+                    dup_observation[output_header[12]] = str(i)
 
-            # Collection Day 2 (blank)
-            # Month 2 (blank)
-            # Year 2 (blank)
-            # Time 2 (blank)
-            # Collect Date 2 Merge (blank)
-            formatted_observation[output_header[17]] = ""
-            formatted_observation[output_header[18]] = ""
-            formatted_observation[output_header[19]] = ""
-            formatted_observation[output_header[20]] = ""
-            formatted_observation[output_header[21]] = ""
-
-            # Country
-            # State
-            # County
-            country, state, county = look_up_place(observation["place_ids"])
-
-            formatted_observation[output_header[22]] = format_country(country)
-            formatted_observation[output_header[23]] = format_state(state)
-            formatted_observation[output_header[24]] = county
-
-            # Location
-            location = format_location(observation["place_guess"])
-            formatted_observation[output_header[25]] = location
-
-            # Collection Site Description (blank)
-            formatted_observation[output_header[26]] = ""
-
-            # Abbreviated Location
-            formatted_observation[output_header[27]] = location
-
-            # Dec. Lat.
-            # Dec. Long.
-            latitude, longitude = format_coordinates(observation["location"])
-
-            formatted_observation[output_header[28]] = latitude
-            formatted_observation[output_header[29]] = longitude
-
-            # Lat/Long Accuracy
-            formatted_observation[output_header[30]] = format_str(
-                observation["positional_accuracy"]
-            )
+                    formatted_rows.append(dup_observation)
 
-            # Elevation
-            formatted_observation[output_header[31]] = format_elevation(
-                latitude, longitude
-            )
+    return formatted_rows
 
-            # Collection method (blank)
-            formatted_observation[output_header[32]] = ""
 
-            # Associated plant - family
-            # Associated plant - genus, species
-            # Associated plant - Inaturalist URL
-            formatted_observation[output_header[33]] = format_family(
-                observation["identifications"]
-            )
-            formatted_observation[output_header[34]] = format_scientific_name(
-                observation["taxon"]
+def get_file_digest(file_path: str):
+    # Hash the contents of a file, or return an empty string if it does not exist
+    if not os.path.isfile(file_path):
+        return ""
+
+    with open(file_path, "rb") as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+def hash_observation(
+    observation: dict, known_places: dict, elevation_files: dict, context_digest: str
+):
+    """
+    Hashes the fields of a raw observation that affect its formatted output
+    Includes the known places for its place IDs, whether the elevation data file for its
+    location exists (elevation_files caches this by path), and a digest of the other
+    lookup files
+    """
+    user = observation["user"] or {}
+
+    # The elevation is left blank when its data file is missing, so adding the file changes the row
+    latitude, longitude = format_coordinates(observation["location"])
+    elevation_data_file_path = get_elevation_file_path(latitude, longitude)
+    if elevation_data_file_path not in elevation_files:
+        elevation_files[elevation_data_file_path] = os.path.isfile(
+            elevation_data_file_path
+        )
+    taxon = observation["taxon"] or {}
+
+    # Reduce the identifications to the taxon ranks and names used to find the family
+    identifications = []
+    for identification in observation["identifications"] or []:
+        id_taxon = identification.get("taxon") or {}
+        identifications.append(
+            [
+                id_taxon.get("rank"),
+                id_taxon.get("name"),
+                [
+                    [ancestor.get("rank"), ancestor.get("name")]
+                    for ancestor in id_taxon.get("ancestors") or []
+                ],
+            ]
+        )
+
+    relevant_fields = [
+        context_digest,
+        user.get("id"),
+        user.get("login"),
+        user.get("name"),
+        [[field["name"], field["value"]] for field in observation["ofvs"]],
+        observation["observed_on_details"],
+        observation["observed_on"],
+        observation["place_ids"],
+        [known_places.get(str(place_id)) for place_id in observation["place_ids"]],
+        observation["place_guess"],
+        observation["location"],
+        elevation_files[elevation_data_file_path],
+        observation["positional_accuracy"],
+        identifications,
+        taxon.get("name"),
+        observation["uri"],
+    ]
+
+    # Serialize the fields deterministically (datetimes become strings) and hash them
+    serialized_fields = json.dumps(relevant_fields, sort_keys=True, default=str)
+    return hashlib.sha256(serialized_fields.encode("utf-8")).hexdigest()
+
+
+def read_format_cache():
+    # Check that FORMAT_CACHE_FILE exists; otherwise return an empty dict
+    if not os.path.isfile(FORMAT_CACHE_FILE):
+        return {}
+
+    # Load the cache, starting over if it is unreadable
+    try:
+        with open(FORMAT_CACHE_FILE, "r", encoding="utf-8") as cache_file:
+            return json.load(cache_file)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_format_cache(format_cache: dict):
+    # Check for data folder, which holds the cache
+    if not os.path.isdir("./data"):
+        return
+
+    with rio.open_replacing(FORMAT_CACHE_FILE, "w", encoding="utf-8") as cache_file:
+        json.dump(format_cache, cache_file)
+
+
+def format_data(sources: list, observations_dict: dict, output_header: list):
+    # Initialize formatted output dictionary
+    formatted_dict = {"year": observations_dict["year"]}
+
+    # Read the cache of previously formatted observations for the query year
+    # Cached rows are stored as lists of values in the order of output_header
+    format_cache = read_format_cache()
+    header_digest = hashlib.sha256("\n".join(output_header).encode("utf-8")).hexdigest()
+    year_cache = format_cache.get(str(formatted_dict["year"]), {})
+    if year_cache.get("header") != header_digest:
+        year_cache = {"header": header_digest, "observations": {}}
+    cached_observations = year_cache["observations"]
+    updated_observations = {}
+
+    # The formatted output also depends on these lookup files, so changes to them invalidate the cache
+    known_places = read_places_file()
+    context_digest = get_file_digest(USER_NAMES_FILE)
+    elevation_files = {}
+
+    for source in sources:
+        print("    Formatting '{}' data...".format(source["Name"]))
+
+        # Divide the formatted output dictionary by source
+        formatted_dict[source["Abbreviation"]] = []
+        n_reused = 0
+
+        for observation in tqdm(
+            observations_dict[source["Abbreviation"]], desc="        Observations"
+        ):
+            observation_id = format_str(observation["id"])
+            observation_hash = hash_observation(
+                observation, known_places, elevation_files, context_digest
             )
-            formatted_observation[output_header[35]] = format_str(observation["uri"])
-
-            # Add the eight blank fields at the end of the formatted output
-            # (Det. Volunteer - Family, Det. Volunteer - Genus, Det. Volunteer - Species,
-            #  Det. Volunteer - Sex/Caste, Det LR Best - Genus, Det. LR Best - Species,
-            #  Det LR Best - Sex/Caste)
-            for i in range(7):
-                formatted_observation[output_header[36 + i]] = ""
-
-            # Create entries for each bee collected (specimen IDs 1-# of bees)
-            specimen_id = formatted_observation[output_header[12]]
-            if specimen_id != "":
-                # Try to convert the specimen ID to an integer, simply append the formatted entry if this fails
-                try:
-                    specimen_id = int(specimen_id)
-                except ValueError:
-                    formatted_dict[source["Abbreviation"]].append(formatted_observation)
-                else:
-                    # If there were any bees collected (specimen ID >= 1), create entries for each bee
-                    if specimen_id >= 1:
-                        # Duplicate the entry, except for the specimen ID, which will index the duplicates
-                        for i in range(1, specimen_id + 1):
-                            dup_observation = formatted_observation.copy()
-                            dup_observation[output_header[12]] = str(i)
-
-                            formatted_dict[source["Abbreviation"]].append(
-                                dup_observation
-                            )
+
+            # Reuse the cached rows if the observation has not changed; otherwise reformat it
+            cache_entry = cached_observations.get(observation_id)
+            if cache_entry is not None and cache_entry["hash"] == observation_hash:
+                formatted_rows = [
+                    dict(zip(output_header, row)) for row in cache_entry["rows"]
+                ]
+                n_reused += 1
+            else:
+                formatted_rows = format_observation(observation, output_header)
+                cache_entry = {
+                    "hash": observation_hash,
+                    "rows": [
+                        [row[column] for column in output_header]
+                        for row in formatted_rows
+                    ],
+                }
+
+            updated_observations[observation_id] = cache_entry
+            formatted_dict[source["Abbreviation"]].extend(formatted_rows)
+
+        print("        Reused {} unchanged observations".format(n_reused))
+
+    # Replace the query year's cache with this run's observations
+    format_cache[str(formatted_dict["year"])] = {
+        "header": header_digest,
+        "observations": updated_observations,
+    }
+    write_format_cache(format_cache)
 
     return formatted_dict
 
@@ -580,7 +730,9 @@ def write_formatted_data(sources: list, formatted_dict: dict, output_header: dic
         folder_name = "./results/{}_{}/".format(source["Abbreviation"], date_str)
 
         query_year = formatted_dict["year"]
-        file_name = "{}_results_{}.csv".format(source["Abbreviation"], query_year)
+        file_name = "{}_results_{}.{}".format(
+            source["Abbreviation"], query_year, FORMATTED_DATA_FORMAT
+        )
         file_path = os.path.relpath(folder_name + file_name)
 
         print(
@@ -596,10 +748,14 @@ def write_formatted_data(sources: list, formatted_dict: dict, output_header: dic
         if not os.path.isdir(folder_name):
             os.makedirs(folder_name)
 
-        with open(file_path, "w", newline="") as output_file:
-            csv_writer = csv.DictWriter(output_file, fieldnames=output_header)
-            csv_writer.writeheader()
-            csv_writer.writerows(source_data)
+        if FORMATTED_DATA_FORMAT == "parquet":
+            dpq.write_rows(
+                file_path,
+                output_header,
+                list(rio.get_row_values(source_data, output_header)),
+            )
+        else:
+            rio.write_dicts(file_path, output_header, source_data)
 
 
 def run(observations_dict: dict):
@@ -1,26 +1,85 @@
 # Author: Myles Scholz
 # Created on September 15, 2023
 # Description: Module that merges formatted data with the Oregon Bee Atlas database
+import array
+import bisect
+import concurrent.futures
 import csv
 import datetime
-import functools
+import hashlib
+import io
+import itertools
+import marshal
+import operator
 import os
 import tempfile
-import hashlib
+import heapq
+import struct
 import traceback
 import tkinter as tk
 from tkinter import filedialog
-from collections import deque
 import shutil
+import zlib
+from collections import deque
+
+import numpy as np
+
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+import dataset_database as ddb
+import dataset_index as dsi
+import dataset_manifest as dsm
+import dataset_parquet as dpq
+import dataset_partitions as dsp
+import dataset_record as dsr
+import merge_checkpoint as mcp
+import row_io as rio
+from digest_set import create_digest_set, get_digest
 
 
 # File I/O Constants
 SOURCES_FILE = "config/sources.csv"
+HEADER_FORMAT_FILE = "config/header_format.txt"
 MERGE_CONFIG_FILE = "config/merge_config.csv"
 LABELS_CONFIG_FILE = "config/labels_config.csv"
 LOG_FILE = "log_file.txt"
-CHUNK_SIZE = 10000
-MERGE_SIZE = 2
+
+# Suffix of the file of the rows added by a merge, stored next to the output
+DELTA_SUFFIX = ".delta.csv"
+# Estimated memory (in bytes) that each sorted run of the external merge sort may take
+RUN_MEMORY_BUDGET = 256 * 1024**2
+# Number of worker processes that parse, sort, and hash runs in parallel (about this many runs
+# are held in memory)
+MERGE_WORKERS = os.cpu_count() or 1
+# Compression of temporary run files: None, "zlib", or "lz4" (falls back to zlib if lz4 is not installed)
+RUN_COMPRESSION = None
+# Size (in bytes) of the blocks that temporary run files are written and compressed in
+RUN_BLOCK_SIZE = 1024**2
+# Binary format of the length prefixes in temporary run files (unsigned 32-bit, little-endian)
+RUN_LENGTH_FORMAT = struct.Struct("<I")
+# Maximum number of sorted runs merged (or key buckets written) at once, which limits
+# the number of open files
+MERGE_FAN_IN = 64
+# Size (in bits) of the Bloom filter checked before the set of seen row keys (0 disables it)
+DEDUPE_BLOOM_BITS = 0
+# Whether to merge new data into an already sorted and indexed dataset without re-sorting it
+INCREMENTAL_MERGE = True
+# How the external merge sort removes duplicates: "shared" (one set of keys for the whole
+# dataset), "partitioned" (the keys of rows with observation numbers are joined through
+# on-disk buckets), or "auto"
+DEDUPE_MODE = "auto"
+# In "auto" mode, datasets estimated to take at least this much memory (in bytes) are
+# deduplicated through partitions
+PARTITIONED_DEDUPE_THRESHOLD = 64 * 1024**3
+# Datasets estimated to take less memory than this (in bytes) are sorted in memory
+IN_MEMORY_SORT_BUDGET = 2 * 1024**3
+# Estimated ratio of the memory taken by parsed rows to the size of their CSV text
+ROW_MEMORY_FACTOR = 10
+# Estimated ratio of the memory taken to join a key bucket to the size of its file
+KEY_BUCKET_MEMORY_FACTOR = 4
 
 # Column Name Constants
 
@@ -46,6 +105,38 @@ LONGITUDE = "Dec. Long."
 # URL
 URL = "Associated plant - Inaturalist URL"
 
+# Fields compared by the duplicate rules (besides "Observation No.")
+URL_KEY_FIELDS = [URL, SAMPLE_ID, SPECIMEN_ID]
+ALIAS_DATE_KEY_FIELDS = [ALIAS, DAY, MONTH, YEAR, SAMPLE_ID, SPECIMEN_ID]
+
+# Kinds of entries in the key buckets of partitioned deduplication: the URL and alias/date
+# keys of rows with observation numbers (split by whether the row has a URL), and the keys
+# that rows without observation numbers are checked with (see is_duplicate)
+KEY_URL = 0
+KEY_ALIAS_DATE = 1
+KEY_ALIAS_DATE_WITH_URL = 2
+CHECK_URL = 3
+CHECK_ALIAS_DATE = 4
+CHECK_ALIAS_DATE_ANY = 5
+# Each entry is a key digest and a tag: the row's sequence number times 8 plus the entry's kind
+KEY_ENTRY_TYPE = np.dtype([("digest", "<u8"), ("tag", "<u8")])
+
+# Dict linking formatted months (Roman numerals) to decimal values
+MONTHS = {
+    "I": 1,
+    "II": 2,
+    "III": 3,
+    "IV": 4,
+    "V": 5,
+    "VI": 6,
+    "VII": 7,
+    "VIII": 8,
+    "IX": 9,
+    "X": 10,
+    "XI": 11,
+    "XII": 12,
+}
+
 
 def get_sources():
     # Read SOURCES_FILE for the sources (iNaturalist projects) to pull data from
@@ -55,81 +146,177 @@ def get_sources():
     return sources
 
 
+def read_header_format():
+    # Read HEADER_FORMAT_FILE, which contains the header that formatted data should have
+    with open(HEADER_FORMAT_FILE, newline="") as header_file:
+        csv_reader = csv.reader(header_file, delimiter="\n")
+        output_header = [line[0] for line in csv_reader]
+
+    return output_header
+
+
 def get_merge_config():
     # Read MERGE_CONFIG_FILE to get the input and output file paths
     with open(MERGE_CONFIG_FILE, newline="") as merge_config_file:
         merge_config = list(csv.DictReader(merge_config_file))[0]
 
+    # The export file path is optional (older configuration files do not have it)
+    if not merge_config.get("Export File Path"):
+        merge_config["Export File Path"] = ""
+
     return merge_config
 
 
 def write_merge_config(merge_config):
     # Open MERGE_CONFIG_FILE to write updated input and output file paths
-    merge_config_header = ["Input File Path", "Output File Path"]
+    merge_config_header = ["Input File Path", "Output File Path", "Export File Path"]
     with open(MERGE_CONFIG_FILE, "w", newline="") as merge_config_file:
         csv_writer = csv.DictWriter(merge_config_file, fieldnames=merge_config_header)
         csv_writer.writeheader()
         csv_writer.writerow(merge_config)
 
 
-def read_csv_chunks(file_path):
+def estimate_row_size(row):
+    # Estimate the memory taken by a parsed row from the length of its values
+    return sum(map(len, filter(None, row.values()))) * ROW_MEMORY_FACTOR
+
+
+def split_into_chunks(rows):
+    """
+    Groups rows into chunks of at most RUN_MEMORY_BUDGET bytes (estimated)
+    Each chunk becomes one sorted run in the external merge sort
+    """
+
     chunk = []
-    with open(file_path, newline="", encoding="utf-8", errors="replace") as file:
-        reader = csv.DictReader(file)
-
-        # Loop through the given file and yield chunks while maintaining state between calls
-        for row in reader:
-            chunk.append(row)
-            # Yield chunk when it reaches CHUNK_SIZE
-            if len(chunk) >= CHUNK_SIZE:
-                yield chunk
-                chunk = []
-        # Yield the final partial chunk
-        if chunk:
+    chunk_size = 0
+
+    # Loop through the given rows and yield chunks while maintaining state between calls
+    for row in rows:
+        chunk.append(row)
+        chunk_size += estimate_row_size(row)
+        # Yield chunk when it reaches the memory budget
+        if chunk_size >= RUN_MEMORY_BUDGET:
             yield chunk
+            chunk = []
+            chunk_size = 0
+    # Yield the final partial chunk
+    if chunk:
+        yield chunk
+
+
+def read_csv_chunks(file_path):
+    # Read the given file in chunks that fit in the memory budget
+    yield from split_into_chunks(rio.iterate_records(file_path))
 
 
-def row_is_empty(row: dict):
-    # Loop through columns, checking for any non-empty strings
-    for column in row:
-        if row[column] != "" and row[column] is not None:
+def row_is_empty(row):
+    # Loop through the row's values, checking for any non-empty strings
+    for value in row.values():
+        if value != "" and value is not None:
             return False
 
     return True
 
 
-def generate_key(row):
-    # Which key fields to use depend on which are available:
-    # At minimum, use first name, last name, day, month, and year, sample ID, and specimen ID
-    # If available, use the observation number
-    # If available, use iNaturalist URL
-    key_fields = [FIRST_NAME, LAST_NAME, SAMPLE_ID, SPECIMEN_ID, DAY, MONTH, YEAR]
+def generate_key(row, key_fields):
+    # Convert the key fields to their values (as strings)
+    key_values = [str(row.get(field) or "") for field in key_fields]
+
+    # Join the key values with a separator that does not appear in the data and hash them
+    # into a single identifying 64-bit key
+    composite_key = get_digest("\x1f".join(key_values))
+
+    return composite_key
+
+
+def get_rule_keys(row):
+    """
+    Generates the keys of a row for each of the duplicate rules (checked in order):
+    1. "Observation No." (if it is not empty)
+    2. URL, "Sample ID", and "Specimen ID" (only compared between rows that both have URLs)
+    3. Alias, date, "Sample ID", and "Specimen ID" (compared in all other cases)
+    Keys for rules that do not apply to the row are None
+    """
+
+    observation_key = None
     if row.get(OBSERVATION_NUMBER):
-        key_fields.append(OBSERVATION_NUMBER)
+        observation_key = generate_key(row, [OBSERVATION_NUMBER])
+
+    url_key = None
     if row.get(URL):
-        key_fields.append(URL)
+        url_key = generate_key(row, URL_KEY_FIELDS)
 
-    # Convert the key fields to their values (as strings)
-    key_values = [str(row.get(field, "")) for field in key_fields]
+    alias_date_key = generate_key(row, ALIAS_DATE_KEY_FIELDS)
 
-    # Concatenate and encode the key values as a single identifying key
-    composite_key = hashlib.sha256(",".join(key_values).encode("utf-8")).hexdigest()
+    return observation_key, url_key, alias_date_key
 
-    return composite_key
 
+def create_duplicate_index():
+    """
+    Creates an index of the rows kept so far with one set of key digests per duplicate rule
+    Alias/date keys are split by whether the row has a URL, because rule 3 only compares
+    two rows with URLs if one of them lacks a URL
+    """
+
+    return {
+        "observation": create_digest_set(DEDUPE_BLOOM_BITS),
+        "url": create_digest_set(DEDUPE_BLOOM_BITS),
+        "alias_date": create_digest_set(DEDUPE_BLOOM_BITS),
+        "alias_date_with_url": create_digest_set(DEDUPE_BLOOM_BITS),
+    }
+
+
+def is_duplicate(rule_keys, duplicate_index):
+    """
+    Checks whether a row matches any row in the duplicate index, using one lookup per rule
+    """
+
+    observation_key, url_key, alias_date_key = rule_keys
 
-def sort_and_dedupe_chunk(chunk, seen_keys):
+    # Rule 1: match on "Observation No."
+    if (
+        observation_key is not None
+        and observation_key in duplicate_index["observation"]
+    ):
+        return True
+
+    if url_key is not None:
+        # Rule 2: match rows that also have URLs on URL, Sample ID, and Specimen ID
+        if url_key in duplicate_index["url"]:
+            return True
+
+        # Rule 3: match rows without URLs on alias, date, Sample ID, and Specimen ID
+        return alias_date_key in duplicate_index["alias_date"]
+
+    # Rule 3: this row has no URL, so match any row on alias, date, Sample ID, and Specimen ID
+    return (
+        alias_date_key in duplicate_index["alias_date"]
+        or alias_date_key in duplicate_index["alias_date_with_url"]
+    )
+
+
+def add_to_duplicate_index(rule_keys, duplicate_index):
+    # Add each of the row's keys to the set for its rule
+    observation_key, url_key, alias_date_key = rule_keys
+
+    if observation_key is not None:
+        duplicate_index["observation"].add(observation_key)
+
+    if url_key is not None:
+        duplicate_index["url"].add(url_key)
+        duplicate_index["alias_date_with_url"].add(alias_date_key)
+    else:
+        duplicate_index["alias_date"].add(alias_date_key)
+
+
+def dedupe_chunk(chunk, duplicate_index):
     unique_rows = []
 
     # Loop through the chunk and add rows with observation numbers first
     for row in chunk:
-        # If the row has an observation number, assume it is unique, add its key to the seen_keys list, and append the row to unique_rows
+        # If the row has an observation number, assume it is unique, add its keys to the duplicate index, and append the row to unique_rows
         if row.get(OBSERVATION_NUMBER):
-            # Create a unique key field for the row
-            key = generate_key(row)
-
-            # Add the key and row
-            seen_keys.add(key)
+            add_to_duplicate_index(get_rule_keys(row), duplicate_index)
             unique_rows.append(row)
 
     # Loop through the chunk again, this time adding any other unique rows
@@ -138,281 +325,779 @@ def sort_and_dedupe_chunk(chunk, seen_keys):
         if row_is_empty(row) or row.get(OBSERVATION_NUMBER):
             continue
 
-        # Create a unique key field for the row
-        key = generate_key(row)
+        # Create the row's key for each duplicate rule
+        rule_keys = get_rule_keys(row)
 
-        # If the row's key has not yet been seen, add it to seen_keys and append the row to unique_rows
-        if key not in seen_keys:
-            seen_keys.add(key)
+        # If the row does not match any row so far, add it to the duplicate index and append it to unique_rows
+        if not is_duplicate(rule_keys, duplicate_index):
+            add_to_duplicate_index(rule_keys, duplicate_index)
             unique_rows.append(row)
 
-    return sorted(unique_rows, key=functools.cmp_to_key(compare_rows))
+    return unique_rows
+
+
+def sort_and_dedupe_chunk(chunk, duplicate_index):
+    # Remove duplicate rows, then sort the remaining rows
+    return sorted(dedupe_chunk(chunk, duplicate_index), key=get_sort_key)
+
+
+def find_row_start(csv_file, start: int, size: int):
+    """
+    Finds the first row of a CSV file (opened in binary mode) that starts at least size bytes
+    after start (which must be the start of a row), or the end of the file
+    Line breaks inside quoted values are skipped by counting the quotes since start (quotes
+    inside values are doubled, so a line break after an odd number of quotes is in a value)
+    """
+
+    csv_file.seek(start)
+    data = csv_file.read(size - 1)
+    offset = start + len(data)
+    n_quotes = data.count(b'"')
+
+    while True:
+        block = csv_file.read(RUN_BLOCK_SIZE)
+        if not block:
+            return offset
+
+        # Find the first line break after an even number of quotes
+        previous_position = 0
+        position = block.find(b"\n")
+        while position >= 0:
+            n_quotes += block.count(b'"', previous_position, position)
+            if n_quotes % 2 == 0:
+                return offset + position + 1
+            previous_position = position
+            position = block.find(b"\n", position + 1)
+
+        n_quotes += block.count(b'"', previous_position)
+        offset += len(block)
+
+
+def find_chunk_ranges(file_path):
+    """
+    Splits the rows of a CSV file into byte ranges that take about RUN_MEMORY_BUDGET bytes
+    once parsed (estimated), so that worker processes can read and parse them on their own
+    Uses the row offsets of the file's index if it has a valid one; otherwise scans the file
+    for the line breaks between rows (both give the same ranges)
+    """
+
+    chunk_size = max(2, RUN_MEMORY_BUDGET // ROW_MEMORY_FACTOR)
+
+    index = dsi.read_index(file_path)
+    if index is not None:
+        row_offsets, _ = index
+        n_rows = len(row_offsets) - 1
+        i = 0
+        while i < n_rows:
+            # End the range at the first row that starts at least chunk_size bytes in
+            j = bisect.bisect_left(
+                row_offsets, row_offsets[i] + chunk_size, i + 1, n_rows
+            )
+            yield row_offsets[i], row_offsets[j]
+            i = j
+        return
+
+    with open(file_path, "rb") as csv_file:
+        file_size = os.fstat(csv_file.fileno()).st_size
+
+        # The rows start after the header
+        start = find_row_start(csv_file, 0, 1)
+        while start < file_size:
+            end = find_row_start(csv_file, start, chunk_size)
+            yield start, end
+            start = end
+
+
+def read_chunk(file_path, start: int, end: int):
+    # Parse the rows in a byte range of a CSV file as records of the file's columns
+    with open(file_path, "rb") as csv_file:
+        fieldnames = dsi.read_header(csv_file)
+        csv_file.seek(start)
+        data = csv_file.read(end - start)
+
+    return rio.parse_records(data.decode(rio.ENCODING, errors=rio.ERRORS), fieldnames)
+
+
+def get_sequence_number(chunk_index: int, row_index: int):
+    # Number rows by their position in the input (rows of later chunks get larger numbers)
+    return (chunk_index << 32) + row_index
+
+
+def sort_chunk(chunk, chunk_index: int, fieldnames, write_run: bool = True):
+    """
+    Computes the key digests of each row of a chunk for the duplicate rules, then sorts the
+    chunk's non-empty rows and writes them to a temporary run file, with each row's sequence
+    number (see get_sequence_number) at the end of its sort key
+    The chunk is a byte range (file path, start, end) of a CSV file, which is read and parsed
+    here, or a list of rows
+    Returns the run file path (None if there were no rows or write_run is False) and an array
+    of each row's observation, URL, and alias/date key digests, with zeros for keys that do
+    not apply (and for every key of an empty row)
+    Runs in a worker process during the external merge sort
+    """
+
+    if isinstance(chunk, tuple):
+        chunk = read_chunk(*chunk)
+
+    fieldnames = tuple(fieldnames)
+    digests = []
+    records = []
+    for i, row in enumerate(chunk):
+        # Empty rows are skipped
+        if row_is_empty(row):
+            digests.append((0, 0, 0))
+            continue
+
+        digests.append(tuple(key or 0 for key in get_rule_keys(row)))
+        if write_run:
+            sort_key = get_sort_key(row) + (get_sequence_number(chunk_index, i),)
+            records.append((sort_key, rio.get_values(row, fieldnames)))
+
+    run_path = None
+    if records:
+        records.sort(key=operator.itemgetter(0))
+        run_path = write_chunk_to_temp(records, [])
+
+    return run_path, np.array(digests, dtype=np.uint64).reshape(-1, 3)
+
+
+def add_chunk_keys(
+    chunk_index: int, digests, duplicate_index, unnumbered_keys: list, key_buckets=None
+):
+    """
+    Adds the keys of a chunk's rows with observation numbers to the duplicate index (or,
+    for partitioned deduplication, to the key buckets along with the keys that the chunk's
+    other rows are checked with), and keeps the sequence numbers and keys of its other
+    non-empty rows (which are only checked once every row with one has been added) in
+    unnumbered_keys
+    """
+
+    observation_keys, url_keys, alias_date_keys = digests.T
+
+    numbered = observation_keys != 0
+    unnumbered = ~numbered & (alias_date_keys != 0)
+
+    if key_buckets is not None:
+        write_key_entries(
+            key_buckets, get_key_entries(chunk_index, digests, numbered, unnumbered)
+        )
+    else:
+        for rule_keys in zip(
+            observation_keys[numbered].tolist(),
+            url_keys[numbered].tolist(),
+            alias_date_keys[numbered].tolist(),
+        ):
+            add_to_duplicate_index(
+                (rule_keys[0], rule_keys[1] or None, rule_keys[2]), duplicate_index
+            )
+
+    unnumbered_keys.append(
+        (
+            chunk_index,
+            np.flatnonzero(unnumbered),
+            url_keys[unnumbered],
+            alias_date_keys[unnumbered],
+        )
+    )
+
+
+def find_duplicate_rows(unnumbered_keys: list, duplicate_index, matched_rows=()):
+    """
+    Checks the rows without observation numbers (from add_chunk_keys) in order against the
+    duplicate index, adding each row that is kept
+    Rows whose sequence numbers are in matched_rows are duplicates without being checked
+    Returns the sequence numbers of the duplicate rows
+    """
+
+    duplicates = []
+    for chunk_index, row_indices, url_keys, alias_date_keys in unnumbered_keys:
+        for i, url_key, alias_date_key in zip(
+            row_indices.tolist(), url_keys.tolist(), alias_date_keys.tolist()
+        ):
+            sequence_number = get_sequence_number(chunk_index, i)
+            rule_keys = (None, url_key or None, alias_date_key)
+            if sequence_number in matched_rows or is_duplicate(
+                rule_keys, duplicate_index
+            ):
+                duplicates.append(sequence_number)
+            else:
+                add_to_duplicate_index(rule_keys, duplicate_index)
+
+    return duplicates
+
+
+def get_key_entries(chunk_index: int, digests, numbered, unnumbered):
+    """
+    Creates the key bucket entries of a chunk (see KEY_ENTRY_TYPE): the keys of its rows
+    with observation numbers, and the keys that its other non-empty rows are checked with
+    """
+
+    observation_keys, url_keys, alias_date_keys = digests.T
+    has_url = url_keys != 0
+    tags = (
+        get_sequence_number(chunk_index, 0) + np.arange(len(digests), dtype=np.uint64)
+    ) << np.uint64(3)
+
+    # Pair each kind of entry with the keys and rows it applies to
+    kinds = [
+        (KEY_URL, url_keys, numbered & has_url),
+        (KEY_ALIAS_DATE, alias_date_keys, numbered & ~has_url),
+        (KEY_ALIAS_DATE_WITH_URL, alias_date_keys, numbered & has_url),
+        (CHECK_URL, url_keys, unnumbered & has_url),
+        (CHECK_ALIAS_DATE, alias_date_keys, unnumbered & has_url),
+        (CHECK_ALIAS_DATE_ANY, alias_date_keys, unnumbered & ~has_url),
+    ]
+
+    entries = np.empty(sum(int(rows.sum()) for _, _, rows in kinds), KEY_ENTRY_TYPE)
+    start = 0
+    for kind, keys, rows in kinds:
+        end = start + int(rows.sum())
+        entries["digest"][start:end] = keys[rows]
+        entries["tag"][start:end] = tags[rows] | np.uint64(kind)
+        start = end
+
+    return entries
+
+
+def create_key_buckets():
+    # Create MERGE_FAN_IN temporary key bucket files, returning their paths and open files
+    bucket_paths = []
+    bucket_files = []
+    for _ in range(MERGE_FAN_IN):
+        fd, path = tempfile.mkstemp(suffix=".keys", dir="./temp")
+        bucket_paths.append(path)
+        bucket_files.append(os.fdopen(fd, "wb"))
+
+    return bucket_paths, bucket_files
+
+
+def write_key_entries(key_buckets, entries, key_divisor: int = 1):
+    """
+    Appends key bucket entries to the bucket files chosen by their digests, so that entries
+    with equal keys always share a bucket (key_divisor skips the digits of the digests in base
+    MERGE_FAN_IN that chose the bucket being split, if any)
+    """
+
+    _, bucket_files = key_buckets
+
+    # Group the entries by bucket and write each group
+    buckets = entries["digest"] // np.uint64(key_divisor) % np.uint64(len(bucket_files))
+    order = np.argsort(buckets, kind="stable")
+    boundaries = np.searchsorted(buckets[order], np.arange(len(bucket_files) + 1))
+    for i, bucket_file in enumerate(bucket_files):
+        if boundaries[i] < boundaries[i + 1]:
+            entries[order[boundaries[i] : boundaries[i + 1]]].tofile(bucket_file)
+
+
+def read_key_entries(bucket_path):
+    # Yield the entries of a key bucket file in arrays that fit in the run memory budget
+    count = max(
+        1, RUN_MEMORY_BUDGET // KEY_BUCKET_MEMORY_FACTOR // KEY_ENTRY_TYPE.itemsize
+    )
+    with open(bucket_path, "rb") as bucket_file:
+        entries = np.fromfile(bucket_file, KEY_ENTRY_TYPE, count)
+        while len(entries):
+            yield entries
+            entries = np.fromfile(bucket_file, KEY_ENTRY_TYPE, count)
+
+
+def split_key_bucket(bucket_path, key_divisor: int = 1):
+    """
+    Splits a key bucket file into bucket files that each fit in the run memory budget once
+    joined (removing it), returning their paths
+    A bucket that cannot be split because its entries all have the same key is kept whole,
+    with a warning that joining it may take more memory than the budget
+    """
+
+    bucket_size = os.path.getsize(bucket_path)
+    if bucket_size * KEY_BUCKET_MEMORY_FACTOR <= RUN_MEMORY_BUDGET:
+        return [bucket_path]
+
+    # Check whether the bucket's entries all have the same key as its first entry
+    first_key = None
+    for entries in read_key_entries(bucket_path):
+        if first_key is None:
+            first_key = entries["digest"][0]
+        if (entries["digest"] != first_key).any():
+            break
+    else:
+        print(
+            "    Warning: {} duplicate checks share one key, which may take more memory "
+            "than the run memory budget".format(bucket_size // KEY_ENTRY_TYPE.itemsize)
+        )
+        return [bucket_path]
+
+    # Split the bucket by the next digits of the digests
+    key_divisor *= MERGE_FAN_IN
+    key_buckets = create_key_buckets()
+    try:
+        for entries in read_key_entries(bucket_path):
+            write_key_entries(key_buckets, entries, key_divisor)
+    finally:
+        for bucket_file in key_buckets[1]:
+            bucket_file.close()
+    os.remove(bucket_path)
+
+    # Split the new buckets further if needed, removing the empty ones
+    bucket_paths = []
+    for path in key_buckets[0]:
+        if os.path.getsize(path):
+            bucket_paths.extend(split_key_bucket(path, key_divisor))
+        else:
+            os.remove(path)
+
+    return bucket_paths
+
 
+def join_key_bucket(bucket_path):
+    """
+    Finds the rows without observation numbers in a key bucket that match a row with an
+    observation number (by the rules of is_duplicate), returning their sequence numbers
+    Runs in a worker process during partitioned deduplication
+    """
 
-def write_chunk_to_temp(chunk, fieldnames, temp_files):
+    entries = np.fromfile(bucket_path, KEY_ENTRY_TYPE)
+    digests = entries["digest"]
+    kinds = entries["tag"] & np.uint64(7)
+
+    # The keys of the rows with observation numbers, by kind
+    url_keys = digests[kinds == KEY_URL]
+    alias_date_keys = digests[kinds == KEY_ALIAS_DATE]
+    alias_date_with_url_keys = digests[kinds == KEY_ALIAS_DATE_WITH_URL]
+
+    # Rule 2 matches URL keys; rule 3 matches alias/date keys of rows without URLs, or of
+    # any row if the row being checked has no URL
+    matched = (
+        (kinds == CHECK_URL) & np.isin(digests, url_keys)
+        | ((kinds == CHECK_ALIAS_DATE) | (kinds == CHECK_ALIAS_DATE_ANY))
+        & np.isin(digests, alias_date_keys)
+        | (kinds == CHECK_ALIAS_DATE_ANY) & np.isin(digests, alias_date_with_url_keys)
+    )
+
+    return entries["tag"][matched] >> np.uint64(3)
+
+
+def write_chunk_to_temp(records, temp_files):
     # Create a temporary file to output to
-    fd, path = tempfile.mkstemp(suffix=".csv", dir="./temp")
+    fd, path = tempfile.mkstemp(suffix=".run", dir="./temp")
+    os.close(fd)
     temp_files.append(path)
 
-    # Write the given chunk to the temporary file and add it to the list of current temporary files
-    with os.fdopen(
-        fd, "w", newline="", encoding="utf-8", errors="replace"
-    ) as temp_file:
-        writer = csv.DictWriter(temp_file, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(chunk)
+    # Write the given records to the temporary file and add it to the list of current temporary files
+    write_run_file(records, path)
 
     return path
 
 
-def compare_numerical_string(string1: str, string2: str):
+def compress_block(block: bytes):
+    # Compress a block of a run file with the method set by RUN_COMPRESSION
+    if RUN_COMPRESSION == "lz4" and lz4 is not None:
+        return lz4.frame.compress(block)
+    if RUN_COMPRESSION in ("zlib", "lz4"):
+        return zlib.compress(block, 1)
+
+    return block
+
+
+def decompress_block(block: bytes):
+    # Decompress a block of a run file with the method set by RUN_COMPRESSION
+    if RUN_COMPRESSION == "lz4" and lz4 is not None:
+        return lz4.frame.decompress(block)
+    if RUN_COMPRESSION in ("zlib", "lz4"):
+        return zlib.decompress(block)
+
+    return block
+
+
+def append_run_record(block: bytearray, record):
+    # Append a marshalled record and its length to a block of a run file
+    data = marshal.dumps(record)
+    block += RUN_LENGTH_FORMAT.pack(len(data))
+    block += data
+
+
+def write_run_block(run_file, block: bytearray):
+    # Write a (compressed) block and its length to a run file
+    data = compress_block(bytes(block))
+    run_file.write(RUN_LENGTH_FORMAT.pack(len(data)) + data)
+
+
+def write_run_file(records, path):
     """
-    A comparison function for two strings of numbers
+    Writes (sort key, values) records to a temporary run file in a compact binary format:
+    a sequence of length-prefixed blocks, each holding length-prefixed marshalled records
+    """
+
+    with open(path, "wb") as run_file:
+        block = bytearray()
+
+        for record in records:
+            append_run_record(block, record)
+
+            # Write the block when it reaches RUN_BLOCK_SIZE
+            if len(block) >= RUN_BLOCK_SIZE:
+                write_run_block(run_file, block)
+                block = bytearray()
+
+        # Write the final partial block
+        if block:
+            write_run_block(run_file, block)
+
+
+def read_run_file(path):
+    """
+    Reads (sort key, values) records from a temporary run file written by write_run_file
+    """
+
+    with open(path, "rb") as run_file:
+        while True:
+            # Read the length of the next block, stopping at the end of the file
+            header = run_file.read(RUN_LENGTH_FORMAT.size)
+            if not header:
+                break
+            (block_length,) = RUN_LENGTH_FORMAT.unpack(header)
+            block = memoryview(decompress_block(run_file.read(block_length)))
+
+            # Read each record in the block
+            offset = 0
+            while offset < len(block):
+                (record_length,) = RUN_LENGTH_FORMAT.unpack_from(block, offset)
+                offset += RUN_LENGTH_FORMAT.size
+                yield marshal.loads(block[offset : offset + record_length])
+                offset += record_length
+
+
+def numerical_string_key(string: str):
+    """
+    A sort key for strings of numbers
+    Empty strings sort last, numbers sort by value, and other strings sort after numbers
     """
 
     # Treat an empty string as the largest value
-    if string1 == "" and string2 != "":
-        return 1
-    if string2 == "" and string1 != "":
-        return -1
-    if string1 == "" and string2 == "":
-        return 0
-
-    # At this point, both strings have content
-    # Try converting to integers to compare
-    try:
-        number1 = int(string1)
-        number2 = int(string2)
+    if string == "":
+        return (1,)
 
-        return (number1 > number2) - (number1 < number2)
-    except:
-        # Converting to integers failed, so just compare as strings
-        return (string1 > string2) - (string1 < string2)
+    # Try converting to an integer to compare by value
+    try:
+        return (0, 0, int(string), "")
+    except ValueError:
+        # Converting to an integer failed, so just compare as a string
+        return (0, 1, 0, string)
 
 
-def compare_string(string1, string2):
+def string_key(string: str):
     """
-    A comparison function for strings
+    A sort key for strings
     Treats empty strings as the largest value (opposite of default str comparison)
     """
 
     # Treat an empty string as the largest value
-    if string1 == "" and string2 != "":
-        return 1
-    if string2 == "" and string1 != "":
-        return -1
-
-    # At this point, either both are blank or both have content.
-    # Either way, they can be compared directly
-    return (string1 > string2) - (string1 < string2)
-
-
-def compare_month(month1: str, month2: str):
-    """
-    A comparison function for formatted months (Roman numerals 1-12)
-    """
-
-    # Treat empty strings as the largest value
-    if month1 == "" and month2 != "":
-        return 1
-    if month2 == "" and month1 != "":
-        return -1
-    if month1 == "" and month2 == "":
-        return 0
-
-    # Dict linking Roman numerals to decimal values
-    months = {
-        "I": 1,
-        "II": 2,
-        "III": 3,
-        "IV": 4,
-        "V": 5,
-        "VI": 6,
-        "VII": 7,
-        "VIII": 8,
-        "IX": 9,
-        "X": 10,
-        "XI": 11,
-        "XII": 12,
-    }
+    if string == "":
+        return (1, "")
 
-    # Return comparison of decimal value of given months
-    return (months[month1] > months[month2]) - (months[month1] < months[month2])
+    return (0, string)
 
 
-def compare_rows(row1: dict, row2: dict):
+def month_key(month: str):
     """
-    Custom comparison function for sorting merged data
+    A sort key for formatted months (Roman numerals 1-12)
+    Empty strings sort last and unrecognized months sort after December
     """
 
-    # First, compare "Observation No."
-    observation_no_comparison = compare_numerical_string(
-        row1[OBSERVATION_NUMBER], row2[OBSERVATION_NUMBER]
-    )
-    if observation_no_comparison != 0:
-        return observation_no_comparison
-
-    # Second, compare "Collector - Last Name"
-    last_name_comparison = compare_string(row1[LAST_NAME], row2[LAST_NAME])
-    if last_name_comparison != 0:
-        return last_name_comparison
-
-    # Third, compare "Collector - First Name"
-    first_name_comparison = compare_string(row1[FIRST_NAME], row2[FIRST_NAME])
-    if first_name_comparison != 0:
-        return first_name_comparison
-
-    # Fourth, compare "Month 1"
-    month_comparison = compare_month(row1[MONTH], row2[MONTH])
-    if month_comparison != 0:
-        return month_comparison
-
-    # Fifth, compare "Collection Day 1"
-    day_comparison = compare_numerical_string(row1[DAY], row2[DAY])
-    if day_comparison != 0:
-        return day_comparison
-
-    # Sixth, compare "Sample ID"
-    sample_id_comparison = compare_numerical_string(row1[SAMPLE_ID], row2[SAMPLE_ID])
-    if sample_id_comparison != 0:
-        return sample_id_comparison
-
-    # Seventh, compare "Specimen ID"
-    specimen_id_comparison = compare_numerical_string(
-        row1[SPECIMEN_ID], row2[SPECIMEN_ID]
-    )
-    if specimen_id_comparison != 0:
-        return specimen_id_comparison
+    # Treat an empty string as the largest value
+    if month == "":
+        return (1, 0, "")
 
-    return 0
+    return (0, MONTHS.get(month, 13), month)
 
 
-def merge_files_batch(input_files, output_file, sort_key, fieldnames):
+def get_sort_key(row):
     """
-    Merges a batch of data files into a single sorted file
+    Compiles a row into a tuple that sorts in the same order as the merged data:
+    "Observation No.", "Collector - Last Name", "Collector - First Name", "Month 1",
+    "Collection Day 1", "Sample ID", and "Specimen ID", with blank values last
     """
 
-    # A list of open file readers
-    readers = []
-    # A list of rows to be merged
-    current_rows = []
+    return (
+        numerical_string_key(row[OBSERVATION_NUMBER]),
+        string_key(row[LAST_NAME]),
+        string_key(row[FIRST_NAME]),
+        month_key(row[MONTH]),
+        numerical_string_key(row[DAY]),
+        numerical_string_key(row[SAMPLE_ID]),
+        numerical_string_key(row[SPECIMEN_ID]),
+    )
 
-    # Read each input file
-    for file_name in input_files:
-        file = open(file_name, "r", newline="", encoding="utf-8", errors="replace")
-        reader = csv.DictReader(file)
-        readers.append((file, reader))
 
-        # Read the first row; input files should be sorted so the first row has the minimum sorting value
-        try:
-            row = next(reader)
-            current_rows.append((sort_key(row), row, reader))
-        except StopIteration:
-            current_rows.append((None, None, reader))
-
-    # Open the output file and write the header
-    with open(
-        output_file, "w", newline="", encoding="utf-8", errors="replace"
-    ) as out_file:
-        writer = csv.DictWriter(out_file, fieldnames=fieldnames)
-        writer.writeheader()
-
-        # Write the row with the minimum sorting value to the output until there are no valid rows left
-        while True:
-            # Filter for non-empty rows
-            valid_rows = [
-                (key, row, i)
-                for i, (key, row, _) in enumerate(current_rows)
-                if row is not None
-            ]
-            if not valid_rows:
-                break
+def encode_sort_column(values: list, column_key):
+    """
+    Encodes a column of strings as integer ranks that sort in the same order as column_key
+    Only the distinct values of the column are sorted with the (slow) key function
+    Values with the same key (e.g. Sample IDs "1" and "01") get the same rank, so that
+    ties keep their input order as they do when sorting by get_sort_key
+    """
 
-            # Write the row with the minimum sorting value
-            min_key, min_row, min_idx = min(valid_rows)
-            writer.writerow(min_row)
+    # Rank the distinct keys of the column
+    keys = {value: column_key(value) for value in set(values)}
+    distinct_keys = sorted(set(keys.values()))
+    key_ranks = {key: rank for rank, key in enumerate(distinct_keys)}
+    ranks = {value: key_ranks[key] for value, key in keys.items()}
 
-            # Read the next row from the file that the minimum row came from
-            try:
-                # current_rows[min_idx][2] is the reader for the file
-                next_row = next(current_rows[min_idx][2])
-                # Replace the minimum row with the next row
-                current_rows[min_idx] = (
-                    sort_key(next_row),
-                    next_row,
-                    current_rows[min_idx][2],
-                )
-            except StopIteration:
-                current_rows[min_idx] = (None, None, current_rows[min_idx][2])
+    # Replace each value with its rank
+    return np.fromiter(
+        (ranks[value] for value in values), dtype=np.int64, count=len(values)
+    )
+
+
+def get_sort_order(rows: list):
+    """
+    Finds the sorted order of a list of rows with a single NumPy lexsort over encoded sort columns
+    Produces the same order as sorting by get_sort_key
+    """
 
-    # Close the readers
-    for file, _ in readers:
-        file.close()
+    # Sort columns and their key functions, from the primary key to the last tiebreaker
+    sort_columns = [
+        (OBSERVATION_NUMBER, numerical_string_key),
+        (LAST_NAME, string_key),
+        (FIRST_NAME, string_key),
+        (MONTH, month_key),
+        (DAY, numerical_string_key),
+        (SAMPLE_ID, numerical_string_key),
+        (SPECIMEN_ID, numerical_string_key),
+    ]
 
+    # Load each sort column into a NumPy array of ranks
+    encoded_columns = [
+        encode_sort_column([row[column] for row in rows], column_key)
+        for column, column_key in sort_columns
+    ]
 
-def merge_sorted_files(temp_files, output_file_path, sort_key, fieldnames):
+    # np.lexsort uses the last key as the primary key, so pass the columns in reverse
+    return np.lexsort(encoded_columns[::-1])
+
+
+def merge_runs(run_files, duplicates=frozenset()):
     """
-    Merges a set of pre-sorted and deduped temporary data files into a single sorted dataset
+    Merges sorted run files into a single sorted stream of (sort key, values) records,
+    leaving out the rows whose sequence numbers (the end of their sort keys) are in duplicates
     """
 
-    if not temp_files:
-        return
+    # Stream the records from all runs through a heap, which holds the current record of
+    # each run and yields the one with the minimum sorting value
+    records = heapq.merge(
+        *[read_run_file(file_name) for file_name in run_files],
+        key=operator.itemgetter(0),
+    )
+    if not duplicates:
+        return records
 
-    # Create a queue of files to merge, starting with the temporary files created for each data chunk
-    files_queue = deque(temp_files)
+    return (record for record in records if record[0][-1] not in duplicates)
 
-    # Merge files until there is one file left (the output file)
-    while len(files_queue) > 1:
-        print("    Merge queue:" + (" X" * len(files_queue)))
 
-        # Create a batch of files to merge together from the files queue
-        batch = []
-        for _ in range(min(MERGE_SIZE, len(files_queue))):
-            batch.append(files_queue.popleft())
+def save_merge_job(job_key, job):
+    """
+    Checkpoints a merge job along with the temporary files it still needs: the runs of the
+    current merge level that have not been merged
+    """
 
-        # If this is the final merge and all files are in the batch, merge directly into the output file
-        if not files_queue and len(batch) == len(temp_files):
-            merge_files_batch(batch, output_file_path, sort_key, fieldnames)
-        else:
-            # Create a temporary file to merge into
-            fd, merged_path = tempfile.mkstemp(suffix=".csv", dir="./temp")
-            os.close(fd)
+    merged_runs = job.get("merged_runs", [])
+    files = job.get("runs", [])[len(merged_runs) * MERGE_FAN_IN :] + merged_runs
+    mcp.save_job(job_key, job, files)
 
-            # Merge into the temporary file
-            merge_files_batch(batch, merged_path, sort_key, fieldnames)
 
-            # Add the merged file to the queue and the listing of all temporary files
-            files_queue.append(merged_path)
-            temp_files.append(merged_path)
+def merge_sorted_files(
+    job_key, job, output_file_path, fieldnames, min_observation_no=None
+):
+    """
+    Merges the pre-sorted and deduped temporary run files of a merge job (under "runs") into
+    a single sorted and indexed dataset, returning its statistics
+    Each level of intermediate runs is checkpointed as its runs are written, so an
+    interrupted merge continues from the last finished run
+    Rows whose sequence numbers are listed under "duplicates" are left out
+    """
 
-        # Clean up files that were used in the merge
-        for file_name in batch:
-            os.remove(file_name)
-            temp_files.remove(file_name)
+    duplicates = set(job.get("duplicates", []))
 
+    # Merge groups of MERGE_FAN_IN runs into intermediate runs until few enough remain
+    # to merge all at once (this only happens for very large datasets)
+    while len(job["runs"]) > MERGE_FAN_IN:
+        print(
+            "    Merging {} sorted runs into intermediate runs...".format(
+                len(job["runs"])
+            )
+        )
 
-def find_last_observation_number(file_path):
+        merged_runs = job.setdefault("merged_runs", [])
+        for batch_start in range(
+            len(merged_runs) * MERGE_FAN_IN, len(job["runs"]), MERGE_FAN_IN
+        ):
+            batch = job["runs"][batch_start : batch_start + MERGE_FAN_IN]
+
+            # Merge the batch into a new temporary run and checkpoint it
+            write_chunk_to_temp(merge_runs(batch, duplicates), merged_runs)
+            save_merge_job(job_key, job)
+
+            # Clean up files that were used in the merge
+            for file_name in batch:
+                os.remove(file_name)
+
+        # Replace the listing of runs with the merged runs (the next merge level)
+        job["runs"] = merged_runs
+        job["merged_runs"] = []
+        save_merge_job(job_key, job)
+
+    # Merge the remaining runs directly into the output file (the only CSV written); the
+    # runs are removed when the job finishes
+    print("    Merging {} sorted runs...".format(len(job["runs"])))
+    return write_indexed_output(
+        (values for _, values in merge_runs(job["runs"], duplicates)),
+        output_file_path,
+        fieldnames,
+        min_observation_no,
+    )
+
+
+def write_indexed_output(rows, output_file_path, fieldnames, min_observation_no=None):
+    """
+    Writes sorted rows (sequences of values in the order of fieldnames) to the output file,
+    adding observation numbers to unindexed rows as they are written (starting at no less
+    than min_observation_no, if given)
+    Returns statistics of the output dataset (see dataset_manifest.py), including the index
+    of the first new row (the row after the largest observation number), under "row_index"
+    the byte offset and observation number of each row (see dataset_index.py), and under
+    "new_rows" the newly numbered rows as records
+    """
+
+    observation_no_column = fieldnames.index(OBSERVATION_NUMBER)
+    year_column = fieldnames.index(YEAR) if YEAR in fieldnames else None
     last_observation_no = None
     last_observation_no_index = -1
+    next_observation_no = None
+    n_rows = 0
+    n_new_rows = 0
+    # Whether a non-numeric observation number was seen (these sort after numeric ones)
+    non_numeric_observation_no = False
+    # The first and last row index and the number of rows of each "Year 1" value
+    year_ranges = {}
+    # The byte offset of each row (plus the end of the file) and its observation number
+    row_offsets = array.array("Q")
+    observation_numbers = array.array("q")
+    # The rows that were given observation numbers (the delta of the merge)
+    record_class = dsr.get_record_class(tuple(fieldnames))
+    new_rows = []
+
+    # Rows are formatted into a buffer and encoded before writing so their offsets are known
+    line_buffer = io.StringIO()
+    writer = csv.writer(line_buffer)
+
+    with open(output_file_path, "wb", buffering=rio.BUFFER_SIZE) as output_file:
+        writer.writerow(fieldnames)
+        offset = output_file.write(
+            line_buffer.getvalue().encode(rio.ENCODING, errors=rio.ERRORS)
+        )
+
+        for i, values in enumerate(rows):
+            observation_no = values[observation_no_column]
 
-    # Search through the given file row-by-row for the largest observation number
-    with open(file_path, "r", newline="", encoding="utf-8", errors="replace") as file:
-        reader = csv.DictReader(file)
-        for i, row in enumerate(reader):
-            if row.get(OBSERVATION_NUMBER):
+            if observation_no:
+                # Track the largest observation number and its index
                 try:
-                    current_observation_no = int(row[OBSERVATION_NUMBER])
+                    current_observation_no = int(observation_no)
                     if (
                         last_observation_no is None
                         or current_observation_no > last_observation_no
                     ):
                         last_observation_no = current_observation_no
                         last_observation_no_index = i
-                except (ValueError, TypeError):
-                    continue
+                except ValueError:
+                    non_numeric_observation_no = True
+            else:
+                # Unindexed rows sort last, so every observation number has been seen by the
+                # time the first one is reached
+                if next_observation_no is None:
+                    next_observation_no = get_next_observation_number(
+                        last_observation_no
+                    )
+
+                    # Observation numbers from other partitions of the dataset may be larger
+                    if min_observation_no is not None:
+                        next_observation_no = max(
+                            next_observation_no, min_observation_no
+                        )
+
+                # Fill in the empty observation number
+                values = list(values)
+                values[observation_no_column] = str(next_observation_no)
+                next_observation_no += 1
+                n_new_rows += 1
+                new_rows.append(record_class(values))
+
+            # Track the range of rows of each year
+            if year_column is not None:
+                year = values[year_column] or ""
+                if year in year_ranges:
+                    year_ranges[year]["last_row"] = i
+                    year_ranges[year]["row_count"] += 1
+                else:
+                    year_ranges[year] = {"first_row": i, "last_row": i, "row_count": 1}
+
+            # Record the row's offset and observation number for the index
+            row_offsets.append(offset)
+            try:
+                observation_numbers.append(int(values[observation_no_column]))
+            except (ValueError, OverflowError):
+                observation_numbers.append(dsi.NO_OBSERVATION_NUMBER)
+
+            # Format the row and write it
+            line_buffer.seek(0)
+            line_buffer.truncate()
+            writer.writerow(values)
+            offset += output_file.write(
+                line_buffer.getvalue().encode(rio.ENCODING, errors=rio.ERRORS)
+            )
+            n_rows += 1
+
+        row_offsets.append(offset)
+
+    # The largest observation number may have increased with the new rows
+    if next_observation_no is not None:
+        last_observation_no = next_observation_no - 1
+
+    return {
+        "row_count": n_rows,
+        "new_row_count": n_new_rows,
+        "first_new_row": last_observation_no_index + 1,
+        "max_observation_number": last_observation_no,
+        # Newly numbered rows come after any non-numeric observation numbers, out of order
+        "sorted": not (non_numeric_observation_no and n_new_rows > 0),
+        "header_hash": dsm.get_header_hash(fieldnames),
+        "year_ranges": year_ranges,
+        "row_index": (row_offsets, observation_numbers),
+        "new_rows": new_rows,
+    }
+
+
+def get_next_observation_number(last_observation_no):
+    if last_observation_no is not None:
+        # Add one to the last observation number to get the next one
+        return last_observation_no + 1
 
-    # Return the observation number and its index
-    return (last_observation_no, last_observation_no_index)
+    # No previous observation number in the base data, so start at zero (plus the year prefix)
+    current_year = str(datetime.datetime.now().year)[2:]
+    return int(current_year + "00000")
+
+
+def write_dataset_index(output_file_path, output_statistics):
+    # Store an index of the output's rows so later stages can seek straight to them
+    row_offsets, observation_numbers = output_statistics.pop("row_index")
+    dsi.write_index(output_file_path, row_offsets, observation_numbers)
+
+    # Store the output's statistics (but not its new rows) next to it so later stages and
+    # runs can skip scanning it
+    dsm.write_manifest(
+        output_file_path,
+        {key: value for key, value in output_statistics.items() if key != "new_rows"},
+    )
 
 
 def store_new_observation_index(index: int):
@@ -431,62 +1116,672 @@ def store_new_observation_index(index: int):
         csv_writer.writerow(labels_config)
 
 
-def index_data(file_path):
+def estimate_dataset_size(input_file_path, new_data):
+    """
+    Estimates the in-memory size (in bytes) of the input dataset combined with the new data
+    """
+
+    # Parsed rows take up several times more memory than their CSV text
+    input_size = os.path.getsize(input_file_path) * ROW_MEMORY_FACTOR
+    new_data_size = sum(estimate_row_size(row) for row in new_data)
+
+    return input_size + new_data_size
+
+
+def get_new_data_keys(new_data):
+    # Collect the URL and alias/date keys that the new data's rows without observation
+    # numbers are checked with (the only keys of the dataset's rows they can match)
+    keys = set()
+    for row in new_data:
+        if not row_is_empty(row) and not row.get(OBSERVATION_NUMBER):
+            _, url_key, alias_date_key = get_rule_keys(row)
+            keys.update((url_key, alias_date_key))
+
+    keys.discard(None)
+    return keys
+
+
+def index_sorted_base(input_file_path, new_data, fieldnames):
+    """
+    Checks in one pass whether the input dataset is already sorted and fully indexed
+    (every row has an observation number); if so, returns a duplicate index of its rows
+    that share a key with the new data, otherwise returns None
+    Only those rows can match a new row, so the index takes memory for the new data rather
+    than for the whole dataset
+    """
+
+    # A valid manifest (written by a previous merge, which indexes every row) tells whether
+    # the dataset is sorted without checking each row
+    manifest = dsm.read_manifest(input_file_path)
+    check_order = True
+    if manifest is not None and manifest["header_hash"] == dsm.get_header_hash(
+        fieldnames
+    ):
+        if not manifest["sorted"]:
+            return None
+        check_order = False
+
+    duplicate_index = create_duplicate_index()
+    new_data_keys = get_new_data_keys(new_data)
+    if not check_order and not new_data_keys:
+        return duplicate_index
+
+    previous_sort_key = None
+    for chunk in read_csv_chunks(input_file_path):
+        for row in chunk:
+            if check_order:
+                # Rows without observation numbers must be sorted and deduplicated with the new data
+                if not row.get(OBSERVATION_NUMBER):
+                    return None
+
+                # Each row's sort key must be at least the previous row's
+                sort_key = get_sort_key(row)
+                if previous_sort_key is not None and sort_key < previous_sort_key:
+                    return None
+                previous_sort_key = sort_key
+
+            # Add the row's keys if it shares one with the new data (rule 1 is never
+            # checked, since only new rows without observation numbers are checked)
+            if new_data_keys:
+                _, url_key, alias_date_key = get_rule_keys(row)
+                if url_key in new_data_keys or alias_date_key in new_data_keys:
+                    add_to_duplicate_index(
+                        (None, url_key, alias_date_key), duplicate_index
+                    )
+
+    return duplicate_index
+
+
+def merge_incremental(
+    input_file_path,
+    new_data,
+    output_file_path,
+    fieldnames,
+    duplicate_index,
+    min_observation_no=None,
+):
     """
-    Adds observation numbers to unindexed rows of a sorted dataset file
+    Merges new data into an input dataset that is already sorted and indexed in a single
+    linear pass; only the new rows are deduplicated and sorted
     """
 
-    # Search through sorted data to find the last observation number
-    last_observation_no, last_observation_no_index = find_last_observation_number(
-        file_path
+    print("    Merging new data into sorted dataset...")
+
+    # Deduplicate the new data against the dataset's rows and sort what remains
+    new_rows = sort_and_dedupe_chunk(new_data, duplicate_index)
+
+    # Stream the dataset and the new rows into the output in sorted order
+    merged_rows = heapq.merge(
+        rio.iterate_records(input_file_path), new_rows, key=get_sort_key
+    )
+    return write_indexed_output(
+        rio.get_row_values(merged_rows, fieldnames),
+        output_file_path,
+        fieldnames,
+        min_observation_no,
     )
 
-    # Store the index of the first new observation number (for printing labels later in the pipeline)
-    store_new_observation_index(last_observation_no_index + 1)
 
-    if last_observation_no is not None:
-        # Add one to the last observation number to get the next one
-        next_observation_no = last_observation_no + 1
+def sort_in_memory(
+    input_file_path, new_data, output_file_path, fieldnames, min_observation_no=None
+):
+    """
+    Deduplicates, sorts, and indexes the input dataset and new data entirely in memory
+    and writes the output directly (no temporary files)
+    """
+
+    print("    Sorting data in memory...")
+
+    # Read the whole dataset, followed by the new data
+    rows = []
+    for chunk in read_csv_chunks(input_file_path):
+        rows.extend(chunk)
+    rows.extend(new_data)
+
+    # Remove duplicates and find the sorted order of the remaining rows
+    unique_rows = dedupe_chunk(rows, create_duplicate_index())
+    sort_order = get_sort_order(unique_rows)
+
+    # Write the rows to the output file in sorted order
+    sorted_rows = (unique_rows[i] for i in sort_order)
+    return write_indexed_output(
+        rio.get_row_values(sorted_rows, fieldnames),
+        output_file_path,
+        fieldnames,
+        min_observation_no,
+    )
+
+
+def get_merge_job_key(method, input_file_path, new_data, fieldnames, *settings):
+    """
+    Identifies a merge job by everything that determines its temporary files: the merge
+    method, the input dataset's file (and its size and modification time), the new data,
+    and the settings that divide the rows into runs
+    """
+
+    input_stat = os.stat(input_file_path)
+
+    new_data_digest = hashlib.sha256()
+    for values in rio.get_row_values(new_data, fieldnames):
+        new_data_digest.update("\x1f".join(values).encode(rio.ENCODING, rio.ERRORS))
+        new_data_digest.update(b"\x1e")
+
+    return mcp.get_job_key(
+        [
+            method,
+            os.path.abspath(input_file_path),
+            input_stat.st_size,
+            input_stat.st_mtime_ns,
+            new_data_digest.hexdigest(),
+            list(fieldnames),
+            RUN_MEMORY_BUDGET,
+            ROW_MEMORY_FACTOR,
+            MERGE_FAN_IN,
+            RUN_COMPRESSION,
+        ]
+        + list(settings)
+    )
+
+
+def finish_sorted_chunk(
+    job_key,
+    job,
+    chunk_index,
+    sorted_chunk,
+    duplicate_index,
+    unnumbered_keys,
+    key_buckets=None,
+):
+    """
+    Waits for a chunk to be sorted, adds its keys to the duplicate index (or key buckets),
+    and (unless it was sorted before the merge was interrupted) records its run and checkpoints
+    """
+
+    run_path, digests = sorted_chunk.result()
+    add_chunk_keys(chunk_index, digests, duplicate_index, unnumbered_keys, key_buckets)
+
+    if chunk_index < job["sorted_chunks"]:
+        return
+    if run_path is not None:
+        job["runs"].append(run_path)
+    job["sorted_chunks"] += 1
+    save_merge_job(job_key, job)
+
+
+def sort_external(
+    input_file_path,
+    new_data,
+    output_file_path,
+    fieldnames,
+    min_observation_no=None,
+    partitioned=False,
+):
+    """
+    Deduplicates and sorts the input dataset and new data with an external merge sort
+    through temporary files in ./temp
+    Worker processes parse, sort, and write the chunks, and compute the key digests of their
+    rows, while this process only checks the digests against the duplicate index; duplicate
+    rows are left out when the sorted runs are merged
+    With partitioned deduplication, the keys of rows with observation numbers are not held in
+    memory: they are written to on-disk key buckets (chosen by the keys' digests), which are
+    joined with the keys of the other rows bucket by bucket; only the keys of the rows without
+    observation numbers (normally just the new data) are held in memory
+    Each sorted run is checkpointed, so an interrupted merge of the same data only sorts
+    the chunks that were not finished (every chunk is still read to rebuild the duplicate index)
+    """
+
+    # Resume the job if it was interrupted
+    job_key = get_merge_job_key(
+        "partitioned" if partitioned else "external",
+        input_file_path,
+        new_data,
+        fieldnames,
+    )
+    job = mcp.start_job(job_key)
+
+    if not job.get("sorted"):
+        job.setdefault("runs", [])
+        job.setdefault("sorted_chunks", 0)
+        if job["sorted_chunks"]:
+            print("    Resuming after {} sorted chunks...".format(job["sorted_chunks"]))
+
+        # An index of the keys of the rows kept so far (or the key buckets), and the keys of
+        # the rows without observation numbers, which are checked after every row with one
+        # has been added
+        duplicate_index = create_duplicate_index()
+        unnumbered_keys = []
+        key_buckets = create_key_buckets() if partitioned else None
+
+        # Read the dataset's file in byte ranges (parsed by the workers), followed by the new
+        # data in its own chunks
+        chunks = itertools.chain(
+            (
+                (input_file_path, start, end)
+                for start, end in find_chunk_ranges(input_file_path)
+            ),
+            split_into_chunks(new_data),
+        )
+
+        # Parse, sort, and write the chunks to temporary files in parallel worker processes,
+        # adding their keys to the duplicate index here in chunk order
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=MERGE_WORKERS
+        ) as executor:
+            pending_chunks = deque()
+            for i, chunk in enumerate(chunks):
+                # Chunks sorted before the merge was interrupted only compute their keys
+                pending_chunks.append(
+                    (
+                        i,
+                        executor.submit(
+                            sort_chunk, chunk, i, fieldnames, i >= job["sorted_chunks"]
+                        ),
+                    )
+                )
+
+                # Wait for the oldest chunk if too many are in progress (limits memory use)
+                while len(pending_chunks) > MERGE_WORKERS:
+                    finish_sorted_chunk(
+                        job_key,
+                        job,
+                        *pending_chunks.popleft(),
+                        duplicate_index,
+                        unnumbered_keys,
+                        key_buckets,
+                    )
+
+            # Wait for the remaining chunks, keeping the temporary files in chunk order
+            while pending_chunks:
+                finish_sorted_chunk(
+                    job_key,
+                    job,
+                    *pending_chunks.popleft(),
+                    duplicate_index,
+                    unnumbered_keys,
+                    key_buckets,
+                )
+
+            # Join the key buckets (split to fit in the run memory budget) in parallel to
+            # find the rows that match a row with an observation number
+            matched_rows = set()
+            if partitioned:
+                for bucket_file in key_buckets[1]:
+                    bucket_file.close()
+                bucket_paths = list(
+                    itertools.chain.from_iterable(map(split_key_bucket, key_buckets[0]))
+                )
+                print("    Checking {} key buckets...".format(len(bucket_paths)))
+
+                for bucket_path, matches in zip(
+                    bucket_paths, executor.map(join_key_bucket, bucket_paths)
+                ):
+                    matched_rows.update(matches.tolist())
+                    os.remove(bucket_path)
+
+        # Check the rows without observation numbers against the rows kept before them
+        job["duplicates"] = find_duplicate_rows(
+            unnumbered_keys, duplicate_index, matched_rows
+        )
+        job["sorted"] = True
+        save_merge_job(job_key, job)
     else:
-        # No previous observation number in the base data, so start at zero (plus the year prefix)
-        current_year = str(datetime.datetime.now().year)[2:]
-        next_observation_no = int(current_year + "00000")
+        print("    Resuming the merge of {} sorted runs...".format(len(job["runs"])))
+
+    # Merge sorted temporary files in one pass (or in groups of MERGE_FAN_IN if there are many)
+    return merge_sorted_files(
+        job_key, job, output_file_path, fieldnames, min_observation_no
+    )
+
+
+def merge_dataset(
+    input_file_path, new_data, output_file_path, fieldnames, min_observation_no=None
+):
+    """
+    Merges new data into a single-file dataset with the fastest method that applies and
+    writes the output's index and manifest next to it; returns the output's statistics
+    The output is replaced atomically, and an interrupted external merge sort of the same
+    data resumes from its checkpoint in ./temp
+    """
 
-    # Create temporary output file
-    temp_fd, temp_path = tempfile.mkstemp(suffix=".csv", dir="./temp")
-    os.close(temp_fd)
+    # Write the output to a temporary file next to it, which replaces the output only once
+    # it is complete (so an interrupted merge never leaves a partial output)
+    with rio.replace_when_done(output_file_path) as temp_output_path:
+        # If the input dataset is already sorted and indexed, only the new data needs sorting
+        base_index = None
+        if INCREMENTAL_MERGE:
+            base_index = index_sorted_base(input_file_path, new_data, fieldnames)
+
+        # Otherwise, sort the data in memory if it is small enough, or use an external merge
+        # sort, deduplicating through on-disk key buckets if the dataset is very large
+        dataset_size = estimate_dataset_size(input_file_path, new_data)
+        if base_index is not None:
+            output_statistics = merge_incremental(
+                input_file_path,
+                new_data,
+                temp_output_path,
+                fieldnames,
+                base_index,
+                min_observation_no,
+            )
+        elif dataset_size < IN_MEMORY_SORT_BUDGET:
+            output_statistics = sort_in_memory(
+                input_file_path,
+                new_data,
+                temp_output_path,
+                fieldnames,
+                min_observation_no,
+            )
+        else:
+            output_statistics = sort_external(
+                input_file_path,
+                new_data,
+                temp_output_path,
+                fieldnames,
+                min_observation_no,
+                DEDUPE_MODE == "partitioned"
+                or (
+                    DEDUPE_MODE == "auto"
+                    and dataset_size >= PARTITIONED_DEDUPE_THRESHOLD
+                ),
+            )
+
+    # Store the output's index and manifest next to it
+    write_dataset_index(output_file_path, output_statistics)
+
+    # Remove the merge job's checkpoint and temporary runs
+    mcp.finish_job()
+
+    return output_statistics
+
+
+def split_dataset(input_file_path, dataset_dir):
+    """
+    Splits a single-file dataset into one partition file per "Year 1" in dataset_dir,
+    keeping the order of the rows within each partition
+    """
+
+    partition_files = {}
+    partition_writers = {}
 
-    # Read through the input file and fill in empty observation number fields in the output
     try:
-        with open(
-            file_path, "r", newline="", encoding="utf-8", errors="replace"
-        ) as infile, open(
-            temp_path, "w", newline="", encoding="utf-8", errors="replace"
-        ) as outfile:
-            reader = csv.DictReader(infile)
-            fieldnames = reader.fieldnames
-
-            # Ensure there is an observation number field in the output even if it is absent in the input
-            if OBSERVATION_NUMBER not in fieldnames:
-                fieldnames = fieldnames + [OBSERVATION_NUMBER]
-
-            writer = csv.DictWriter(outfile, fieldnames=fieldnames)
-            writer.writeheader()
-
-            # Fill in empty observation numbers sequentially
-            for row in reader:
-                if not row.get(OBSERVATION_NUMBER):
-                    row[OBSERVATION_NUMBER] = str(next_observation_no)
-                    next_observation_no += 1
+        fieldnames = rio.read_fieldnames(input_file_path)
+        year_column = fieldnames.index(YEAR)
+
+        for values in rio.iterate_rows(input_file_path):
+            year = values[year_column] if year_column < len(values) else ""
+            name = dsp.get_partition_name(year)
 
-                writer.writerow(row)
+            # Create the partition's file the first time one of its rows is seen
+            if name not in partition_writers:
+                partition_files[name] = rio.open_csv(
+                    dsp.get_partition_path(dataset_dir, name), "w"
+                )
+                partition_writers[name] = csv.writer(partition_files[name])
+                partition_writers[name].writerow(fieldnames)
 
-        # Overwrite the input file with the indexed output
-        shutil.move(temp_path, file_path)
-    except Exception as e:
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
-        raise e
+            partition_writers[name].writerow(values)
+    finally:
+        for partition_file in partition_files.values():
+            partition_file.close()
+
+
+def merge_partitioned(input_path, new_data, output_dir, fieldnames):
+    """
+    Merges new data into a year-partitioned dataset, reading and writing only the partitions
+    of the years in the new data; a single-file input dataset is split into partitions first
+    Returns the index of the first new row (counting rows through the partitions in year
+    order) and the newly numbered rows in dataset order; the index is None unless every row
+    from it on is new (new rows of earlier years are followed by the older rows of later years)
+    """
+
+    os.makedirs(output_dir, exist_ok=True)
+    split_dir = None
+
+    try:
+        # Split a single-file input dataset into temporary partitions
+        if dsp.is_partitioned(input_path):
+            input_dir = input_path
+        else:
+            print("    Splitting '{}' into partitions by year...".format(input_path))
+            split_dir = tempfile.mkdtemp(dir="./temp")
+            split_dataset(input_path, split_dir)
+            input_dir = split_dir
+
+        input_partitions = {}
+        if os.path.isdir(input_dir):
+            input_partitions = dict(dsp.list_partitions(input_dir))
+
+        # Group the new data by year
+        new_partitions = {}
+        for row in new_data:
+            name = dsp.get_partition_name(row.get(YEAR))
+            new_partitions.setdefault(name, []).append(row)
+
+        # New observation numbers must be larger than those of every partition
+        max_observation_no = max(
+            (
+                observation_no
+                for observation_no in map(
+                    dsp.get_max_observation_number, input_partitions.values()
+                )
+                if observation_no is not None
+            ),
+            default=None,
+        )
+
+        # Make the output's other partitions match the input's if they are different directories
+        if os.path.abspath(input_dir) != os.path.abspath(output_dir):
+            for name, path in dsp.list_partitions(output_dir):
+                if name not in input_partitions and name not in new_partitions:
+                    dsp.remove_partition(path)
+            for name, path in input_partitions.items():
+                if name not in new_partitions:
+                    dsp.copy_partition(path, dsp.get_partition_path(output_dir, name))
+
+        # Merge the new data into each of its partitions in year order
+        first_new_rows = {}
+        new_rows = []
+        for name in sorted(new_partitions, key=dsp.partition_order):
+            print("    Merging partition '{}'...".format(name))
+            output_partition_path = dsp.get_partition_path(output_dir, name)
+
+            # Start a year without a partition from an empty dataset
+            input_partition_path = input_partitions.get(name)
+            if input_partition_path is None:
+                rio.write_rows(output_partition_path, fieldnames, [])
+                input_partition_path = output_partition_path
+
+            min_observation_no = None
+            if max_observation_no is not None:
+                min_observation_no = max_observation_no + 1
+
+            partition_statistics = merge_dataset(
+                input_partition_path,
+                new_partitions[name],
+                output_partition_path,
+                fieldnames,
+                min_observation_no,
+            )
+
+            # Later partitions number their new rows after this one's
+            if partition_statistics["max_observation_number"] is not None:
+                max_observation_no = partition_statistics["max_observation_number"]
+            first_new_rows[name] = partition_statistics["first_new_row"]
+            new_rows.extend(partition_statistics["new_rows"])
+    finally:
+        if split_dir is not None:
+            shutil.rmtree(split_dir)
+
+    # Find the first new row, counting the rows of the partitions before it
+    first_new_row = None
+    row_count = 0
+    for name, path in dsp.list_partitions(output_dir):
+        if first_new_row is None and name in first_new_rows:
+            first_new_row = row_count + first_new_rows[name]
+        row_count += dsm.get_row_count(path)
+
+    # The rows from the first new row to the end must all be new to be given as a range
+    if first_new_row is None:
+        first_new_row = row_count
+    elif row_count - first_new_row != len(new_rows):
+        first_new_row = None
+
+    return first_new_row, new_rows
+
+
+def merge_database(input_file_path, new_data, database_path, fieldnames):
+    """
+    Merges new data into an SQLite dataset database, checking the duplicate rules with
+    indexed queries and numbering the new rows in sorted order, all in one transaction
+    A different input dataset (a CSV file or database) replaces the database's contents
+    Returns the index of the first new row in the database's order and the newly numbered rows
+    """
+
+    # Build a replacement database next to the output if the input is a different dataset
+    in_place = os.path.abspath(input_file_path) == os.path.abspath(database_path)
+    work_path = database_path if in_place else database_path + rio.TEMP_SUFFIX
+    if not in_place:
+        ddb.remove_database(work_path)
+        if ddb.is_database(input_file_path):
+            shutil.copyfile(input_file_path, work_path)
+
+    connection = ddb.connect(work_path)
+    try:
+        with connection:
+            fieldnames = ddb.create_dataset(connection, fieldnames)
+
+            # Add rows with observation numbers first (rule 1 skips numbers already present),
+            # importing a CSV input dataset
+            unnumbered_rows = []
+            if not in_place and not ddb.is_database(input_file_path):
+                print("    Importing '{}' into database...".format(input_file_path))
+                for chunk in read_csv_chunks(input_file_path):
+                    ddb.insert_rows(
+                        connection,
+                        (row for row in chunk if row.get(OBSERVATION_NUMBER)),
+                        fieldnames,
+                    )
+                    unnumbered_rows.extend(
+                        row for row in chunk if not row.get(OBSERVATION_NUMBER)
+                    )
+
+            ddb.insert_rows(
+                connection,
+                (row for row in new_data if row.get(OBSERVATION_NUMBER)),
+                fieldnames,
+            )
+            unnumbered_rows.extend(
+                row for row in new_data if not row.get(OBSERVATION_NUMBER)
+            )
+
+            # Add each other row that does not match a row already in the database
+            print("    Merging new data into database...")
+            new_rows = []
+            for row in unnumbered_rows:
+                if row_is_empty(row) or ddb.is_duplicate(connection, row):
+                    continue
+                row_id = ddb.insert_row(connection, row, fieldnames)
+                new_rows.append((get_sort_key(row), row_id))
+
+            # Number the new rows in sorted order after the largest observation number
+            new_rows.sort(key=operator.itemgetter(0))
+            first_observation_no = get_next_observation_number(
+                ddb.get_max_observation_number(connection)
+            )
+            ddb.set_observation_numbers(
+                connection,
+                (
+                    (first_observation_no + i, row_id)
+                    for i, (_, row_id) in enumerate(new_rows)
+                ),
+            )
+
+            first_new_row = ddb.count_rows_before(connection, first_observation_no)
+            new_rows = ddb.read_new_rows(connection, fieldnames, first_observation_no)
+    finally:
+        connection.close()
+
+    if not in_place:
+        os.replace(work_path, database_path)
+
+    return first_new_row, new_rows
+
+
+def export_database(database_path, output_file_path):
+    # Export a dataset database to a CSV file in the header_format.txt layout, with an index
+    connection = ddb.connect(database_path)
+    try:
+        fieldnames = ddb.read_fieldnames(connection)
+        output_statistics = write_indexed_output(
+            ddb.iterate_values(connection, fieldnames), output_file_path, fieldnames
+        )
+    finally:
+        connection.close()
+
+    write_dataset_index(output_file_path, output_statistics)
+
+
+def get_delta_path(output_file_path):
+    # The delta file (the rows added by the last merge) is stored next to the output
+    return output_file_path.rstrip("/\\") + DELTA_SUFFIX
+
+
+def get_dataset_format(dataset_path):
+    # Datasets are stored as a single CSV or Parquet file, a partitioned folder, or a database
+    if ddb.is_database(dataset_path):
+        return "database"
+    if dpq.is_parquet(dataset_path):
+        return "parquet"
+    if dsp.is_partitioned(dataset_path):
+        return "partitioned"
+    return "csv"
+
+
+def export_to_csv(dataset_path, output_file_path):
+    # Export a Parquet file, partitioned dataset, or dataset database to a single CSV file
+    dataset_format = get_dataset_format(dataset_path)
+    if dataset_format == "database":
+        export_database(dataset_path, output_file_path)
+    elif dataset_format == "parquet":
+        dpq.export_csv(dataset_path, output_file_path)
+    else:
+        dsp.export_dataset(dataset_path, output_file_path)
+
+
+def export_dataset(dataset_path, export_file_path):
+    # Export a dataset in any format to a single CSV file or a Parquet file
+    if not dpq.is_parquet(export_file_path):
+        export_to_csv(dataset_path, export_file_path)
+    elif get_dataset_format(dataset_path) == "csv":
+        dpq.convert_csv(dataset_path, export_file_path)
+    else:
+        # Convert other formats to Parquet through a temporary CSV export
+        temp_fd, temp_path = tempfile.mkstemp(suffix=".csv", dir="./temp")
+        os.close(temp_fd)
+        try:
+            export_to_csv(dataset_path, temp_path)
+            dpq.convert_csv(temp_path, export_file_path)
+        finally:
+            dsp.remove_partition(temp_path)
+
+
+def read_fieldnames(dataset_path):
+    # Read the column names of a dataset in any format (None if it has no rows yet)
+    dataset_format = get_dataset_format(dataset_path)
+    if dataset_format == "parquet":
+        return (
+            dpq.read_fieldnames(dataset_path) if os.path.isfile(dataset_path) else None
+        )
+    if dataset_format != "database":
+        return dsp.read_fieldnames(dataset_path)
+
+    if not os.path.isfile(dataset_path):
+        return None
+    connection = ddb.connect(dataset_path)
+    try:
+        return ddb.read_fieldnames(connection)
+    finally:
+        connection.close()
 
 
 def run(formatted_dict: dict):
@@ -498,8 +1793,11 @@ def run(formatted_dict: dict):
 
         # Read the input and output file paths from the merge config file
         merge_config = get_merge_config()
-        input_file_path = os.path.relpath(merge_config["Input File Path"])
-        output_file_path = os.path.relpath(merge_config["Output File Path"])
+        input_file_path = dsp.get_relative_path(merge_config["Input File Path"])
+        output_file_path = dsp.get_relative_path(merge_config["Output File Path"])
+        export_file_path = merge_config["Export File Path"]
+        if export_file_path:
+            export_file_path = os.path.relpath(export_file_path)
 
         root = tk.Tk()
         root.attributes("-alpha", 0.0)
@@ -522,51 +1820,101 @@ def run(formatted_dict: dict):
 
         root.destroy()
 
-        # Combine the given formatted data across all sources
+        # Read just the field names from the input dataset (a new partitioned dataset or
+        # database has none yet, so use the formatted data's header)
+        fieldnames = read_fieldnames(input_file_path)
+        if fieldnames is None:
+            fieldnames = read_header_format()
+
+        # Combine the given formatted data across all sources as records of the dataset's columns
         new_data = []
         for source in sources:
-            new_data.extend(formatted_dict[source["Abbreviation"]])
-
-        # Read just the field names from the input file
-        with open(
-            input_file_path, newline="", encoding="utf-8", errors="replace"
-        ) as dataset_file:
-            reader = csv.DictReader(dataset_file)
-            fieldnames = reader.fieldnames
+            new_data.extend(
+                dsr.from_dicts(formatted_dict[source["Abbreviation"]], fieldnames)
+            )
 
-        # Create a directory for temporary files if it does not exist
+        # Create a directory for temporary files if it does not exist, and remove the
+        # temporary files left by earlier merges (except those of an interrupted merge job,
+        # which is resumed if the same data is merged again)
         if not os.path.exists("./temp"):
             os.mkdir("./temp")
+        mcp.collect_garbage()
+
+        # An input dataset stored in a different format than the output is merged through a
+        # temporary CSV export (and Parquet files are always merged as CSV files)
+        merge_input_path = input_file_path
+        input_format = get_dataset_format(input_file_path)
+        output_format = get_dataset_format(output_file_path)
+        if input_format != "csv" and (
+            input_format != output_format or input_format == "parquet"
+        ):
+            temp_fd, merge_input_path = tempfile.mkstemp(suffix=".csv", dir="./temp")
+            os.close(temp_fd)
+            export_to_csv(input_file_path, merge_input_path)
 
-        # A set of unique row keys that have been discovered so far
-        seen_keys = set()
-        # A list of file paths of temporary files
-        temp_files = []
-
-        # Read the dataset from its file in chunks; sort, deduplicate, and write each chunk to a temporary file
-        for chunk in read_csv_chunks(input_file_path):
-            # Append new data to the first chunk
-            if new_data:
-                chunk.extend(new_data)
-                new_data = None
-
-            sorted_chunk = sort_and_dedupe_chunk(chunk, seen_keys)
-            if sorted_chunk:
-                write_chunk_to_temp(sorted_chunk, fieldnames, temp_files)
-
-        # If there was no data in the input file, process the new data as a chunk
-        if new_data:
-            sorted_chunk = sort_and_dedupe_chunk(new_data, seen_keys)
-            if sorted_chunk:
-                write_chunk_to_temp(sorted_chunk, fieldnames, temp_files)
-
-        # Merge sorted temporary files in batches of MERGE_SIZE
-        merge_sorted_files(
-            temp_files, output_file_path, functools.cmp_to_key(compare_rows), fieldnames
+        try:
+            if output_format == "database":
+                # Merge the new data into the database with indexed queries
+                first_new_row, new_rows = merge_database(
+                    merge_input_path, new_data, output_file_path, fieldnames
+                )
+            elif output_format == "partitioned":
+                # Merge the new data into only the partitions of the years it belongs to
+                first_new_row, new_rows = merge_partitioned(
+                    merge_input_path, new_data, output_file_path, fieldnames
+                )
+            elif output_format == "parquet":
+                # Merge into a temporary CSV file and convert it to Parquet
+                temp_fd, temp_output_path = tempfile.mkstemp(
+                    suffix=".csv", dir="./temp"
+                )
+                os.close(temp_fd)
+                try:
+                    output_statistics = merge_dataset(
+                        merge_input_path, new_data, temp_output_path, fieldnames
+                    )
+                    dpq.convert_csv(temp_output_path, output_file_path)
+                finally:
+                    dsp.remove_partition(temp_output_path)
+                first_new_row = output_statistics["first_new_row"]
+                new_rows = output_statistics["new_rows"]
+            else:
+                output_statistics = merge_dataset(
+                    merge_input_path, new_data, output_file_path, fieldnames
+                )
+                first_new_row = output_statistics["first_new_row"]
+                new_rows = output_statistics["new_rows"]
+        finally:
+            if merge_input_path != input_file_path:
+                dsp.remove_partition(merge_input_path)
+
+        # Export the dataset to a single CSV or Parquet file if specified
+        if export_file_path and (
+            output_format != "csv" or dpq.is_parquet(export_file_path)
+        ):
+            print("    Exporting dataset to '{}'...".format(export_file_path))
+            export_dataset(output_file_path, export_file_path)
+
+        # Write the newly numbered rows to a delta file next to the output, so later steps
+        # can work on only the new rows
+        delta_file_path = get_delta_path(output_file_path)
+        print(
+            "    Writing {} new rows to '{}'...".format(len(new_rows), delta_file_path)
         )
-
-        # Index the data, storing the row of the first new entry
-        index_data(output_file_path)
+        rio.write_dicts(delta_file_path, fieldnames, new_rows)
+
+        # Store the index of the first new row (for printing labels from the dataset later);
+        # if the new rows are not the last rows of the dataset, start labels at the first row
+        # and point to the delta file instead
+        if first_new_row is None:
+            print(
+                "    The new rows are spread across the dataset's years. To make labels for "
+                "only the new rows in Labels Only Mode, select '{}'".format(
+                    delta_file_path
+                )
+            )
+            first_new_row = 0
+        store_new_observation_index(first_new_row)
 
         print("Merging Data => Done\n")
 
@@ -583,7 +1931,7 @@ def run(formatted_dict: dict):
             )
             log_file.write("\n")
 
-        return output_file_path
+        return output_file_path, new_rows
 
     except Exception:
         # Log the error
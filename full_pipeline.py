@@ -1,21 +1,24 @@
 # Author: Myles Scholz
 # Created on September 15, 2023
 # Description: Executes the full data pipeline for updating the Oregon Bee Atlas database
-import csv
 import os
 import sys
 import tkinter as tk
 from tkinter import filedialog
 
+import dataset_database as ddb
+import dataset_parquet as dpq
 import full_data_pull as fdp
 import full_format_data as ffd
+import full_validate_data as fvd
 import full_merge_data as fmd
 import full_create_labels as fcl
 
 
 def get_dataset_file_path():
     """
-    Gets a file path from the user that points to an existing CSV file.
+    Gets a file path from the user that points to an existing CSV file, Parquet file, or
+    dataset database.
     Used when a file path is not provided programmatically ("labels only" mode).
     """
     dataset_file_path = ""
@@ -29,7 +32,16 @@ def get_dataset_file_path():
     while dataset_file_path == "":
         # Prompt the user
         file_path_response = filedialog.askopenfilename(
-            initialdir="../", filetypes=[("CSV Files", "*.csv")], parent=root
+            initialdir="../",
+            filetypes=[
+                ("CSV Files", "*.csv"),
+                ("Parquet Files", "*" + dpq.PARQUET_SUFFIX),
+                (
+                    "Dataset Databases",
+                    " ".join("*" + suffix for suffix in ddb.DATABASE_SUFFIXES),
+                ),
+            ],
+            parent=root,
         )
 
         print(file_path_response)
@@ -39,8 +51,12 @@ def get_dataset_file_path():
             exit(0)
         elif not os.path.isfile(file_path_response):
             print("ERROR: file does not exist\n")
-        elif not file_path_response.lower().endswith(".csv"):
-            print("ERROR: file is not a CSV file\n")
+        elif not (
+            file_path_response.lower().endswith(".csv")
+            or dpq.is_parquet(file_path_response)
+            or ddb.is_database(file_path_response)
+        ):
+            print("ERROR: file is not a CSV file, Parquet file, or dataset database\n")
         else:
             # Reduce the file path to a relative path and set it to be returned
             dataset_file_path = os.path.relpath(file_path_response)
@@ -49,19 +65,6 @@ def get_dataset_file_path():
     return dataset_file_path
 
 
-def read_dataset(file_path: str):
-    # Try opening the file and reading it as a list
-    try:
-        with open(file_path, "r", newline="") as dataset_file:
-            dataset = list(csv.DictReader(dataset_file))
-
-        return dataset
-    except:
-        # Print an error and end the program if unsuccessful
-        print("ERROR: could not open '{}'".format(file_path))
-        exit(1)
-
-
 def confirm_label_input(merged_output_file: str):
     # Notify the user of the time cost of the labels process
     print(
@@ -69,7 +72,8 @@ def confirm_label_input(merged_output_file: str):
         " data in '{}' is properly formatted to avoid costly errors.".format(
             merged_output_file
         ),
-        " Make sure to save any changes before continuing.\n",
+        " Make sure to save any changes before continuing; labels are made from the new",
+        " rows as they are saved in the file.\n",
         sep="",
     )
     # Get confirmation to continue from the user
@@ -78,8 +82,7 @@ def confirm_label_input(merged_output_file: str):
     )
     if response.lower() == "y":
         print()
-        # Read data from the given file and return it
-        return read_dataset(merged_output_file)
+        return
 
     # End the program if the user enter anything but 'Y' or 'y'
     exit(0)
@@ -94,20 +97,22 @@ def main():
         # Format data
         formatted_dict = ffd.run(observations_dict)
 
-        # Merge data with a pre-exisiting dataset
-        dataset_file_path = fmd.run(formatted_dict)
+        # Validate formatted data, quarantining invalid rows so they are not merged
+        formatted_dict = fvd.run(formatted_dict)
+
+        # Merge data with a pre-exisiting dataset, keeping the newly added rows for labels
+        dataset_file_path, new_rows = fmd.run(formatted_dict)
 
         # Confirm the input to the labels process with the user to avoid costly errors
-        dataset = confirm_label_input(dataset_file_path)
+        confirm_label_input(dataset_file_path)
     else:
         # In "labels only" mode, get a file path from the user to make labels from
         dataset_file_path = get_dataset_file_path()
+        new_rows = None
 
-        # Read the dataset into memory
-        dataset = read_dataset(dataset_file_path)
-
-    # Create labels
-    fcl.run(dataset)
+    # Create labels from the new rows (read again from the dataset, with any saved changes),
+    # or from the selected rows of the dataset (only those rows are read) in "labels only" mode
+    fcl.run(dataset_file_path, new_rows)
 
 
 if __name__ == "__main__":
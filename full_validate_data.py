@@ -0,0 +1,278 @@
+# Author: Myles Scholz
+# Created on October 18, 2026
+# Description: Module that validates formatted data column by column and quarantines invalid rows before they are merged
+import csv
+import datetime
+import os
+import traceback
+from collections import Counter
+
+import numpy as np
+
+import row_io as rio
+
+
+# File Name Constants
+SOURCES_FILE = "config/sources.csv"
+HEADER_FORMAT_FILE = "config/header_format.txt"
+LOG_FILE = "log_file.txt"
+
+# Column Name Constants
+INATURALIST_ID = "iNaturalist ID"
+SAMPLE_ID = "Sample ID"
+SPECIMEN_ID = "Specimen ID"
+DAY = "Collection Day 1"
+MONTH = "Month 1"
+LATITUDE = "Dec. Lat."
+LONGITUDE = "Dec. Long."
+
+# Column added to quarantined rows with the reasons they were rejected
+REASON = "Validation Errors"
+
+# Formatted months (Roman numerals 1-12)
+MONTHS = ["I", "II", "III", "IV", "V", "VI", "VII", "VIII", "IX", "X", "XI", "XII"]
+
+# The largest day of each month (by month number, with 31 for an unknown month)
+MAX_DAYS = np.array([31, 31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+
+def get_sources():
+    # Read SOURCES_FILE for the sources (iNaturalist projects) to pull data from
+    with open(SOURCES_FILE, newline="") as sources_file:
+        sources = list(csv.DictReader(sources_file))
+
+    return sources
+
+
+def read_header_format():
+    # Read HEADER_FORMAT_FILE, which contains the header that formatted data should have
+    with open(HEADER_FORMAT_FILE, newline="") as header_file:
+        csv_reader = csv.reader(header_file, delimiter="\n")
+        output_header = [line[0] for line in csv_reader]
+
+    return output_header
+
+
+def get_column(rows, field: str):
+    # Load one column of the rows into a NumPy array of strings (blank if missing)
+    return np.array([row.get(field) or "" for row in rows], dtype=str)
+
+
+def to_float(value: str):
+    try:
+        return float(value)
+    except ValueError:
+        return np.nan
+
+
+def parse_numbers(column):
+    """
+    Converts a column of strings to floats, with NaN for blank values and values that are
+    not numbers; the whole column is converted at once unless it has values that are not numbers
+    """
+
+    numbers = np.full(len(column), np.nan)
+    filled = column != ""
+
+    try:
+        numbers[filled] = column[filled].astype(np.float64)
+    except ValueError:
+        numbers[filled] = [to_float(value) for value in column[filled]]
+
+    return numbers
+
+
+def is_whole_number(column, max_digits: int = 18):
+    # Check which values of a column are whole numbers (decimal digits only) that fit in 64 bits
+    return np.char.isdecimal(column) & (np.char.str_len(column) <= max_digits)
+
+
+def check_coordinates(rows):
+    """
+    Checks that every row has a latitude and longitude that are numbers in range
+    Returns a dict from each reason to a mask of the rows it applies to
+    """
+
+    latitudes = get_column(rows, LATITUDE)
+    longitudes = get_column(rows, LONGITUDE)
+
+    # Missing coordinates (rows without them are not merged and cannot be printed on labels)
+    missing = (latitudes == "") | (longitudes == "")
+
+    # Coordinates that are not numbers are NaN, which fails every comparison
+    with np.errstate(invalid="ignore"):
+        invalid_latitude = ~(np.abs(parse_numbers(latitudes)) <= 90)
+        invalid_longitude = ~(np.abs(parse_numbers(longitudes)) <= 180)
+
+    return {
+        "missing latitude or longitude": missing,
+        "invalid latitude": invalid_latitude & ~missing,
+        "invalid longitude": invalid_longitude & ~missing,
+    }
+
+
+def check_dates(rows):
+    """
+    Checks that every filled in month is a Roman numeral (I-XII) and every filled in day
+    is a day of its month
+    Returns a dict from each reason to a mask of the rows it applies to
+    """
+
+    months = get_column(rows, MONTH)
+    days = get_column(rows, DAY)
+
+    # Number each month (0 if it is blank or not a month)
+    month_numbers = np.zeros(len(months), dtype=np.int64)
+    for i, month in enumerate(MONTHS):
+        month_numbers[months == month] = i + 1
+
+    # Parse the days that are whole numbers (0 for any other day)
+    whole_days = is_whole_number(days, 2)
+    day_numbers = np.zeros(len(days), dtype=np.int64)
+    day_numbers[whole_days] = days[whole_days].astype(np.int64)
+
+    return {
+        "invalid month": (months != "") & (month_numbers == 0),
+        "invalid day": (days != "")
+        & ((day_numbers < 1) | (day_numbers > MAX_DAYS[month_numbers])),
+    }
+
+
+def check_ids(rows):
+    """
+    Checks that every filled in iNaturalist ID, Sample ID, and Specimen ID is a whole number
+    Returns a dict from each reason to a mask of the rows it applies to
+    """
+
+    reasons = {}
+    for field in [INATURALIST_ID, SAMPLE_ID, SPECIMEN_ID]:
+        column = get_column(rows, field)
+        reasons["invalid {}".format(field)] = (column != "") & ~is_whole_number(column)
+
+    return reasons
+
+
+# The checks run on formatted data, in the order their reasons are reported
+CHECKS = [check_coordinates, check_dates, check_ids]
+
+
+def validate_rows(rows: list, checks: list = CHECKS):
+    """
+    Runs the given checks on whole columns of the rows (dicts or records)
+    Returns a list of the valid rows and a list of (row, reasons) pairs for the invalid rows
+    """
+
+    if not rows:
+        return [], []
+
+    # Collect the reasons of only the rows that fail a check
+    row_reasons = {}
+    for check in checks:
+        for reason, mask in check(rows).items():
+            for i in np.flatnonzero(mask):
+                row_reasons.setdefault(i, []).append(reason)
+
+    valid_rows = [row for i, row in enumerate(rows) if i not in row_reasons]
+    invalid_rows = [(rows[i], reasons) for i, reasons in sorted(row_reasons.items())]
+
+    return valid_rows, invalid_rows
+
+
+def get_quarantine_path(source: dict, query_year):
+    # Quarantined rows are saved next to the source's formatted data in the results folder
+    current_date = datetime.datetime.now()
+    date_str = "{}_{}_{}".format(
+        current_date.month, current_date.day, str(current_date.year)[-2:]
+    )
+    folder_name = "./results/{}_{}/".format(source["Abbreviation"], date_str)
+    file_name = "{}_quarantine_{}.csv".format(source["Abbreviation"], query_year)
+
+    return os.path.relpath(folder_name + file_name)
+
+
+def write_quarantine(file_path: str, invalid_rows: list, output_header: list):
+    # Write the invalid rows with an extra column listing the reasons they were rejected
+    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+    fieldnames = tuple(output_header)
+    rio.write_rows(
+        file_path,
+        list(fieldnames) + [REASON],
+        (
+            list(rio.get_values(row, fieldnames)) + ["; ".join(reasons)]
+            for row, reasons in invalid_rows
+        ),
+    )
+
+
+def get_reason_counts(invalid_rows: list):
+    # Count the rows rejected for each reason
+    return Counter(reason for _, reasons in invalid_rows for reason in reasons)
+
+
+def run(formatted_dict: dict):
+    try:
+        print("Validating Data...")
+
+        # Read the source names and ids (iNaturalist projects)
+        sources = get_sources()
+
+        # Read header from config/format_header.csv
+        output_header = read_header_format()
+
+        report = []
+        for source in sources:
+            rows = formatted_dict[source["Abbreviation"]]
+
+            # Keep only the valid rows for the merge
+            valid_rows, invalid_rows = validate_rows(rows)
+            formatted_dict[source["Abbreviation"]] = valid_rows
+
+            print(
+                "    '{}': {} of {} rows are valid".format(
+                    source["Name"], len(valid_rows), len(rows)
+                )
+            )
+            if not invalid_rows:
+                continue
+
+            # Quarantine the invalid rows and report why they were rejected
+            quarantine_path = get_quarantine_path(source, formatted_dict["year"])
+            write_quarantine(quarantine_path, invalid_rows, output_header)
+
+            report.append(
+                "    {}: quarantined {} rows in '{}'\n".format(
+                    source["Name"], len(invalid_rows), quarantine_path
+                )
+            )
+            for reason, count in get_reason_counts(invalid_rows).most_common():
+                print("        {}: {}".format(reason, count))
+                report.append("        {}: {}\n".format(reason, count))
+            print("        Quarantined rows saved to '{}'".format(quarantine_path))
+
+        print("Validating Data => Done\n")
+
+        # Log a success, with the report of quarantined rows
+        current_date = datetime.datetime.now()
+        date_str = current_date.strftime("%Y-%m-%d %H:%M:%S")
+        with open(LOG_FILE, "a") as log_file:
+            log_file.write("{}: SUCCESS - Validated formatted data\n".format(date_str))
+            log_file.writelines(report)
+            log_file.write("\n")
+
+        return formatted_dict
+
+    except Exception:
+        # Log the error
+        current_date = datetime.datetime.now()
+        date_str = current_date.strftime("%Y-%m-%d %H:%M:%S")
+        with open(LOG_FILE, "a") as log_file:
+            log_file.write("{}: ERROR while validating data:\n".format(date_str))
+            log_file.write(traceback.format_exc())
+            log_file.write("\n")
+
+        input(
+            "An error occurred while validating data. Check {} for details.".format(
+                LOG_FILE
+            )
+        )
+        exit(1)
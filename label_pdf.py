@@ -0,0 +1,300 @@
+# Author: Myles Scholz
+# Created on October 19, 2026
+# Description: Module that writes PDFs directly as content streams, with embedded TrueType fonts, text laid out like matplotlib, and filled rectangles
+import math
+import zlib
+
+import font_metrics as fm
+import row_io as rio
+
+
+# PDF units (points) per inch
+POINTS_PER_INCH = 72
+
+# Font descriptor flags
+NONSYMBOLIC_FLAG = 32
+ITALIC_FLAG = 64
+
+# Largest number of mappings in one section of a ToUnicode character map
+MAX_CMAP_SECTION = 100
+
+# Start and end of a ToUnicode character map from the 2-byte glyph IDs of Identity-H text
+TO_UNICODE_HEADER = """/CIDInit /ProcSet findresource begin
+12 dict begin
+begincmap
+/CIDSystemInfo << /Registry (Adobe) /Ordering (UCS) /Supplement 0 >> def
+/CMapName /Adobe-Identity-UCS def
+/CMapType 2 def
+1 begincodespacerange
+<0000> <FFFF>
+endcodespacerange
+"""
+TO_UNICODE_FOOTER = """endcmap
+CMapName currentdict /CIDInit /ProcSet findresource pop
+end
+end
+"""
+
+
+def format_number(value: float):
+    # Write numbers with up to 4 decimal places and no trailing zeros
+    return ("{:.4f}".format(value).rstrip("0").rstrip(".")) or "0"
+
+
+def encode_glyphs(font: fm.TrueTypeFont, text: str):
+    # Write text as a hexadecimal string of the 2-byte glyph IDs of its characters
+    return "<{}>".format(
+        "".join("{:04X}".format(font.get_glyph_id(character)) for character in text)
+    )
+
+
+def get_widths(font: fm.TrueTypeFont, glyph_ids: list):
+    # Advance widths of the glyphs (in thousandths of an em) as a CID font's /W array
+    scale = 1000 / font.units_per_em
+    return " ".join(
+        "{} [{}]".format(glyph_id, round(font.advances[glyph_id] * scale))
+        for glyph_id in glyph_ids
+    )
+
+
+def get_to_unicode(font: fm.TrueTypeFont, characters: set):
+    """
+    Builds the ToUnicode character map of a font from the characters written with it, so
+    the text of the PDF can be searched and copied
+    """
+
+    mappings = {}
+    for character in sorted(characters):
+        glyph_id = font.get_glyph_id(character)
+        if glyph_id:
+            mappings.setdefault(glyph_id, character)
+    mappings = sorted(mappings.items())
+
+    sections = []
+    for i in range(0, len(mappings), MAX_CMAP_SECTION):
+        section = mappings[i : i + MAX_CMAP_SECTION]
+        sections.append("{} beginbfchar\n".format(len(section)))
+        for glyph_id, character in section:
+            sections.append(
+                "<{:04X}> <{}>\n".format(
+                    glyph_id, character.encode("utf-16-be").hex().upper()
+                )
+            )
+        sections.append("endbfchar\n")
+
+    return (TO_UNICODE_HEADER + "".join(sections) + TO_UNICODE_FOOTER).encode("ascii")
+
+
+class PdfPage:
+    # The content stream of a page, built from text and rectangles in points, and the
+    # characters written with each font
+    def __init__(self):
+        self.content = []
+        self.characters = {}
+
+    def add_text(
+        self,
+        font: fm.TrueTypeFont,
+        font_name: str,
+        size: float,
+        x: float,
+        y: float,
+        lines: list,
+        rotation: float = 0,
+    ):
+        # Add lines of text laid out by layout_text relative to the anchor point (x, y)
+        angle = math.radians(rotation)
+        cos, sin = math.cos(angle), math.sin(angle)
+        matrix = " ".join(map(format_number, [cos, sin, -sin, cos]))
+
+        self.content.append(
+            "BT /{} {} Tf\n".format(font_name, format_number(size)).encode("ascii")
+        )
+        characters = self.characters.setdefault(font_name, set())
+        for line, (dx, dy) in lines:
+            characters.update(line)
+            self.content.append(
+                "{} {} {} Tm {} Tj\n".format(
+                    matrix,
+                    format_number(x + dx),
+                    format_number(y + dy),
+                    encode_glyphs(font, line),
+                ).encode("ascii")
+            )
+        self.content.append(b"ET\n")
+
+    def fill_rectangles(self, rectangles: list):
+        # Fill rectangles (x, y, width, height) in black
+        if not rectangles:
+            return
+
+        self.content.append(b"0 g\n")
+        for rectangle in rectangles:
+            self.content.append(
+                "{} {} {} {} re\n".format(*map(format_number, rectangle)).encode(
+                    "ascii"
+                )
+            )
+        self.content.append(b"f\n")
+
+
+class PdfDocument:
+    """
+    A PDF file built in memory: pages of the given size (in points) that share the fonts
+    embedded with add_font, which are written as Type 0 fonts addressed by glyph ID so that
+    text can use any character in the font files
+    """
+
+    def __init__(self, width: float, height: float):
+        self.width = width
+        self.height = height
+
+        # Objects are numbered from 1, and the catalog and page tree are added when saving
+        self.objects = [None, None]
+        self.fonts = {}
+        self.font_ids = {}
+        self.characters = {}
+        self.page_ids = []
+
+    def add_object(self, content: bytes):
+        self.objects.append(content)
+        return len(self.objects)
+
+    def add_stream(self, dictionary: str, data: bytes):
+        # Add a stream object, compressing its data
+        data = zlib.compress(data)
+        return self.add_object(
+            "<< {} /Filter /FlateDecode /Length {} >>\nstream\n".format(
+                dictionary, len(data)
+            ).encode("ascii")
+            + data
+            + b"\nendstream"
+        )
+
+    def add_font(self, font_file_path: str):
+        """
+        Embeds a TrueType font file (once per document)
+        Returns the font and its resource name to use in pages
+        """
+
+        if font_file_path in self.fonts:
+            return self.fonts[font_file_path]
+
+        font = fm.get_font(font_file_path)
+        font_name = "F{}".format(len(self.fonts) + 1)
+
+        # The font dictionary depends on the characters used, so it is added when saving
+        self.fonts[font_file_path] = (font, font_name)
+        self.font_ids[font_name] = self.add_object(None)
+        self.characters[font_name] = set()
+        return font, font_name
+
+    def write_font(self, font: fm.TrueTypeFont, font_name: str):
+        # Embed a font file with the widths of the glyphs used and a map back to their text
+        characters = self.characters[font_name]
+        glyph_ids = sorted({0} | {font.get_glyph_id(c) for c in characters})
+
+        file_id = self.add_stream("/Length1 {}".format(len(font.data)), font.data)
+        to_unicode_id = self.add_stream("", get_to_unicode(font, characters))
+
+        scale = 1000 / font.units_per_em
+        flags = NONSYMBOLIC_FLAG | (ITALIC_FLAG if font.italic_angle else 0)
+        base_font = "".join(c for c in font.name if c.isalnum() or c in "-_")
+        descriptor_id = self.add_object(
+            (
+                "<< /Type /FontDescriptor /FontName /{} /Flags {} /FontBBox [{}] "
+                "/ItalicAngle {} /Ascent {} /Descent {} /CapHeight {} /StemV 80 "
+                "/FontFile2 {} 0 R >>"
+            )
+            .format(
+                base_font,
+                flags,
+                " ".join(str(round(value * scale)) for value in font.bbox),
+                format_number(font.italic_angle),
+                round(font.ascent * scale),
+                round(font.descent * scale),
+                round(font.cap_height * scale),
+                file_id,
+            )
+            .encode("ascii")
+        )
+
+        # The glyph IDs written in the text are used directly as the CIDs of the font
+        cid_font_id = self.add_object(
+            (
+                "<< /Type /Font /Subtype /CIDFontType2 /BaseFont /{} /CIDSystemInfo "
+                "<< /Registry (Adobe) /Ordering (Identity) /Supplement 0 >> "
+                "/FontDescriptor {} 0 R /W [{}] /CIDToGIDMap /Identity >>"
+            )
+            .format(base_font, descriptor_id, get_widths(font, glyph_ids))
+            .encode("ascii")
+        )
+        self.objects[self.font_ids[font_name] - 1] = (
+            (
+                "<< /Type /Font /Subtype /Type0 /BaseFont /{} /Encoding /Identity-H "
+                "/DescendantFonts [{} 0 R] /ToUnicode {} 0 R >>"
+            )
+            .format(base_font, cid_font_id, to_unicode_id)
+            .encode("ascii")
+        )
+
+    def add_page(self, page: PdfPage):
+        for font_name, characters in page.characters.items():
+            self.characters[font_name].update(characters)
+
+        content_id = self.add_stream("", b"".join(page.content))
+        fonts = " ".join(
+            "/{} {} 0 R".format(font_name, font_id)
+            for font_name, font_id in self.font_ids.items()
+        )
+        self.page_ids.append(
+            self.add_object(
+                (
+                    "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {} {}] "
+                    "/Resources << /Font << {} >> >> /Contents {} 0 R >>"
+                )
+                .format(
+                    format_number(self.width),
+                    format_number(self.height),
+                    fonts,
+                    content_id,
+                )
+                .encode("ascii")
+            )
+        )
+
+    def save(self, pdf_file_path: str):
+        for font, font_name in self.fonts.values():
+            self.write_font(font, font_name)
+
+        # Add the catalog and page tree, which are always objects 1 and 2
+        self.objects[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+        self.objects[1] = "<< /Type /Pages /Kids [{}] /Count {} >>".format(
+            " ".join("{} 0 R".format(page_id) for page_id in self.page_ids),
+            len(self.page_ids),
+        ).encode("ascii")
+
+        with rio.open_replacing(pdf_file_path, "wb") as pdf_file:
+            pdf_file.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+            offsets = []
+            for i, content in enumerate(self.objects):
+                offsets.append(pdf_file.tell())
+                pdf_file.write("{} 0 obj\n".format(i + 1).encode("ascii"))
+                pdf_file.write(content)
+                pdf_file.write(b"\nendobj\n")
+
+            # The cross-reference table gives the position of each object
+            xref_offset = pdf_file.tell()
+            pdf_file.write(
+                "xref\n0 {}\n0000000000 65535 f \n".format(
+                    len(self.objects) + 1
+                ).encode("ascii")
+            )
+            for offset in offsets:
+                pdf_file.write("{:010d} 00000 n \n".format(offset).encode("ascii"))
+            pdf_file.write(
+                "trailer\n<< /Size {} /Root 1 0 R >>\nstartxref\n{}\n%%EOF\n".format(
+                    len(self.objects) + 1, xref_offset
+                ).encode("ascii")
+            )
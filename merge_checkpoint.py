@@ -0,0 +1,125 @@
+# Author: Myles Scholz
+# Created on October 18, 2026
+# Description: Module that checkpoints the progress of a merge in ./temp so an interrupted merge can be resumed
+import hashlib
+import json
+import os
+import shutil
+
+import row_io as rio
+
+
+# Folder Name Constant
+TEMP_DIR = "./temp"
+
+# File Name Constant
+CHECKPOINT_FILE = "merge_checkpoint.json"
+
+# Checkpoint format version (increment when the saved state changes)
+CHECKPOINT_VERSION = 1
+
+
+def get_checkpoint_path():
+    return os.path.join(TEMP_DIR, CHECKPOINT_FILE)
+
+
+def get_job_key(parts: list):
+    # Hash everything that determines a merge's temporary files into a key for its checkpoint
+    serialized = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+
+def read_checkpoint():
+    # Read the saved checkpoint; None if there is none or it is corrupt
+    try:
+        with open(get_checkpoint_path(), "r", encoding="utf-8") as checkpoint_file:
+            checkpoint = json.load(checkpoint_file)
+    except (OSError, ValueError):
+        return None
+
+    if (
+        not isinstance(checkpoint, dict)
+        or checkpoint.get("version") != CHECKPOINT_VERSION
+    ):
+        return None
+
+    return checkpoint
+
+
+def get_live_files():
+    # The temporary files that the saved checkpoint still needs
+    checkpoint = read_checkpoint()
+    if checkpoint is None:
+        return set()
+    return {os.path.abspath(path) for path in checkpoint["files"]}
+
+
+def remove_path(path: str):
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def collect_garbage():
+    """
+    Removes everything in TEMP_DIR that the saved checkpoint does not need, such as the
+    partial runs of a merge that crashed while writing them and the files of older merges
+    Only one merge may use TEMP_DIR at a time
+    """
+
+    if not os.path.isdir(TEMP_DIR):
+        return
+
+    live_files = get_live_files()
+    for name in os.listdir(TEMP_DIR):
+        path = os.path.join(TEMP_DIR, name)
+        if name != CHECKPOINT_FILE and os.path.abspath(path) not in live_files:
+            remove_path(path)
+
+
+def start_job(key: str):
+    """
+    Loads the state of the merge job with the given key if it was interrupted and all of
+    its temporary files still exist; otherwise discards any other job and starts a new one
+    Returns the job's state (a dict that is updated as the job progresses)
+    """
+
+    checkpoint = read_checkpoint()
+    if checkpoint is not None:
+        if checkpoint["key"] == key and all(map(os.path.isfile, checkpoint["files"])):
+            return checkpoint["state"]
+
+        # The saved job was for different data (or lost files), so none of it can be reused
+        finish_job()
+
+    return {}
+
+
+def save_job(key: str, state: dict, files: list):
+    """
+    Saves a merge job's state along with the temporary files it still needs
+    Written to a temporary file first so an interrupted write cannot leave a partial checkpoint
+    """
+
+    checkpoint = {
+        "version": CHECKPOINT_VERSION,
+        "key": key,
+        "state": state,
+        "files": list(files),
+    }
+
+    with rio.open_replacing(
+        get_checkpoint_path(), "w", encoding="utf-8"
+    ) as checkpoint_file:
+        json.dump(checkpoint, checkpoint_file)
+
+
+def finish_job():
+    # Remove the checkpoint and the temporary files it kept
+    checkpoint = read_checkpoint()
+    if checkpoint is not None:
+        for path in checkpoint["files"]:
+            remove_path(path)
+
+    remove_path(get_checkpoint_path())
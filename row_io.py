@@ -0,0 +1,122 @@
+# Author: Myles Scholz
+# Created on October 18, 2026
+# Description: Module that reads and writes dataset CSV files as rows of values, shared by every stage of the pipeline
+import contextlib
+import csv
+import io
+import os
+
+import dataset_record as dsr
+
+
+# Text Encoding Constants (every dataset file is read and written as UTF-8; characters
+# that cannot be decoded or encoded are replaced instead of stopping the pipeline)
+ENCODING = "utf-8"
+ERRORS = "replace"
+
+# Size (in bytes) of the read and write buffers of dataset files
+BUFFER_SIZE = 1024**2
+
+# Suffix of the temporary file that a file is written to before it replaces the file
+TEMP_SUFFIX = ".tmp"
+
+
+@contextlib.contextmanager
+def replace_when_done(file_path: str):
+    """
+    Yields the path of a temporary file next to file_path to write to, which replaces
+    file_path only once the block finishes, so an interrupted write never leaves a partial
+    file; the temporary file is removed if the block fails
+    """
+
+    temp_path = file_path + TEMP_SUFFIX
+    try:
+        yield temp_path
+        os.replace(temp_path, file_path)
+    finally:
+        if os.path.isfile(temp_path):
+            os.remove(temp_path)
+
+
+@contextlib.contextmanager
+def open_replacing(file_path: str, mode: str = "w", **kwargs):
+    # Open a temporary file to write in place of file_path (see replace_when_done)
+    with replace_when_done(file_path) as temp_path:
+        with open(temp_path, mode, **kwargs) as file:
+            yield file
+
+
+def open_csv(file_path: str, mode: str = "r"):
+    # Open a dataset CSV file with the shared encoding and a large buffer
+    return open(
+        file_path,
+        mode,
+        newline="",
+        encoding=ENCODING,
+        errors=ERRORS,
+        buffering=BUFFER_SIZE,
+    )
+
+
+def read_fieldnames(file_path: str):
+    # Read the column names (the first row) of a CSV file; None if the file is empty
+    with open_csv(file_path) as csv_file:
+        return next(csv.reader(csv_file), None)
+
+
+def iterate_rows(file_path: str):
+    # Yield the rows of a CSV file after its header as lists of values
+    with open_csv(file_path) as csv_file:
+        reader = csv.reader(csv_file)
+        next(reader, None)
+        yield from reader
+
+
+def iterate_records(file_path: str):
+    """
+    Yield the rows of a CSV file as records of its columns (see dataset_record.py), for code
+    that looks up values by name (missing values are filled in with empty strings)
+    """
+
+    with open_csv(file_path) as csv_file:
+        reader = csv.reader(csv_file)
+        fieldnames = next(reader, None)
+        if fieldnames is None:
+            return
+
+        yield from dsr.to_records(reader, fieldnames)
+
+
+def parse_records(text: str, fieldnames: list):
+    # Parse CSV text without a header (e.g. a range of rows read from a file) into records
+    return list(dsr.to_records(csv.reader(io.StringIO(text, newline="")), fieldnames))
+
+
+def get_values(row, fieldnames: tuple):
+    """
+    Get the values of a row (a dict or record) in the order of fieldnames
+    Records with the same columns already store their values in that order, so they are not copied
+    """
+
+    if isinstance(row, dsr.Record) and row.fieldnames == fieldnames:
+        return row.values()
+    return tuple(row.get(field, "") for field in fieldnames)
+
+
+def get_row_values(rows, fieldnames: list):
+    # Convert rows (dicts or records) to sequences of values in the order of fieldnames
+    fieldnames = tuple(fieldnames)
+    return (get_values(row, fieldnames) for row in rows)
+
+
+def write_rows(file_path: str, fieldnames: list, rows):
+    # Write a header and rows of values (in the order of fieldnames) to a CSV file
+    with open_csv(file_path, "w") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(fieldnames)
+        writer.writerows(rows)
+
+
+def write_dicts(file_path: str, fieldnames: list, rows):
+    # Write a header and row dicts (or records) to a CSV file, converting each row to values only once
+    write_rows(file_path, fieldnames, get_row_values(rows, fieldnames))